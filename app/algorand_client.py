@@ -1,42 +1,54 @@
-import hashlib, base64, os
-from algosdk import mnemonic
-from algosdk.v2client import algod, indexer
-from algosdk.transaction import PaymentTxn
-from dotenv import load_dotenv
-load_dotenv()
-
-ALGOD_ADDRESS = os.getenv("ALGOD_ADDRESS") or "https://testnet-api.algonode.cloud"
-ALGOD_TOKEN = os.getenv("ALGOD_TOKEN") or ""
-INDEXER_ADDRESS = os.getenv("INDEXER_ADDRESS") or "https://testnet-idx.algonode.cloud"
-INDEXER_TOKEN = os.getenv("INDEXER_TOKEN") or ""
-
-PROOF_MNEMONIC = os.getenv("PROOF_MNEMONIC") or ""
-if PROOF_MNEMONIC:
-    PRIVATE_KEY = mnemonic.to_private_key(PROOF_MNEMONIC)
-    PUBLIC_ADDR = mnemonic.to_public_key(PROOF_MNEMONIC)
-else:
-    PRIVATE_KEY = None
-    PUBLIC_ADDR = None
-
-algod_client = algod.AlgodClient(ALGOD_TOKEN, ALGOD_ADDRESS)
-indexer_client = indexer.IndexerClient(INDEXER_TOKEN, INDEXER_ADDRESS)
+import hashlib
+from functools import lru_cache
+from typing import Optional, Tuple
+
+from .settings import settings
+
+# algosdk is imported where it is used: it is slow to import, and the API
+# only needs it to anchor and read proofs.
+
+ALGOD_ADDRESS = settings.algod_address
+ALGOD_TOKEN = settings.algod_token
+INDEXER_ADDRESS = settings.indexer_address
+INDEXER_TOKEN = settings.indexer_token
+
+# Algorand caps atomic transaction groups at 16 transactions
+MAX_GROUP_SIZE = 16
+
+@lru_cache(maxsize=None)
+def algod_client():
+    from algosdk.v2client import algod
+    return algod.AlgodClient(ALGOD_TOKEN, ALGOD_ADDRESS)
+
+@lru_cache(maxsize=None)
+def wallet() -> Tuple[Optional[str], Optional[str]]:
+    """(private key, address) of the PROOF_MNEMONIC account, or (None, None) without one."""
+    if not settings.proof_mnemonic:
+        return None, None
+    from algosdk import account, mnemonic
+    private_key = mnemonic.to_private_key(settings.proof_mnemonic)
+    return private_key, account.address_from_private_key(private_key)
 
 def compute_sha256_of_object(obj: dict) -> str:
     import json
     return hashlib.sha256(json.dumps(obj, sort_keys=True).encode()).hexdigest()
 
-def send_proof_hash_to_algorand(hash_hex: str) -> str:
-    if not PRIVATE_KEY or not PUBLIC_ADDR:
+def sign_proof_group(hash_hexes, params, private_key=None, address=None):
+    """
+    Build one zero-amount self-payment per hash (hash as the note) and sign
+    them as a single atomic group. Returns the signed transactions in order.
+    """
+    from algosdk.transaction import PaymentTxn, assign_group_id
+    if not private_key or not address:
+        default_key, default_address = wallet()
+        private_key = private_key or default_key
+        address = address or default_address
+    if not private_key or not address:
         raise RuntimeError("Wallet not configured")
-    params = algod_client.suggested_params()
-    txn = PaymentTxn(PUBLIC_ADDR, params, PUBLIC_ADDR, 0, note=hash_hex.encode())
-    signed = txn.sign(PRIVATE_KEY)
-    return algod_client.send_transaction(signed)
-
-def read_hash_from_txid(txid: str):
-    res = indexer_client.search_transactions(txid=txid)
-    txns = res.get("transactions")
-    if not txns: return None
-    note_b64 = txns[0].get("note")
-    if not note_b64: return None
-    return base64.b64decode(note_b64).decode()
+    if len(hash_hexes) > MAX_GROUP_SIZE:
+        raise ValueError(f"At most {MAX_GROUP_SIZE} transactions per group")
+
+    txns = [PaymentTxn(address, params, address, 0, note=h.encode()) for h in hash_hexes]
+    if len(txns) > 1:
+        assign_group_id(txns)
+    return [t.sign(private_key) for t in txns]
@@ -0,0 +1,74 @@
+# app/analytics.py
+"""
+Brand-level activity totals across all campaigns, bucketed by day, week
+(starting Monday) or month. Everything is aggregated by the database in one
+GROUP BY over DailyActivity joined to Campaign.
+"""
+from datetime import date
+from typing import List, Optional
+
+from sqlalchemy import Date, cast, func, type_coerce
+from sqlmodel import Session, select
+
+from .models import Campaign, DailyActivity
+
+BUCKETS = ("day", "week", "month")
+
+def bucket_start(dialect_name: str, bucket: str, column):
+    """SQL expression for the first day of the bucket containing `column` (a date)."""
+    if bucket == "day":
+        return column
+    if dialect_name == "postgresql":
+        return cast(func.date_trunc(bucket, column), Date)
+    # SQLite: 'weekday 0' moves to the next Sunday (or stays), so -6 days is that week's Monday
+    if bucket == "week":
+        return type_coerce(func.date(column, "weekday 0", "-6 days"), Date)
+    return type_coerce(func.date(column, "start of month"), Date)
+
+def brand_activity_buckets(
+    session: Session,
+    brand_id: int,
+    bucket: str,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    by_campaign: bool = False,
+) -> List[dict]:
+    """
+    Manufactured, distributed and scan totals per bucket (and per campaign
+    with `by_campaign`), oldest bucket first. `start` and `end` are inclusive.
+    `scans` counts the reported scan_count_today plus the QR scans recorded
+    live (`live_scans`, which is also returned on its own).
+    """
+    period = bucket_start(session.get_bind().dialect.name, bucket, DailyActivity.day).label("bucket_start")
+    keys = [period, DailyActivity.campaign_id] if by_campaign else [period]
+
+    statement = (
+        select(
+            *keys,
+            func.sum(DailyActivity.manufactured_today),
+            func.sum(DailyActivity.distributed_today),
+            func.sum(DailyActivity.scan_count_today + DailyActivity.live_scans),
+            func.sum(DailyActivity.live_scans)
+        )
+        .join(Campaign, Campaign.id == DailyActivity.campaign_id)
+        .where(Campaign.brand_id == brand_id)
+        .group_by(*keys)
+        .order_by(*keys)
+    )
+    if start is not None:
+        statement = statement.where(DailyActivity.day >= start)
+    if end is not None:
+        statement = statement.where(DailyActivity.day <= end)
+
+    rows = []
+    for row in session.exec(statement).all():
+        period_start, *campaign, manufactured, distributed, scans, live_scans = row
+        rows.append({
+            "bucket_start": period_start,
+            "campaign_id": campaign[0] if campaign else None,
+            "manufactured": manufactured,
+            "distributed": distributed,
+            "scans": scans,
+            "live_scans": live_scans,
+        })
+    return rows
@@ -0,0 +1,374 @@
+# app/anchoring.py
+"""
+Background anchoring of proof hashes to Algorand.
+
+Write endpoints only call `enqueue_proof`, which stores a pending
+BlockchainProof row in the same transaction as the record itself. The
+AnchorWorker drains pending rows in a background thread and writes the txids
+back. It runs in one of two modes:
+
+- "group" (default): one transaction per proof, submitted as atomic groups of
+  up to 16 transactions.
+- "merkle": pending proofs are collected for ANCHOR_WINDOW_SECONDS, a Merkle
+  tree is built over them and only the root is anchored, in a single
+  transaction. Each proof keeps its inclusion path so it can be verified
+  against the root.
+
+Every worker process of the app runs an AnchorWorker. Before sending, a
+worker claims the proofs it is about to send for ANCHOR_CLAIM_SECONDS
+(BlockchainProof.claimed_by / claimed_until, set in one conditional UPDATE),
+so two workers never submit the same proof. On Postgres the select also
+skips rows another worker has locked (FOR UPDATE SKIP LOCKED). A worker that
+dies mid-send leaves its claim to expire, after which its proofs are picked
+up again.
+"""
+import json
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+
+from sqlalchemy import or_, update
+from sqlmodel import Session, select
+
+from . import algorand_client
+from .merkle import build_levels, inclusion_path
+from .metrics import external_call
+from .models import BlockchainProof, DailyActivity, DistributionRecord, DistributionUpload, ManufacturingBatch
+
+logger = logging.getLogger(__name__)
+
+ANCHOR_WORKER_ENABLED = os.getenv("ANCHOR_WORKER_ENABLED", "1") == "1"
+ANCHOR_MODE = os.getenv("ANCHOR_MODE", "group")
+ANCHOR_WINDOW_SECONDS = float(os.getenv("ANCHOR_WINDOW_SECONDS", "60"))
+ANCHOR_MERKLE_MAX_LEAVES = int(os.getenv("ANCHOR_MERKLE_MAX_LEAVES", "10000"))
+ANCHOR_POLL_SECONDS = float(os.getenv("ANCHOR_POLL_SECONDS", "2"))
+ANCHOR_BATCH_LIMIT = int(os.getenv("ANCHOR_BATCH_LIMIT", "256"))
+ANCHOR_MAX_ATTEMPTS = int(os.getenv("ANCHOR_MAX_ATTEMPTS", "8"))
+ANCHOR_BACKOFF_SECONDS = float(os.getenv("ANCHOR_BACKOFF_SECONDS", "5"))
+ANCHOR_MAX_BACKOFF_SECONDS = float(os.getenv("ANCHOR_MAX_BACKOFF_SECONDS", "600"))
+# how long a worker owns the proofs it claimed; longer than one send takes
+ANCHOR_CLAIM_SECONDS = float(os.getenv("ANCHOR_CLAIM_SECONDS", "300"))
+SUGGESTED_PARAMS_TTL_SECONDS = float(os.getenv("SUGGESTED_PARAMS_TTL_SECONDS", "60"))
+
+# related_type -> (model, hash column, column that receives the txid)
+PROOF_COLUMNS = {
+    "manufacturing_batch": (ManufacturingBatch, ManufacturingBatch.proof_hash, ManufacturingBatch.proof_txid),
+    "distribution": (DistributionRecord, DistributionRecord.proof_hash, DistributionRecord.proof_txid),
+    "daily_activity": (DailyActivity, DailyActivity.sha256, DailyActivity.algorand_txid),
+    "distribution_upload": (DistributionUpload, DistributionUpload.proof_hash, DistributionUpload.proof_txid),
+}
+
+# Objects whose sha256 is anchored. Verification recomputes them from the
+# stored records, so the fields here must only come from persisted columns.
+def batch_proof_obj(batch: ManufacturingBatch) -> dict:
+    return {
+        "type": "manufacturing_batch",
+        "campaign_id": batch.campaign_id,
+        "batch_id": batch.id,
+        "batch_number": batch.batch_number,
+        "manufactured_count": batch.manufactured_count,
+    }
+
+def distribution_proof_obj(rec: DistributionRecord) -> dict:
+    return {
+        "type": "distribution",
+        "campaign_id": rec.campaign_id,
+        "distribution_id": rec.id,
+        "location": rec.location_name,
+        "distributed_count": rec.distributed_count,
+    }
+
+def daily_activity_proof_obj(activity: DailyActivity) -> dict:
+    return {
+        "type": "daily_activity",
+        "campaign_id": activity.campaign_id,
+        "activity_id": activity.id,
+        "date": activity.day.strftime("%Y-%m-%d"),
+        "manufactured_today": activity.manufactured_today,
+        "distributed_today": activity.distributed_today,
+        "scan_count_today": activity.scan_count_today
+    }
+
+def distribution_upload_proof_obj(upload: DistributionUpload) -> dict:
+    return {
+        "type": "distribution_upload",
+        "campaign_id": upload.campaign_id,
+        "upload_id": upload.id,
+        "rows": upload.rows,
+        "distributed_count": upload.distributed_count,
+        "rows_sha256": upload.rows_sha256,
+    }
+
+PROOF_OBJECTS = {
+    "manufacturing_batch": batch_proof_obj,
+    "distribution": distribution_proof_obj,
+    "daily_activity": daily_activity_proof_obj,
+    "distribution_upload": distribution_upload_proof_obj,
+}
+
+def enqueue_proof(session: Session, related_type: str, related_id: int, hash_hex: str) -> BlockchainProof:
+    """Add a pending proof to the session. The caller commits."""
+    if related_type not in PROOF_COLUMNS:
+        raise ValueError(f"Unknown proof type: {related_type}")
+    proof = BlockchainProof(related_type=related_type, related_id=related_id, sha256_hash=hash_hex)
+    session.add(proof)
+    return proof
+
+def backoff_delay(attempts: int) -> float:
+    return min(ANCHOR_BACKOFF_SECONDS * 2 ** (attempts - 1), ANCHOR_MAX_BACKOFF_SECONDS)
+
+class SuggestedParamsCache:
+    """Reuses algod suggested params for `ttl` seconds. Without a client, uses the shared one."""
+
+    def __init__(self, client=None, ttl: float = SUGGESTED_PARAMS_TTL_SECONDS):
+        self.client = client
+        self.ttl = ttl
+        self._params = None
+        self._fetched_at = 0.0
+
+    def get(self):
+        if self._params is None or time.monotonic() - self._fetched_at > self.ttl:
+            with external_call("algod"):
+                self._params = (self.client or algorand_client.algod_client()).suggested_params()
+            self._fetched_at = time.monotonic()
+        return self._params
+
+    def invalidate(self):
+        self._params = None
+
+class AnchorWorker:
+    def __init__(
+        self,
+        engine,
+        client=None,
+        private_key: Optional[str] = None,
+        address: Optional[str] = None,
+        poll_interval: float = ANCHOR_POLL_SECONDS,
+        batch_limit: int = ANCHOR_BATCH_LIMIT,
+        mode: str = ANCHOR_MODE,
+        window: float = ANCHOR_WINDOW_SECONDS,
+        max_leaves: int = ANCHOR_MERKLE_MAX_LEAVES,
+        on_anchored: Optional[Callable[[Dict[int, List[dict]]], None]] = None,
+    ):
+        if mode not in ("group", "merkle"):
+            raise ValueError(f"Unknown anchor mode: {mode}")
+        self.engine = engine
+        # None: the shared client and PROOF_MNEMONIC wallet, set up on first use
+        self._client = client
+        self._private_key = private_key
+        self._address = address
+        self.poll_interval = poll_interval
+        self.batch_limit = batch_limit
+        self.mode = mode
+        self.window = window
+        self.max_leaves = max_leaves
+        # called after commit with {campaign_id: [{related_type, related_id, txid}]}
+        # for the records that got a txid
+        self.on_anchored = on_anchored
+        self.params = SuggestedParamsCache(client)
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def client(self):
+        return self._client or algorand_client.algod_client()
+
+    @client.setter
+    def client(self, client):
+        self._client = client
+
+    @property
+    def private_key(self) -> Optional[str]:
+        return self._private_key or algorand_client.wallet()[0]
+
+    @private_key.setter
+    def private_key(self, private_key: Optional[str]):
+        self._private_key = private_key
+
+    @property
+    def address(self) -> Optional[str]:
+        return self._address or algorand_client.wallet()[1]
+
+    @address.setter
+    def address(self, address: Optional[str]):
+        self._address = address
+
+    def start(self):
+        if not self.private_key or not self.address:
+            logger.warning("Wallet not configured; proofs will stay pending")
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="anchor-worker", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                sent = self.run_once()
+            except Exception:
+                logger.exception("Anchoring pass failed")
+                sent = 0
+            # keep draining while there is a backlog
+            if not sent:
+                self._stop.wait(self.poll_interval)
+
+    def run_once(self) -> int:
+        """Anchor the due pending proofs. Returns the number anchored."""
+        with Session(self.engine, expire_on_commit=False) as session:
+            proofs = self._claim(session)
+
+            if self.mode == "merkle":
+                sent = self._anchor_merkle(session, proofs)
+                self._notify(session, proofs if sent else [])
+                return sent
+
+            sent = []
+            size = algorand_client.MAX_GROUP_SIZE
+            for i in range(0, len(proofs), size):
+                group = proofs[i:i + size]
+                if self._send_group(session, group):
+                    sent.extend(group)
+                session.commit()
+            self._notify(session, sent)
+            return len(sent)
+
+    def _claim(self, session: Session) -> List[BlockchainProof]:
+        """Claim the due pending proofs no other worker holds, and commit the claim."""
+        limit = self.max_leaves if self.mode == "merkle" else self.batch_limit
+        now = datetime.utcnow()
+        unclaimed = or_(BlockchainProof.claimed_until.is_(None), BlockchainProof.claimed_until < now)
+        proofs = session.exec(
+            select(BlockchainProof)
+            .where(
+                BlockchainProof.status == "pending",
+                BlockchainProof.next_attempt_at <= now,
+                unclaimed
+            )
+            .order_by(BlockchainProof.id)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        ).all()
+        if self.mode == "merkle" and proofs:
+            # wait until the window has elapsed, unless the tree is already full
+            window_start = now - timedelta(seconds=self.window)
+            if len(proofs) < self.max_leaves and proofs[0].created_at > window_start:
+                proofs = []
+        if not proofs:
+            session.rollback()
+            return []
+
+        until = now + timedelta(seconds=ANCHOR_CLAIM_SECONDS)
+        # the condition is checked again per row, so of two workers that
+        # selected the same proof only one claims it
+        session.execute(
+            update(BlockchainProof)
+            .where(BlockchainProof.id.in_([p.id for p in proofs]), unclaimed)
+            .values(claimed_by=self.worker_id, claimed_until=until)
+            .execution_options(synchronize_session=False)
+        )
+        session.commit()
+        return session.exec(
+            select(BlockchainProof)
+            .where(BlockchainProof.claimed_by == self.worker_id, BlockchainProof.claimed_until == until)
+            .order_by(BlockchainProof.id)
+            .execution_options(populate_existing=True)
+        ).all()
+
+    def _notify(self, session: Session, anchored: List[BlockchainProof]):
+        if not anchored or self.on_anchored is None:
+            return
+        txids_by_type = defaultdict(dict)
+        for p in anchored:
+            txids_by_type[p.related_type][p.related_id] = p.algorand_txid
+        records = defaultdict(list)
+        for related_type, txids in txids_by_type.items():
+            model = PROOF_COLUMNS[related_type][0]
+            ids = list(txids)
+            for i in range(0, len(ids), 500):
+                rows = session.exec(select(model.id, model.campaign_id).where(model.id.in_(ids[i:i + 500]))).all()
+                for related_id, campaign_id in rows:
+                    records[campaign_id].append(
+                        {"related_type": related_type, "related_id": related_id, "txid": txids[related_id]}
+                    )
+        self.on_anchored(dict(records))
+
+    def _anchor_merkle(self, session: Session, proofs: List[BlockchainProof]) -> int:
+        if not proofs:
+            return 0
+
+        levels = build_levels([p.sha256_hash for p in proofs])
+        root = levels[-1][0].hex()
+        try:
+            signed = algorand_client.sign_proof_group([root], self.params.get(), self.private_key, self.address)
+            with external_call("algod"):
+                self.client.send_transactions(signed)
+        except Exception as e:
+            self._record_failure(session, proofs, e)
+            session.commit()
+            return 0
+
+        txid = signed[0].get_txid()
+        for i, p in enumerate(proofs):
+            p.merkle_root = root
+            p.merkle_path = json.dumps(inclusion_path(levels, i))
+            self._record_success(session, p, txid)
+        session.commit()
+        return len(proofs)
+
+    def _send_group(self, session: Session, group: List[BlockchainProof]) -> bool:
+        try:
+            signed = algorand_client.sign_proof_group(
+                [p.sha256_hash for p in group], self.params.get(), self.private_key, self.address
+            )
+            with external_call("algod"):
+                self.client.send_transactions(signed)
+        except Exception as e:
+            self._record_failure(session, group, e)
+            return False
+
+        for p, stx in zip(group, signed):
+            self._record_success(session, p, stx.get_txid())
+        return True
+
+    def _record_failure(self, session: Session, proofs: List[BlockchainProof], error: Exception):
+        self.params.invalidate()
+        now = datetime.utcnow()
+        for p in proofs:
+            p.attempts += 1
+            p.last_error = str(error)[:500]
+            p.claimed_by = p.claimed_until = None
+            if p.attempts >= ANCHOR_MAX_ATTEMPTS:
+                p.status = "failed"
+            else:
+                p.next_attempt_at = now + timedelta(seconds=backoff_delay(p.attempts))
+            session.add(p)
+        logger.warning("Anchoring %d proofs failed: %s", len(proofs), error)
+
+    def _record_success(self, session: Session, p: BlockchainProof, txid: str):
+        p.algorand_txid = txid
+        p.status = "sent"
+        p.attempts += 1
+        p.last_error = None
+        p.claimed_by = p.claimed_until = None
+        session.add(p)
+
+        # skip records whose hash changed since (e.g. a re-posted day)
+        model, hash_column, txid_column = PROOF_COLUMNS[p.related_type]
+        session.execute(
+            update(model)
+            .where(model.id == p.related_id, hash_column == p.sha256_hash)
+            .values({txid_column.key: txid})
+        )
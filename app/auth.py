@@ -1,41 +1,70 @@
-from passlib.context import CryptContext
 from jose import JWTError, jwt
 from datetime import datetime, timedelta
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from typing import TYPE_CHECKING, Optional, Tuple
+import asyncio
+import multiprocessing
 import os
 import hashlib
-from dotenv import load_dotenv
+import hmac
+from .cache import TTLCache
+from .settings import settings
 
-# Load environment variables
-load_dotenv()
+if TYPE_CHECKING:
+    from passlib.context import CryptContext
 
 # Security settings
-SECRET_KEY = os.getenv("SECRET_KEY", "dev-secret-key-change-me")
+SECRET_KEY = settings.secret_key
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24 * 7  # 1 week
 
-# Use bcrypt_sha256 to avoid 72-byte password limit
-# If bcrypt_sha256 fails due to version issues, fallback to manual SHA256 + bcrypt
-try:
-    pwd_context = CryptContext(
-        schemes=["bcrypt_sha256"],
-        default="bcrypt_sha256",
-        deprecated="auto"
-    )
-    # Test if it works
-    _test_hash = pwd_context.hash("test")
-    USE_BCRYPT_SHA256 = True
-except Exception:
-    # Fallback to regular bcrypt with manual SHA256 hashing
-    pwd_context = CryptContext(
-        schemes=["bcrypt"],
-        default="bcrypt",
-        deprecated="auto"
-    )
-    USE_BCRYPT_SHA256 = False
+# "db": load the brand on every request. "stateless": trust the signed claims
+# and only look up the brand's token version once per AUTH_CACHE_TTL_SECONDS.
+AUTH_MODE = os.getenv("AUTH_MODE", "db")
+AUTH_CACHE_TTL_SECONDS = float(os.getenv("AUTH_CACHE_TTL_SECONDS", "60"))
+AUTH_CACHE_SIZE = int(os.getenv("AUTH_CACHE_SIZE", "10000"))
+
+# bcrypt cost factor for new hashes (each +1 doubles the work). Existing
+# hashes keep verifying at the cost they were created with.
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+# Hashing runs in this many worker processes so it neither blocks the event
+# loop nor competes for the GIL. 0 hashes inline on the calling thread.
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(os.cpu_count() or 1)))
+
+@lru_cache(maxsize=None)
+def _password_backend() -> Tuple["CryptContext", bool]:
+    """
+    (context, uses bcrypt_sha256), probed on first use instead of at import.
+    bcrypt_sha256 avoids the 72-byte password limit; if it is unusable with
+    the installed bcrypt, fall back to manual SHA256 + bcrypt. passlib is
+    imported here too, so only processes that hash pay for it.
+    """
+    from passlib.context import CryptContext
+    from passlib.hash import bcrypt_sha256
+    try:
+        context = CryptContext(
+            schemes=["bcrypt_sha256"],
+            default="bcrypt_sha256",
+            deprecated="auto",
+            bcrypt_sha256__rounds=BCRYPT_ROUNDS
+        )
+        # cheapest cost: this only checks that the backend works
+        bcrypt_sha256.using(rounds=4).hash("test")
+        return context, True
+    except Exception:
+        context = CryptContext(
+            schemes=["bcrypt"],
+            default="bcrypt",
+            deprecated="auto",
+            bcrypt__rounds=BCRYPT_ROUNDS
+        )
+        return context, False
 
 # Password utilities
 def verify_password(plain_password: str, hashed: str) -> bool:
-    if USE_BCRYPT_SHA256:
+    pwd_context, use_bcrypt_sha256 = _password_backend()
+    if use_bcrypt_sha256:
         return pwd_context.verify(plain_password, hashed)
     else:
         # Manual SHA256 + bcrypt verification
@@ -44,7 +73,8 @@ def verify_password(plain_password: str, hashed: str) -> bool:
         return pwd_context.verify(sha256_hash, hashed)
 
 def get_password_hash(password: str) -> str:
-    if USE_BCRYPT_SHA256:
+    pwd_context, use_bcrypt_sha256 = _password_backend()
+    if use_bcrypt_sha256:
         # bcrypt_sha256 handles long passwords safely
         return pwd_context.hash(password)
     else:
@@ -53,6 +83,56 @@ def get_password_hash(password: str) -> str:
         sha256_hash = hashlib.sha256(password.encode('utf-8')).hexdigest()
         return pwd_context.hash(sha256_hash)
 
+_password_executor: Optional[ProcessPoolExecutor] = None
+
+def _executor() -> Optional[ProcessPoolExecutor]:
+    global _password_executor
+    if PASSWORD_HASH_WORKERS <= 0:
+        return None
+    if _password_executor is None:
+        # spawn: forking a process that runs threads (event loop, anchor worker) is unsafe
+        _password_executor = ProcessPoolExecutor(
+            max_workers=PASSWORD_HASH_WORKERS, mp_context=multiprocessing.get_context("spawn")
+        )
+    return _password_executor
+
+def shutdown_password_executor():
+    global _password_executor
+    if _password_executor is not None:
+        _password_executor.shutdown(wait=False, cancel_futures=True)
+        _password_executor = None
+
+async def hash_password(password: str) -> str:
+    """get_password_hash on the hashing executor."""
+    executor = _executor()
+    if executor is None:
+        return get_password_hash(password)
+    return await asyncio.get_running_loop().run_in_executor(executor, get_password_hash, password)
+
+# Optional cache of successful verifications, so repeated logins with the same
+# password skip bcrypt. Off by default. Keys are HMACs under a per-process
+# secret and include the stored hash, so a password change misses.
+LOGIN_CACHE_TTL_SECONDS = float(os.getenv("LOGIN_CACHE_TTL_SECONDS", "0"))
+_login_cache_secret = os.urandom(32)
+verified_passwords = TTLCache(maxsize=AUTH_CACHE_SIZE, ttl=LOGIN_CACHE_TTL_SECONDS)
+
+async def check_password(plain_password: str, hashed: str) -> bool:
+    """verify_password on the hashing executor."""
+    key = None
+    if LOGIN_CACHE_TTL_SECONDS > 0:
+        key = hmac.new(_login_cache_secret, f"{hashed}\0{plain_password}".encode(), hashlib.sha256).digest()
+        if key in verified_passwords:
+            return True
+
+    executor = _executor()
+    if executor is None:
+        ok = verify_password(plain_password, hashed)
+    else:
+        ok = await asyncio.get_running_loop().run_in_executor(executor, verify_password, plain_password, hashed)
+    if ok and key is not None:
+        verified_passwords.set(key, True)
+    return ok
+
 # JWT utilities
 def create_access_token(data: dict, expires_delta=None) -> str:
     to_encode = data.copy()
@@ -64,4 +144,14 @@ def decode_access_token(token: str):
     try:
         return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
     except JWTError:
-        return None
\ No newline at end of file
+        return None
+
+# In-process caches: brand_id -> token_version, campaign_id -> owning brand_id.
+# Another worker's revocation is picked up here within AUTH_CACHE_TTL_SECONDS.
+# Campaigns never change owner (there is no transfer or delete endpoint), so
+# campaign_owners needs no invalidation; add it with such an endpoint.
+brand_versions = TTLCache(maxsize=AUTH_CACHE_SIZE, ttl=AUTH_CACHE_TTL_SECONDS)
+campaign_owners = TTLCache(maxsize=AUTH_CACHE_SIZE, ttl=AUTH_CACHE_TTL_SECONDS)
+
+def invalidate_brand(brand_id: int):
+    brand_versions.delete(brand_id)
@@ -0,0 +1,255 @@
+# app/bulk.py
+"""
+Bulk ingestion of distribution records.
+
+Rows arrive as a JSON array, as NDJSON (one object per line) or as CSV with a
+header row (location_name,distributed_count,lat,lng).
+NDJSON and CSV bodies are parsed while they stream in. Validated rows go to
+a spool file (in memory up to BULK_SPOOL_MEMORY_BYTES, then on disk), and
+only once the whole body has arrived are they inserted, in chunks of
+BULK_CHUNK_ROWS with one multi-row INSERT each. The whole upload is a single
+transaction with one aggregate proof, and a slow client never keeps that
+transaction, or the rollup and geo cell rows it locks, open.
+"""
+import csv
+import hashlib
+import json
+import os
+import tempfile
+from collections import deque
+from datetime import datetime
+from typing import IO, AsyncIterator, List, Tuple
+
+from pydantic import ValidationError
+from sqlalchemy import insert
+from sqlmodel import Session
+from starlette.requests import Request
+
+from .algorand_client import compute_sha256_of_object
+from .anchoring import distribution_upload_proof_obj, enqueue_proof
+from .counters import increment
+from .events import events
+from .models import DistributionRecord, DistributionUpload
+from .response_cache import response_cache
+from .geo import add_to_cells, geohash_or_none
+from .rollup import add_to_rollup, distinct_locations
+from .schemas import DistIn
+
+BULK_CHUNK_ROWS = int(os.getenv("BULK_CHUNK_ROWS", "1000"))
+BULK_MAX_ROWS = int(os.getenv("BULK_MAX_ROWS", "100000"))
+BULK_SPOOL_MEMORY_BYTES = int(os.getenv("BULK_SPOOL_MEMORY_BYTES", str(8 * 1024 * 1024)))
+
+NDJSON_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl")
+
+class BulkError(ValueError):
+    pass
+
+def row_line(row: dict) -> bytes:
+    """One row (the DistIn fields) as it is digested into rows_sha256."""
+    return (json.dumps(row, sort_keys=True) + "\n").encode()
+
+def _decode(line: bytes, lineno: int) -> str:
+    try:
+        return line.decode("utf-8").rstrip("\r")
+    except UnicodeDecodeError:
+        raise BulkError(f"line {lineno}: invalid UTF-8")
+
+async def _lines(request: Request) -> AsyncIterator[str]:
+    # b"\n" never occurs inside a multi-byte UTF-8 character, so split first and decode each line
+    buf = b""
+    lineno = 0
+    async for chunk in request.stream():
+        buf += chunk
+        *lines, buf = buf.split(b"\n")
+        for line in lines:
+            lineno += 1
+            yield _decode(line, lineno)
+    if buf:
+        yield _decode(buf, lineno + 1)
+
+# CSV quote states at the end of a line
+_FIELD_START, _UNQUOTED, _QUOTED, _QUOTE_IN_QUOTED = range(4)
+
+def _csv_state(line: str, state: int) -> int:
+    """The quote state after `line`, starting from `state` (csv's default dialect)."""
+    for ch in line:
+        if state == _QUOTED:
+            if ch == '"':
+                state = _QUOTE_IN_QUOTED
+        elif ch == ",":
+            state = _FIELD_START
+        elif ch == '"' and state in (_FIELD_START, _QUOTE_IN_QUOTED):
+            state = _QUOTED  # opening quote, or the second of an escaped ""
+        else:
+            state = _UNQUOTED
+    return state
+
+class _RecordFeed:
+    """
+    The decoded lines for one csv.reader, handed over a whole record at a
+    time: a record whose quoted field runs on to the next line waits for it.
+    """
+
+    def __init__(self):
+        self._lines: deque = deque()
+        self._pending: List[str] = []
+        self._state = _FIELD_START
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> str:
+        if not self._lines:
+            raise StopIteration
+        return self._lines.popleft()
+
+    def add(self, line: str) -> bool:
+        """Add a line; True once it completes a record, which the reader can then take."""
+        self._pending.append(line + "\n")
+        self._state = _csv_state(line, self._state)
+        if self._state == _QUOTED:
+            return False
+        self._lines.extend(self._pending)
+        self._pending = []
+        self._state = _FIELD_START
+        return True
+
+    @property
+    def in_record(self) -> bool:
+        return bool(self._pending)
+
+async def iter_raw_rows(request: Request) -> AsyncIterator[Tuple[int, dict]]:
+    """Yield (line, CSV record or item number, raw row dict) from the request body."""
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+
+    if content_type in NDJSON_TYPES:
+        lineno = 0
+        async for line in _lines(request):
+            lineno += 1
+            if not line.strip():
+                continue
+            try:
+                yield lineno, json.loads(line)
+            except ValueError:
+                raise BulkError(f"line {lineno}: invalid JSON")
+
+    elif content_type == "text/csv":
+        # one reader over all the lines, so quoted fields may contain newlines
+        feed = _RecordFeed()
+        reader = csv.reader(feed)
+        header = None
+        recordno = 0
+        async for line in _lines(request):
+            if not feed.add(line):
+                continue
+            values = next(reader)
+            if not values or not any(v.strip() for v in values):
+                continue
+            recordno += 1
+            if header is None:
+                header = [h.strip() for h in values]
+                continue
+            if len(values) != len(header):
+                raise BulkError(f"row {recordno}: {len(values)} cells, the header has {len(header)}")
+            # empty CSV cells (e.g. no lat/lng) mean "not set"
+            yield recordno, {k: v for k, v in zip(header, values) if v != ""}
+        if feed.in_record:
+            raise BulkError(f"row {recordno + 1}: unterminated quoted field")
+
+    elif content_type == "application/json":
+        try:
+            items = json.loads(await request.body())
+        except ValueError:
+            raise BulkError("invalid JSON")
+        if not isinstance(items, list):
+            raise BulkError("expected a JSON array of rows")
+        for i, item in enumerate(items, 1):
+            yield i, item
+
+    else:
+        raise BulkError(f"unsupported content type: {content_type or 'none'}")
+
+def _insert_rows(session: Session, rows: List[dict]):
+    # executemany -> multi-row INSERT pages on psycopg2
+    session.execute(insert(DistributionRecord), rows)
+    add_to_rollup(session, rows)
+    add_to_cells(session, rows)
+
+def _insert_upload(session: Session, campaign_id: int, spool: IO[bytes], rows: int, distributed: int, rows_sha256: str) -> dict:
+    upload = DistributionUpload(campaign_id=campaign_id)
+    session.add(upload)
+    session.flush()
+
+    now = datetime.utcnow()
+    chunk: List[dict] = []
+    for line in spool:
+        d = json.loads(line)
+        chunk.append({
+            "campaign_id": campaign_id,
+            "location_name": d["location_name"],
+            "distributed_count": d["distributed_count"],
+            "lat": d["lat"],
+            "lng": d["lng"],
+            "geohash": geohash_or_none(d["lat"], d["lng"]),
+            "distributed_at": now,
+            "upload_id": upload.id,
+        })
+        if len(chunk) >= BULK_CHUNK_ROWS:
+            _insert_rows(session, chunk)
+            chunk = []
+    if chunk:
+        _insert_rows(session, chunk)
+    return _finish_upload(session, upload, rows, distributed, rows_sha256)
+
+def _finish_upload(session: Session, upload: DistributionUpload, rows: int, distributed: int, rows_sha256: str) -> dict:
+    upload.rows = rows
+    upload.distributed_count = distributed
+    upload.rows_sha256 = rows_sha256
+    upload.proof_hash = compute_sha256_of_object(distribution_upload_proof_obj(upload))
+    session.add(upload)
+    enqueue_proof(session, "distribution_upload", upload.id, upload.proof_hash)
+
+    # distributed and locations_count in one UPDATE of the campaign row
+    increment(session, upload.campaign_id, distributed=distributed, locations_count=distinct_locations())
+    session.commit()
+    response_cache.invalidate(upload.campaign_id)
+    events.publish(upload.campaign_id, {
+        "type": "distribution_upload", "upload_id": upload.id, "rows": rows, "distributed_count": distributed,
+    })
+    return {
+        "upload_id": upload.id,
+        "rows": rows,
+        "distributed_count": distributed,
+        "proof_hash": upload.proof_hash,
+        "txid": None,
+    }
+
+async def ingest_distributions(db, request: Request, campaign_id: int) -> dict:
+    """
+    Parse and validate every row of the request, then insert them all. Raises
+    BulkError on the first bad row; nothing is written in that case. The
+    caller must not hold a transaction open while the body streams in.
+    """
+    digest = hashlib.sha256()
+    rows = 0
+    distributed = 0
+
+    with tempfile.SpooledTemporaryFile(max_size=BULK_SPOOL_MEMORY_BYTES) as spool:
+        async for lineno, raw in iter_raw_rows(request):
+            try:
+                d = DistIn.parse_obj(raw)
+            except ValidationError as e:
+                raise BulkError(f"row {lineno}: {e.errors()[0]['loc'][0]}: {e.errors()[0]['msg']}")
+
+            rows += 1
+            if rows > BULK_MAX_ROWS:
+                raise BulkError(f"at most {BULK_MAX_ROWS} rows per upload")
+            distributed += d.distributed_count
+            line = row_line(d.dict())
+            digest.update(line)
+            spool.write(line)
+
+        if not rows:
+            raise BulkError("no rows")
+        spool.seek(0)
+        return await db.run(_insert_upload, campaign_id, spool, rows, distributed, digest.hexdigest())
@@ -0,0 +1,153 @@
+# app/counters.py
+"""
+Campaign.manufactured / distributed maintenance.
+
+Writers never read-modify-write the counters. `increment` issues
+`UPDATE campaign SET x = x + :n`, which the database applies atomically, so
+concurrent writers cannot lose each other's updates. Call it last, just
+before the commit, so the campaign row stays locked for as short a time as
+possible.
+
+For very hot campaigns even that one row lock serializes every writer. With
+COUNTER_SHARDS > 1 (optionally limited to the ids in
+COUNTER_SHARDED_CAMPAIGNS), increments instead go to one of N
+CampaignCounterShard rows picked at random (an upsert adding to it), and
+concurrent writers rarely wait on each other. Reads add the shards to the
+campaign's own columns (`add_shard_totals`).
+    python -m app.counters fold
+moves the shard totals into the campaign rows, e.g. before turning sharding off.
+"""
+import argparse
+import os
+import random
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+from sqlalchemy import delete, func, update
+from sqlmodel import Session, select
+
+from .crud import dialect_insert
+from .models import Campaign, CampaignCounterShard
+
+COUNTER_SHARDS = int(os.getenv("COUNTER_SHARDS", "1"))
+# comma-separated campaign ids; empty shards every campaign when COUNTER_SHARDS > 1
+COUNTER_SHARDED_CAMPAIGNS = {int(i) for i in os.getenv("COUNTER_SHARDED_CAMPAIGNS", "").split(",") if i.strip()}
+
+def is_sharded(campaign_id: int) -> bool:
+    return COUNTER_SHARDS > 1 and (not COUNTER_SHARDED_CAMPAIGNS or campaign_id in COUNTER_SHARDED_CAMPAIGNS)
+
+def increment(session: Session, campaign_id: int, manufactured: int = 0, distributed: int = 0, **columns):
+    """
+    Add to a campaign's counters (deltas may be negative). `columns` are other
+    Campaign columns to set in the same UPDATE; a sharded campaign gets them
+    in an UPDATE of their own, its counters going to a shard.
+    """
+    if columns and (is_sharded(campaign_id) or (not manufactured and not distributed)):
+        session.execute(
+            update(Campaign).where(Campaign.id == campaign_id).values(**columns)
+            .execution_options(synchronize_session=False)
+        )
+        columns = {}
+    if not manufactured and not distributed:
+        return
+    if not is_sharded(campaign_id):
+        session.execute(
+            update(Campaign)
+            .where(Campaign.id == campaign_id)
+            .values(
+                manufactured=Campaign.manufactured + manufactured, distributed=Campaign.distributed + distributed,
+                **columns
+            )
+            .execution_options(synchronize_session=False)
+        )
+        return
+
+    stmt = dialect_insert(session, CampaignCounterShard).values(
+        campaign_id=campaign_id, shard=random.randrange(COUNTER_SHARDS),
+        manufactured=manufactured, distributed=distributed
+    )
+    shard = CampaignCounterShard.__table__.c
+    session.execute(stmt.on_conflict_do_update(
+        index_elements=["campaign_id", "shard"],
+        set_={
+            "manufactured": shard.manufactured + stmt.excluded.manufactured,
+            "distributed": shard.distributed + stmt.excluded.distributed,
+        },
+    ))
+
+def shard_totals(session: Session, campaign_ids: List[int]) -> Dict[int, Tuple[int, int]]:
+    """campaign_id -> (manufactured, distributed) summed over its shards."""
+    if not campaign_ids:
+        return {}
+    rows = session.exec(
+        select(
+            CampaignCounterShard.campaign_id,
+            func.sum(CampaignCounterShard.manufactured),
+            func.sum(CampaignCounterShard.distributed)
+        )
+        .where(CampaignCounterShard.campaign_id.in_(campaign_ids))
+        .group_by(CampaignCounterShard.campaign_id)
+    ).all()
+    return {campaign_id: (m, d) for campaign_id, m, d in rows}
+
+def add_shard_totals(session: Session, campaigns: list):
+    """Add the shard totals to CampaignOut objects (not ORM rows, which would be written back)."""
+    totals = shard_totals(session, [c.id for c in campaigns])
+    for c in campaigns:
+        m, d = totals.get(c.id, (0, 0))
+        c.manufactured += m
+        c.distributed += d
+
+def fold(session: Session) -> int:
+    """Move every shard into its campaign's columns. Returns the number of campaigns updated."""
+    if session.get_bind().dialect.name == "postgresql":
+        # delete first and add what was deleted: increments committed meanwhile stay in their shards
+        shards = CampaignCounterShard.__table__
+        deleted = session.execute(
+            shards.delete().returning(shards.c.campaign_id, shards.c.manufactured, shards.c.distributed)
+        ).all()
+        totals = defaultdict(lambda: [0, 0])
+        for campaign_id, m, d in deleted:
+            totals[campaign_id][0] += m
+            totals[campaign_id][1] += d
+        for campaign_id, (m, d) in sorted(totals.items()):
+            session.execute(
+                update(Campaign).where(Campaign.id == campaign_id)
+                .values(manufactured=Campaign.manufactured + m, distributed=Campaign.distributed + d)
+            )
+        session.commit()
+        return len(totals)
+
+    # SQLite: the first UPDATE takes the database write lock, so nothing can
+    # change the shards between the two statements
+    def shard_sum(column):
+        return (
+            select(func.coalesce(func.sum(column), 0))
+            .where(CampaignCounterShard.campaign_id == Campaign.id)
+            .scalar_subquery()
+        )
+    updated = session.execute(
+        update(Campaign)
+        .where(Campaign.id.in_(select(CampaignCounterShard.campaign_id)))
+        .values(
+            manufactured=Campaign.manufactured + shard_sum(CampaignCounterShard.manufactured),
+            distributed=Campaign.distributed + shard_sum(CampaignCounterShard.distributed)
+        )
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    session.execute(delete(CampaignCounterShard))
+    session.commit()
+    return updated
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m app.counters")
+    parser.add_argument("command", choices=["fold"])
+    parser.parse_args()
+
+    from .database import engine
+    with Session(engine) as session:
+        folded = fold(session)
+    print(f"folded counter shards into {folded} campaigns")
+
+if __name__ == "__main__":
+    main()
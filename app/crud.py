@@ -0,0 +1,109 @@
+# app/crud.py
+from datetime import date
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import and_
+from sqlmodel import Session, select
+
+from .models import DailyActivity, DailyLocationRollup
+
+def dialect_insert(session: Session, model):
+    """An INSERT for the session's database that supports ON CONFLICT clauses."""
+    if session.get_bind().dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(model)
+
+def get_locations_by_day(session: Session, campaign_id: int, days: Iterable[date]) -> Dict[date, List[dict]]:
+    """
+    Load the distribution locations of a campaign for the given days from the
+    daily rollup (one entry per location and day) with a single range query.
+    Returns a mapping of day -> list of location dicts; every requested day is
+    present, even when it has no locations.
+    """
+    wanted = set(days)
+    locations = {d: [] for d in wanted}
+    if not wanted:
+        return locations
+
+    rows = session.exec(
+        select(
+            DailyLocationRollup.day,
+            DailyLocationRollup.location_name,
+            DailyLocationRollup.distributed_count,
+            DailyLocationRollup.lat,
+            DailyLocationRollup.lng
+        ).where(
+            and_(
+                DailyLocationRollup.campaign_id == campaign_id,
+                DailyLocationRollup.day >= min(wanted),
+                DailyLocationRollup.day <= max(wanted)
+            )
+        ).order_by(DailyLocationRollup.id)
+    ).all()
+
+    for day, location_name, distributed_count, lat, lng in rows:
+        if day in wanted:
+            locations[day].append({
+                "location_name": location_name,
+                "distributed_count": distributed_count,
+                "lat": lat,
+                "lng": lng
+            })
+
+    return locations
+
+def get_daily_activity_rows(
+    session: Session,
+    campaign_id: int,
+    limit: Optional[int] = None,
+    before_day: Optional[date] = None,
+    days: Optional[List[date]] = None
+) -> List[dict]:
+    """
+    A campaign's daily activities, newest first, as plain dicts shaped like
+    DailyActivityOut (locations included). Rows are built once from column
+    tuples, without ORM objects or pydantic validation, for the read paths
+    that encode them directly.
+    """
+    statement = (
+        select(
+            DailyActivity.day,
+            DailyActivity.manufactured_today,
+            DailyActivity.distributed_today,
+            DailyActivity.scan_count_today,
+            DailyActivity.live_scans,
+            DailyActivity.id,
+            DailyActivity.sha256,
+            DailyActivity.algorand_txid,
+            DailyActivity.created_at
+        )
+        .where(DailyActivity.campaign_id == campaign_id)
+        .order_by(DailyActivity.day.desc())
+    )
+    if before_day is not None:
+        statement = statement.where(DailyActivity.day < before_day)
+    if days is not None:
+        statement = statement.where(DailyActivity.day.in_(days))
+    if limit is not None:
+        statement = statement.limit(limit)
+    rows = session.exec(statement).all()
+
+    locations_by_day = get_locations_by_day(session, campaign_id, [r[0] for r in rows])
+    return [
+        {
+            "day": day,
+            "manufactured_today": manufactured,
+            "distributed_today": distributed,
+            "scan_count_today": scans,
+            "id": activity_id,
+            "campaign_id": campaign_id,
+            "locations": locations_by_day[day],
+            "live_scans": live_scans,
+            "sha256": sha256,
+            "algorand_txid": txid,
+            "created_at": created_at,
+        }
+        for day, manufactured, distributed, scans, live_scans, activity_id, sha256, txid, created_at in rows
+    ]
@@ -0,0 +1,248 @@
+# app/events.py
+"""
+Live campaign updates for GET /campaigns/{id}/events (Server-Sent Events).
+
+Writers call `events.publish(campaign_id, event)` after committing. The hub
+hands the event to its backend, and the backend delivers it to the hub of
+every worker process, which fans it out to the streams subscribed to that
+campaign in that process. Events are small dicts of plain JSON values (days
+as ISO strings) with a "type":
+
+    manufacturing_batch  {"batch": {id, batch_number, manufactured_count, proof_hash}}
+    distribution         {"distribution": {id, day, location_name, distributed_count, lat, lng, proof_hash}}
+    distribution_upload  {"upload_id", "rows", "distributed_count"}
+    daily_activity       {"day", "activity_id"}
+    anchored             {"records": [{"related_type", "related_id", "txid"}]}
+    live_scans           {"day", "added"}
+
+Streams don't send these deltas on for the client to add up: an event that
+was already part of the summary a stream started with would be counted
+twice. They send the current state of what changed instead (see
+`changed_day` and the stream in main), which is safe to apply again.
+
+The default backend (LocalBackend) delivers within this process only, which
+is all a single worker and the benchmarks need. With several worker
+processes, point EVENTS_BACKEND at a factory ("package.module:function")
+returning a backend with the same start/publish/stop methods that goes
+through a shared broker (e.g. Redis pub/sub); otherwise a stream only sees
+the writes handled by its own worker.
+
+The day rows and totals a batch of events calls for are the same for every
+stream of the campaign, so streams ask the hub for them (`shared_payload`)
+instead of each querying: the hub counts the events it delivers per campaign
+(a generation), and the first stream to ask for a generation starts the
+query; the others await the same bytes. A result is reused by any stream
+whose events are no newer than the ones delivered before the query started.
+
+Each stream has a queue of EVENTS_QUEUE_SIZE events. When a slow client lets
+it fill up, the queue is replaced by a single "resync" event and the stream
+sends the whole summary again, so publishers never wait for clients.
+"""
+import asyncio
+import importlib
+import logging
+import os
+import threading
+from collections import defaultdict
+from typing import Awaitable, Callable, Dict, FrozenSet, List, Optional, Set
+
+import orjson
+
+from .metrics import REGISTRY, Counter, Gauge
+
+logger = logging.getLogger(__name__)
+
+EVENTS_BACKEND = os.getenv("EVENTS_BACKEND", "")
+EVENTS_QUEUE_SIZE = int(os.getenv("EVENTS_QUEUE_SIZE", "100"))
+# a comment line this often, so proxies don't close an idle stream
+EVENTS_KEEPALIVE_SECONDS = float(os.getenv("EVENTS_KEEPALIVE_SECONDS", "15"))
+# streams end after this long and the client reconnects, so shutdowns and
+# deploys don't wait on them and connections spread over new workers
+EVENTS_STREAM_SECONDS = float(os.getenv("EVENTS_STREAM_SECONDS", "300"))
+
+# events after which the stream sends the whole summary again (an upload changes many days)
+RESYNC_TYPES = {"resync", "distribution_upload"}
+# events passed on to clients as they are, for activity feeds
+FORWARDED_TYPES = {"manufacturing_batch", "distribution", "anchored"}
+
+RESYNC = {"type": "resync"}
+
+events_published = Counter("events_published_total", "Campaign events published.", ["type"])
+events_resyncs = Counter("events_resyncs_total", "Streams that fell behind and were sent the summary again.")
+events_subscribers = Gauge("events_subscribers", "Open event streams in this process.", lambda: events.subscribers())
+REGISTRY.extend([events_published, events_resyncs, events_subscribers])
+
+Deliver = Callable[[int, dict], None]
+Render = Callable[[int, FrozenSet[str]], Awaitable[bytes]]
+
+class LocalBackend:
+    """Delivers events to this process's hub only."""
+
+    def __init__(self):
+        self._deliver: Optional[Deliver] = None
+
+    def start(self, deliver: Deliver):
+        self._deliver = deliver
+
+    def publish(self, campaign_id: int, event: dict):
+        if self._deliver is not None:
+            self._deliver(campaign_id, event)
+
+    def stop(self):
+        self._deliver = None
+
+def load_backend(spec: str):
+    """Build the backend named by "module:factory", or the in-process one."""
+    if not spec:
+        return LocalBackend()
+    module, _, factory = spec.partition(":")
+    return getattr(importlib.import_module(module), factory)()
+
+def changed_day(event: dict) -> Optional[str]:
+    """The day whose history row (and so the totals) the event changed, if any."""
+    if event["type"] == "distribution":
+        return event["distribution"]["day"]
+    if event["type"] in ("daily_activity", "live_scans"):
+        return event["day"]
+    return None
+
+def sse_message(event: str, data: bytes) -> bytes:
+    """One Server-Sent Events message; `data` is compact JSON (no newlines)."""
+    return b"event: " + event.encode() + b"\ndata: " + data + b"\n\n"
+
+def encode(event: dict) -> bytes:
+    return sse_message(event["type"], orjson.dumps(event))
+
+class Subscription:
+    """The events of one campaign for one stream. Use it on the loop it was created on."""
+
+    def __init__(self, hub: "EventHub", campaign_id: int, maxsize: int):
+        self.hub = hub
+        self.campaign_id = campaign_id
+        self.loop = asyncio.get_running_loop()
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize)
+        # the hub's generation of the last event queued
+        self.generation = 0
+
+    def _put(self, event: dict, generation: int):
+        self.generation = generation
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(RESYNC)
+            events_resyncs.inc()
+
+    async def next_batch(self, timeout: float) -> List[dict]:
+        """Wait up to `timeout` seconds for an event, then take all queued ones ([] on timeout)."""
+        try:
+            first = await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return []
+        batch = [first]
+        while not self.queue.empty():
+            batch.append(self.queue.get_nowait())
+        return batch
+
+    def close(self):
+        self.hub._unsubscribe(self)
+
+class _SharedPayload:
+    __slots__ = ("loop", "generation", "days", "task")
+
+    def __init__(self, loop, generation: int, days: FrozenSet[str], task: asyncio.Task):
+        self.loop = loop
+        self.generation = generation
+        self.days = days
+        self.task = task
+
+class EventHub:
+    def __init__(self, backend=None, queue_size: int = EVENTS_QUEUE_SIZE):
+        self.backend = backend if backend is not None else load_backend(EVENTS_BACKEND)
+        self.queue_size = queue_size
+        self._subscriptions: Dict[int, Set[Subscription]] = defaultdict(set)
+        # per subscribed campaign: events delivered, and the last shared payload
+        self._generations: Dict[int, int] = {}
+        self._payloads: Dict[int, _SharedPayload] = {}
+        self._lock = threading.Lock()
+
+    def start(self):
+        self.backend.start(self.deliver)
+
+    def stop(self):
+        self.backend.stop()
+
+    def subscribe(self, campaign_id: int) -> Subscription:
+        subscription = Subscription(self, campaign_id, self.queue_size)
+        with self._lock:
+            self._subscriptions[campaign_id].add(subscription)
+        return subscription
+
+    def _unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.campaign_id)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self._subscriptions[subscription.campaign_id]
+                    self._generations.pop(subscription.campaign_id, None)
+                    self._payloads.pop(subscription.campaign_id, None)
+
+    def subscribers(self) -> int:
+        with self._lock:
+            return sum(len(s) for s in self._subscriptions.values())
+
+    def publish(self, campaign_id: int, event: dict):
+        """Publish after the write has committed; safe from any thread, never raises."""
+        events_published.inc(event["type"])
+        try:
+            self.backend.publish(campaign_id, event)
+        except Exception:
+            # the write is committed either way; streams catch up on reconnect
+            logger.exception("Publishing %s event for campaign %s failed", event["type"], campaign_id)
+
+    def deliver(self, campaign_id: int, event: dict):
+        """Called by the backend, from any thread, for every event of any worker."""
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(campaign_id, ()))
+            if not subscriptions:
+                return
+            generation = self._generations[campaign_id] = self._generations.get(campaign_id, 0) + 1
+        for subscription in subscriptions:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription._put, event, generation)
+            except RuntimeError:
+                # its loop is closed; the stream is gone
+                self._unsubscribe(subscription)
+
+    async def shared_payload(self, subscription: Subscription, days: FrozenSet[str], render: Render) -> bytes:
+        """
+        `render(campaign_id, days)` for the events the subscription has taken,
+        run once for all the campaign's streams in this process: the result
+        of a render started after those events were delivered, for at least
+        these days, is reused.
+        """
+        campaign_id = subscription.campaign_id
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            shared = self._payloads.get(campaign_id)
+            if (
+                shared is None or shared.loop is not loop
+                or shared.generation < subscription.generation or not days <= shared.days
+            ):
+                # everything delivered so far was committed before it was published
+                generation = self._generations.get(campaign_id, 0)
+                shared = _SharedPayload(loop, generation, days, loop.create_task(render(campaign_id, days)))
+                if campaign_id in self._subscriptions:
+                    self._payloads[campaign_id] = shared
+        try:
+            # shielded: a client going away doesn't cancel the other streams' render
+            return await asyncio.shield(shared.task)
+        except Exception:
+            with self._lock:
+                if self._payloads.get(campaign_id) is shared:
+                    del self._payloads[campaign_id]
+            raise
+
+events = EventHub()
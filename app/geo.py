@@ -0,0 +1,395 @@
+# app/geo.py
+"""
+Geohash index of the distribution records, for the map endpoints.
+
+Every DistributionRecord with valid coordinates gets the geohash of its
+(lat, lng) on write (GEOHASH_PRECISION characters, cells of about 5 m). A
+geohash prefix is a rectangular cell and points inside it share the prefix,
+so a bounding box is covered by a few prefix ranges that the
+(campaign_id, geohash) index answers directly; the exact box or radius is
+then checked on the rows found.
+
+Heatmap tiles group points by the geohash prefix whose cells are a few
+pixels wide at the tile's zoom. Up to GEO_CELL_PRECISION characters (zoom
+11) the clusters come from DistributionGeoCell, which keeps per-cell totals
+up to date on write like the location rollup, so a zoomed-out tile reads at
+most a few thousand cell rows however many points the campaign has. Closer
+in, a tile covers a small area and is clustered from the records.
+
+Recompute the geohashes and cells from the coordinates:
+    python -m app.geo rebuild [--campaign ID]
+"""
+import argparse
+import math
+from datetime import datetime
+from typing import Iterable, List, Optional, Tuple
+
+from sqlalchemy import and_, bindparam, delete, func, insert, update
+from sqlmodel import Session, select
+
+from .crud import dialect_insert
+from .models import DistributionGeoCell, DistributionRecord
+
+GEOHASH_PRECISION = 9
+GEO_CELL_PRECISION = 6
+MAX_ZOOM = 20
+# prefix ranges per query; fewer, coarser cells read a little outside the box
+MAX_COVERING_CELLS = 16
+# rows a radius query reads from its bounding box before giving up on exactness
+NEARBY_SCAN_LIMIT = 50000
+REBUILD_CHUNK_ROWS = 5000
+EARTH_RADIUS_M = 6371008.8
+
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"  # in ASCII order, so prefixes sort like cells
+
+BBox = Tuple[float, float, float, float]  # min_lat, min_lng, max_lat, max_lng
+
+# ----------------- Geohash -----------------
+def encode(lat: float, lng: float, precision: int = GEOHASH_PRECISION) -> str:
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    chars = []
+    value = bits = 0
+    use_lng = True
+    while len(chars) < precision:
+        interval, coordinate = (lng_range, lng) if use_lng else (lat_range, lat)
+        mid = (interval[0] + interval[1]) / 2
+        value <<= 1
+        if coordinate >= mid:
+            value |= 1
+            interval[0] = mid
+        else:
+            interval[1] = mid
+        use_lng = not use_lng
+        bits += 1
+        if bits == 5:
+            chars.append(_BASE32[value])
+            value = bits = 0
+    return "".join(chars)
+
+def geohash_or_none(lat: Optional[float], lng: Optional[float]) -> Optional[str]:
+    """The geohash to store for a record; None when it has no usable coordinates."""
+    if lat is None or lng is None:
+        return None
+    if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+        return None
+    return encode(lat, lng)
+
+def cell_size(precision: int) -> Tuple[float, float]:
+    """(height in degrees of latitude, width in degrees of longitude) of a cell."""
+    bits = 5 * precision
+    return 180 / 2 ** (bits // 2), 360 / 2 ** ((bits + 1) // 2)
+
+def _grid(bbox: BBox, precision: int) -> Tuple[range, range]:
+    min_lat, min_lng, max_lat, max_lng = bbox
+    height, width = cell_size(precision)
+    rows = range(int((min_lat + 90) // height), int(min((max_lat + 90) // height, 180 / height - 1)) + 1)
+    cols = range(int((min_lng + 180) // width), int(min((max_lng + 180) // width, 360 / width - 1)) + 1)
+    return rows, cols
+
+def _successor(prefix: str) -> Optional[str]:
+    """The first prefix after every string starting with `prefix` (None: no such prefix)."""
+    prefix = prefix.rstrip(_BASE32[-1])
+    if not prefix:
+        return None
+    return prefix[:-1] + _BASE32[_BASE32.index(prefix[-1]) + 1]
+
+def covering_ranges(bbox: BBox, max_cells: int = MAX_COVERING_CELLS) -> List[Tuple[str, Optional[str]]]:
+    """
+    [low, high) geohash ranges covering a box that doesn't cross the
+    antimeridian: the cells of the finest precision that needs at most
+    `max_cells` of them, with neighbours in geohash order merged.
+    """
+    precision = 1
+    for p in range(2, GEOHASH_PRECISION + 1):
+        rows, cols = _grid(bbox, p)
+        if len(rows) * len(cols) > max_cells:
+            break
+        precision = p
+
+    height, width = cell_size(precision)
+    rows, cols = _grid(bbox, precision)
+    cells = sorted({
+        encode(-90 + (r + 0.5) * height, -180 + (c + 0.5) * width, precision) for r in rows for c in cols
+    })
+    ranges = []
+    for cell in cells:
+        if ranges and ranges[-1][1] == cell:
+            ranges[-1][1] = _successor(cell)
+        else:
+            ranges.append([cell, _successor(cell)])
+    return [(low, high) for low, high in ranges]
+
+# ----------------- Boxes, tiles and distances -----------------
+def split_bbox(bbox: BBox) -> List[BBox]:
+    """A box crossing the antimeridian (min_lng > max_lng) as two boxes."""
+    min_lat, min_lng, max_lat, max_lng = bbox
+    if min_lng <= max_lng:
+        return [bbox]
+    return [(min_lat, min_lng, max_lat, 180.0), (min_lat, -180.0, max_lat, max_lng)]
+
+def tile_bbox(z: int, x: int, y: int) -> BBox:
+    """Bounds of a web map (slippy map / Web Mercator) tile."""
+    n = 2 ** z
+
+    def lat(row):
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * row / n))))
+    return lat(y + 1), x / n * 360 - 180, lat(y), (x + 1) / n * 360 - 180
+
+def tile_precision(z: int) -> int:
+    """Geohash length whose cells are 1/16 to 1/32 of a tile's width at zoom z."""
+    for precision in range(1, GEOHASH_PRECISION + 1):
+        if (5 * precision + 1) // 2 >= z + 4:
+            return precision
+    return GEOHASH_PRECISION
+
+def distance_m(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    """Great-circle (haversine) distance in meters."""
+    dlat = math.radians(lat2 - lat1)
+    dlng = math.radians(lng2 - lng1)
+    a = math.sin(dlat / 2) ** 2 + math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) * math.sin(dlng / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(min(1.0, math.sqrt(a)))
+
+def radius_bbox(lat: float, lng: float, radius_m: float) -> BBox:
+    """A box containing the circle; crosses the antimeridian (min_lng > max_lng) when the circle does."""
+    dlat = math.degrees(radius_m / EARTH_RADIUS_M)
+    min_lat, max_lat = max(-90.0, lat - dlat), min(90.0, lat + dlat)
+    cos_lat = math.cos(math.radians(max(abs(min_lat), abs(max_lat))))
+    if max_lat >= 90 or min_lat <= -90 or dlat / max(cos_lat, 1e-12) >= 180:
+        return min_lat, -180.0, max_lat, 180.0
+    dlng = dlat / cos_lat
+    min_lng, max_lng = lng - dlng, lng + dlng
+    if min_lng < -180:
+        min_lng += 360
+    if max_lng > 180:
+        max_lng -= 360
+    return min_lat, min_lng, max_lat, max_lng
+
+# ----------------- Cells, kept up to date on write -----------------
+def _add_cells(session: Session, totals: dict):
+    if not totals:
+        return
+    stmt = dialect_insert(session, DistributionGeoCell).values([
+        {"campaign_id": campaign_id, "cell": cell, "records": t[0], "distributed_count": t[1], "lat_sum": t[2], "lng_sum": t[3]}
+        for (campaign_id, cell), t in sorted(totals.items())
+    ])
+    cells = DistributionGeoCell.__table__.c
+    session.execute(stmt.on_conflict_do_update(
+        index_elements=["campaign_id", "cell"],
+        set_={
+            "records": cells.records + stmt.excluded.records,
+            "distributed_count": cells.distributed_count + stmt.excluded.distributed_count,
+            "lat_sum": cells.lat_sum + stmt.excluded.lat_sum,
+            "lng_sum": cells.lng_sum + stmt.excluded.lng_sum,
+        }
+    ))
+
+def add_to_cells(session: Session, rows: Iterable[dict]):
+    """
+    Add distribution rows (dicts with campaign_id, geohash,
+    distributed_count, lat and lng) to the cells with one upsert.
+    """
+    # merged first: one statement may not update a row twice
+    totals = {}
+    for r in rows:
+        if r.get("geohash") is None:
+            continue
+        key = (r["campaign_id"], r["geohash"][:GEO_CELL_PRECISION])
+        t = totals.setdefault(key, [0, 0, 0.0, 0.0])
+        t[0] += 1
+        t[1] += r["distributed_count"]
+        t[2] += r["lat"]
+        t[3] += r["lng"]
+    _add_cells(session, totals)
+
+def remove_from_cells(session: Session, campaign_id: int, start: datetime, end: datetime):
+    """Take the campaign's records distributed in [start, end) out of the cells, before deleting them."""
+    cell = func.substr(DistributionRecord.geohash, 1, GEO_CELL_PRECISION)
+    rows = session.exec(
+        select(
+            cell,
+            func.count(),
+            func.sum(DistributionRecord.distributed_count),
+            func.sum(DistributionRecord.lat),
+            func.sum(DistributionRecord.lng)
+        )
+        .where(
+            DistributionRecord.campaign_id == campaign_id,
+            DistributionRecord.distributed_at >= start,
+            DistributionRecord.distributed_at < end,
+            DistributionRecord.geohash.is_not(None)
+        )
+        .group_by(cell)
+    ).all()
+    if not rows:
+        return
+    _add_cells(session, {(campaign_id, c): [-n, -d, -lat, -lng] for c, n, d, lat, lng in rows})
+    session.execute(
+        delete(DistributionGeoCell)
+        .where(DistributionGeoCell.campaign_id == campaign_id, DistributionGeoCell.records <= 0)
+        .execution_options(synchronize_session=False)
+    )
+
+def rebuild(session: Session, campaign_id: Optional[int] = None) -> int:
+    """Recompute the records' geohashes and the cells. Returns the number of records read."""
+    records = select(DistributionRecord.id, DistributionRecord.lat, DistributionRecord.lng).order_by(DistributionRecord.id)
+    if campaign_id is not None:
+        records = records.where(DistributionRecord.campaign_id == campaign_id)
+
+    set_geohash = (
+        update(DistributionRecord.__table__)
+        .where(DistributionRecord.__table__.c.id == bindparam("record_id"))
+        .values(geohash=bindparam("record_geohash"))
+    )
+    total = 0
+    for chunk in session.execute(records.execution_options(yield_per=REBUILD_CHUNK_ROWS)).partitions():
+        session.execute(set_geohash, [{"record_id": r[0], "record_geohash": geohash_or_none(r[1], r[2])} for r in chunk])
+        total += len(chunk)
+
+    rebuild_cells(session, campaign_id)
+    session.commit()
+    return total
+
+def rebuild_cells(session: Session, campaign_id: Optional[int] = None):
+    """Recompute the cells from the records' geohashes, in the caller's transaction."""
+    clear = delete(DistributionGeoCell)
+    if campaign_id is not None:
+        clear = clear.where(DistributionGeoCell.campaign_id == campaign_id)
+    session.execute(clear.execution_options(synchronize_session=False))
+    cell = func.substr(DistributionRecord.geohash, 1, GEO_CELL_PRECISION)
+    totals = (
+        select(
+            DistributionRecord.campaign_id,
+            cell,
+            func.count(),
+            func.sum(DistributionRecord.distributed_count),
+            func.sum(DistributionRecord.lat),
+            func.sum(DistributionRecord.lng)
+        )
+        .where(DistributionRecord.geohash.is_not(None))
+        .group_by(DistributionRecord.campaign_id, cell)
+    )
+    if campaign_id is not None:
+        totals = totals.where(DistributionRecord.campaign_id == campaign_id)
+    session.execute(insert(DistributionGeoCell).from_select(
+        ["campaign_id", "cell", "records", "distributed_count", "lat_sum", "lng_sum"], totals
+    ))
+
+# ----------------- Queries -----------------
+# One statement per prefix range: databases use the (campaign_id, geohash)
+# index for a single range, not for an OR of several.
+POINT_COLUMNS = ("id", "location_name", "lat", "lng", "distributed_count", "distributed_at")
+
+def in_range(column, low: str, high: Optional[str]):
+    return and_(column >= low, column < high) if high else column >= low
+
+def _box_points(session: Session, campaign_id: int, bbox: BBox, limit: int) -> List[tuple]:
+    """Up to `limit` records in a box that doesn't cross the antimeridian, in geohash order."""
+    table = DistributionRecord.__table__
+    min_lat, min_lng, max_lat, max_lng = bbox
+    rows = []
+    for low, high in covering_ranges(bbox):
+        rows.extend(session.exec(
+            select(*(table.c[name] for name in POINT_COLUMNS))
+            .where(
+                table.c.campaign_id == campaign_id,
+                in_range(table.c.geohash, low, high),
+                table.c.lat.between(min_lat, max_lat),
+                table.c.lng.between(min_lng, max_lng)
+            )
+            .order_by(table.c.geohash)
+            .limit(limit - len(rows))
+        ).all())
+        if len(rows) >= limit:
+            break
+    return rows
+
+def points_in_bbox(session: Session, campaign_id: int, bbox: BBox, limit: int) -> Tuple[List[dict], bool]:
+    """
+    Up to `limit` records inside the box and whether there were more. They
+    come in geohash order, so a truncated result is a contiguous area
+    rather than a sample.
+    """
+    rows = []
+    for box in split_bbox(bbox):
+        rows.extend(_box_points(session, campaign_id, box, limit + 1 - len(rows)))
+    return [dict(zip(POINT_COLUMNS, r)) for r in rows[:limit]], len(rows) > limit
+
+def points_near(session: Session, campaign_id: int, lat: float, lng: float, radius_m: float, limit: int) -> Tuple[List[dict], bool]:
+    """Up to `limit` records within `radius_m` meters, nearest first, and whether there were more."""
+    rows = []
+    for box in split_bbox(radius_bbox(lat, lng, radius_m)):
+        rows.extend(_box_points(session, campaign_id, box, NEARBY_SCAN_LIMIT + 1 - len(rows)))
+    scanned_all = len(rows) <= NEARBY_SCAN_LIMIT
+
+    points = []
+    for r in rows:
+        distance = distance_m(lat, lng, r[2], r[3])
+        if distance <= radius_m:
+            point = dict(zip(POINT_COLUMNS, r))
+            point["distance_m"] = round(distance, 1)
+            points.append(point)
+    points.sort(key=lambda p: p["distance_m"])
+    return points[:limit], len(points) > limit or not scanned_all
+
+def heatmap_tile(session: Session, campaign_id: int, z: int, x: int, y: int) -> dict:
+    """
+    The campaign's records in a map tile, clustered by geohash prefix. A
+    cluster belongs to the tile its center (the mean of its points) is in,
+    so every cluster is in exactly one tile of a zoom level.
+    """
+    bbox = tile_bbox(z, x, y)
+    precision = tile_precision(z)
+    if precision <= GEO_CELL_PRECISION:
+        table = DistributionGeoCell.__table__
+        hashes = table.c.cell
+        aggregates = (func.sum(table.c.records), func.sum(table.c.distributed_count), func.sum(table.c.lat_sum), func.sum(table.c.lng_sum))
+    else:
+        table = DistributionRecord.__table__
+        hashes = table.c.geohash
+        aggregates = (func.count(), func.sum(table.c.distributed_count), func.sum(table.c.lat), func.sum(table.c.lng))
+    prefix = func.substr(hashes, 1, precision)
+
+    totals = {}
+    for low, high in covering_ranges(bbox):
+        rows = session.exec(
+            select(prefix, *aggregates)
+            .where(table.c.campaign_id == campaign_id, in_range(hashes, low, high))
+            .group_by(prefix)
+        ).all()
+        for cell, *values in rows:
+            t = totals.setdefault(cell, [0, 0, 0.0, 0.0])
+            for i, value in enumerate(values):
+                t[i] += value
+
+    clusters = []
+    for cell, (records, distributed, lat_sum, lng_sum) in sorted(totals.items()):
+        if records <= 0:
+            continue
+        lat, lng = lat_sum / records, lng_sum / records
+        # tiles include their west and north edges
+        if bbox[0] < lat <= bbox[2] and bbox[1] <= lng < bbox[3]:
+            clusters.append({
+                "cell": cell, "lat": round(lat, 6), "lng": round(lng, 6),
+                "records": records, "distributed_count": distributed,
+            })
+    return {
+        "z": z, "x": x, "y": y,
+        "precision": precision,
+        "records": sum(c["records"] for c in clusters),
+        "clusters": clusters,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m app.geo")
+    parser.add_argument("command", choices=["rebuild"])
+    parser.add_argument("--campaign", type=int, help="only this campaign")
+    args = parser.parse_args()
+
+    from .database import engine
+    with Session(engine) as session:
+        total = rebuild(session, args.campaign)
+    print(f"rebuilt geohashes and cells of {total} distribution records")
+
+if __name__ == "__main__":
+    main()
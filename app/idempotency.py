@@ -0,0 +1,147 @@
+# app/idempotency.py
+"""
+Idempotency-Key support for the single-record write endpoints.
+
+A write sent with an Idempotency-Key claims (brand, key) in the same
+transaction as the write and stores its response there before committing.
+A retry with the same key and request gets the stored response back; the
+write, the counter update and the proof (and so the Algorand fee) happen once.
+Two retries in flight at the same time are serialized by the unique
+constraint: the insert of the second waits for the first to commit, then
+finds its row.
+
+Completed keys are also kept in an in-process cache, so most retries are
+answered without touching the database. Keys expire after
+IDEMPOTENCY_TTL_SECONDS; expired rows are deleted every
+IDEMPOTENCY_PURGE_SECONDS by whichever request comes next, or with
+    python -m app.idempotency purge
+"""
+import argparse
+import json
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import delete, update
+from sqlmodel import Session, select
+
+from .algorand_client import compute_sha256_of_object
+from .cache import TTLCache
+from .crud import dialect_insert
+from .models import IdempotencyKey
+
+IDEMPOTENCY_TTL_SECONDS = float(os.getenv("IDEMPOTENCY_TTL_SECONDS", "86400"))
+IDEMPOTENCY_PURGE_SECONDS = float(os.getenv("IDEMPOTENCY_PURGE_SECONDS", "3600"))
+IDEMPOTENCY_CACHE_SIZE = int(os.getenv("IDEMPOTENCY_CACHE_SIZE", "10000"))
+
+# (brand_id, key) -> (request_hash, response) of committed writes
+completed = TTLCache(maxsize=IDEMPOTENCY_CACHE_SIZE, ttl=IDEMPOTENCY_TTL_SECONDS)
+
+class IdempotencyKeyReused(Exception):
+    pass
+
+def purge_expired(session: Session) -> int:
+    """Delete expired keys, in the caller's transaction. Returns the number deleted."""
+    result = session.execute(
+        delete(IdempotencyKey).where(IdempotencyKey.expires_at <= datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount
+
+_purge_lock = threading.Lock()
+_next_purge = 0.0
+
+def _purge_due() -> bool:
+    global _next_purge
+    with _purge_lock:
+        if time.monotonic() < _next_purge:
+            return False
+        _next_purge = time.monotonic() + IDEMPOTENCY_PURGE_SECONDS
+        return True
+
+class IdempotentRequest:
+    """One write request carrying an Idempotency-Key."""
+
+    def __init__(self, brand_id: int, key: str, request_hash: str):
+        self.brand_id = brand_id
+        self.key = key
+        self.request_hash = request_hash
+        self.replayed = False
+
+    @classmethod
+    def from_request(cls, key: Optional[str], brand_id: int, endpoint: str, campaign_id: int, body: dict) -> Optional["IdempotentRequest"]:
+        if key is None:
+            return None
+        request_hash = compute_sha256_of_object({"endpoint": endpoint, "campaign_id": campaign_id, "body": body})
+        return cls(brand_id, key, request_hash)
+
+    def _replay(self, request_hash: str, response: Optional[str]) -> dict:
+        if request_hash != self.request_hash:
+            raise IdempotencyKeyReused("Idempotency-Key was already used with a different request")
+        self.replayed = True
+        return json.loads(response)
+
+    def cached(self) -> Optional[dict]:
+        """The stored response if this key completed in this process, without a query."""
+        entry = completed.get((self.brand_id, self.key))
+        return self._replay(*entry) if entry is not None else None
+
+    def claim(self, session: Session) -> Optional[dict]:
+        """
+        Claim the key for this request inside the write's transaction, or
+        return the response of the earlier request that holds it.
+        """
+        if _purge_due():
+            purge_expired(session)
+
+        now = datetime.utcnow()
+        session.execute(
+            delete(IdempotencyKey)
+            .where(IdempotencyKey.brand_id == self.brand_id, IdempotencyKey.key == self.key, IdempotencyKey.expires_at <= now)
+            .execution_options(synchronize_session=False)
+        )
+        claimed = session.execute(
+            dialect_insert(session, IdempotencyKey).values(
+                brand_id=self.brand_id, key=self.key, request_hash=self.request_hash,
+                created_at=now, expires_at=now + timedelta(seconds=IDEMPOTENCY_TTL_SECONDS)
+            ).on_conflict_do_nothing(index_elements=["brand_id", "key"])
+        ).rowcount
+        if claimed:
+            return None
+
+        row = session.exec(
+            select(IdempotencyKey.request_hash, IdempotencyKey.response)
+            .where(IdempotencyKey.brand_id == self.brand_id, IdempotencyKey.key == self.key)
+        ).one()
+        # the transaction wrote nothing but expired keys; end it before replaying
+        session.commit()
+        return self._replay(*row)
+
+    def record(self, session: Session, response: dict):
+        """Store the response with the claimed key; call before the write commits."""
+        session.execute(
+            update(IdempotencyKey)
+            .where(IdempotencyKey.brand_id == self.brand_id, IdempotencyKey.key == self.key)
+            .values(response=json.dumps(response))
+            .execution_options(synchronize_session=False)
+        )
+
+    def remember(self, response: dict):
+        """Cache the response once the write has committed."""
+        completed.set((self.brand_id, self.key), (self.request_hash, json.dumps(response)))
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m app.idempotency")
+    parser.add_argument("command", choices=["purge"])
+    parser.parse_args()
+
+    from .database import engine
+    with Session(engine) as session:
+        deleted = purge_expired(session)
+        session.commit()
+    print(f"deleted {deleted} expired idempotency keys")
+
+if __name__ == "__main__":
+    main()
@@ -1,30 +1,56 @@
 # app/main.py
 
 # -------------------- app/main.py --------------------
-from fastapi import FastAPI, HTTPException, Depends
+from fastapi import FastAPI, HTTPException, Depends, Header, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from fastapi.middleware.cors import CORSMiddleware
+from starlette.concurrency import run_in_threadpool
 from sqlmodel import Session, select
-from typing import List, Optional
+from typing import AsyncIterator, FrozenSet, List, Literal, Optional, Tuple
 from datetime import datetime, date, time, timedelta
-from sqlalchemy import and_
-import os, json
-from dotenv import load_dotenv
-load_dotenv()
-
-from .database import init_db, get_session, engine
-from .models import Brand, Campaign, ManufacturingBatch, DistributionRecord, DailyActivity
+from sqlalchemy import delete, distinct, func, insert
+import asyncio, os, json
+import orjson
+
+from .database import DB, DB_MIGRATE_ON_STARTUP, init_db, get_db, engine, pool_metrics, run_in_session
+from .crud import dialect_insert, get_daily_activity_rows, get_locations_by_day
+from .analytics import brand_activity_buckets
+from .rollup import add_to_rollup, refresh_locations_count, replace_rollup_day
+from .geo import MAX_ZOOM, add_to_cells, geohash_or_none, heatmap_tile, points_in_bbox, points_near, remove_from_cells
+from .counters import add_shard_totals, increment
+from .response_cache import etag_for, response_cache
+from .metrics import MetricsMiddleware, PROMETHEUS_CONTENT_TYPE, TimedORJSONResponse, render_metrics
+from .bulk import BulkError, ingest_distributions
+from .idempotency import IdempotencyKeyReused, IdempotentRequest
+from .scans import ScanBuffer
+from .events import (
+    EVENTS_KEEPALIVE_SECONDS, EVENTS_STREAM_SECONDS, FORWARDED_TYPES, RESYNC_TYPES, changed_day, events, sse_message
+)
+from .events import encode as encode_event
+from .cache import TTLCache
+from .export import FORMATS as EXPORT_FORMATS, export_chunks
+from .verification import indexer_notes, load_verification_targets, verify_targets
+from .models import Brand, Campaign, ManufacturingBatch, DistributionRecord, DailyActivity, DailyLocationRollup, BlockchainProof
 from .schemas import (
-    BrandCreate, BrandOut, Token,
+    BrandCreate, BrandOut, BrandClaims, Token,
     CampaignCreate, CampaignOut,
     DailyActivityCreate, DailyActivityOut,
-    LocationIn, CampaignDailySummary
+    LocationIn, CampaignDailySummary, BrandAnalyticsOut, InclusionProofOut,
+    VerifyRequest, VerificationResult, BatchIn, DistIn, MapPointsOut, HeatmapTileOut
+)
+from .auth import (
+    hash_password, check_password, shutdown_password_executor, create_access_token, decode_access_token,
+    AUTH_MODE, brand_versions, campaign_owners, invalidate_brand
+)
+from .algorand_client import compute_sha256_of_object
+from .anchoring import (
+    AnchorWorker, ANCHOR_WORKER_ENABLED, PROOF_COLUMNS, enqueue_proof,
+    batch_proof_obj, distribution_proof_obj, daily_activity_proof_obj
 )
-from .auth import get_password_hash, verify_password, create_access_token, decode_access_token
-from .algorand_client import compute_sha256_of_object, send_proof_hash_to_algorand
 
 # ----------------- FastAPI INSTANCE -----------------
-app = FastAPI(title="Disposable Cups Backend")
+app = FastAPI(title="Disposable Cups Backend", default_response_class=TimedORJSONResponse)
 
 # ----------------- CORS -----------------
 app.add_middleware(
@@ -33,429 +59,807 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "Idempotent-Replayed"],
 )
 
+# ----------------- Metrics -----------------
+# added last so it is outermost and its timings include the other middleware
+app.add_middleware(MetricsMiddleware)
+
 # ----------------- Startup -----------------
+def _invalidate_campaigns(campaign_ids):
+    for campaign_id in campaign_ids:
+        response_cache.invalidate(campaign_id)
+
+def _on_anchored(records_by_campaign):
+    # the dashboards show the txids the worker writes back
+    _invalidate_campaigns(records_by_campaign)
+    for campaign_id, records in records_by_campaign.items():
+        events.publish(campaign_id, {"type": "anchored", "records": records})
+
+def _on_scans_flushed(counts):
+    _invalidate_campaigns({campaign_id for campaign_id, _ in counts})
+    for (campaign_id, day), added in counts.items():
+        events.publish(campaign_id, {"type": "live_scans", "day": day.isoformat(), "added": added})
+
+anchor_worker = AnchorWorker(engine, on_anchored=_on_anchored)
+scan_buffer = ScanBuffer(engine, on_flushed=_on_scans_flushed)
+
 @app.on_event("startup")
 def on_startup():
-    init_db()
+    if DB_MIGRATE_ON_STARTUP:
+        init_db()
+    events.start()
+    scan_buffer.start()
+    if ANCHOR_WORKER_ENABLED:
+        anchor_worker.start()
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    scan_buffer.stop()
+    anchor_worker.stop()
+    events.stop()
+    await indexer_notes.aclose()
+    shutdown_password_executor()
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/token")
 
 # ----------------- Auth & Brand -----------------
 @app.post("/brands", response_model=BrandOut)
-def create_brand(brand: BrandCreate, session: Session = Depends(get_session)):
+async def create_brand(brand: BrandCreate, db: DB = Depends(get_db)):
+    # hash before the first db.run: the session only checks out a connection when first used
+    password_hash = await hash_password(brand.password)
+    return await db.run(_create_brand, brand, password_hash)
+
+@app.post('/brands/simple', response_model=BrandOut)
+async def create_brand_simple(brand: BrandCreate, db: DB = Depends(get_db)):
+    password_hash = await hash_password(brand.password)
+    return await db.run(_create_brand, brand, password_hash)
+
+def _create_brand(session: Session, brand: BrandCreate, password_hash: str) -> BrandOut:
     db_brand = Brand(
         name=brand.name,
         email=brand.email,
-        password_hash=get_password_hash(brand.password)
+        password_hash=password_hash
     )
     session.add(db_brand)
     session.commit()
     session.refresh(db_brand)
     return BrandOut.from_orm(db_brand)
 
-@app.post('/brands/simple', response_model=BrandOut)
-def create_brand_simple(brand: BrandCreate):
-    from .auth import get_password_hash as _hash
-    with Session(engine) as session:
-        db_brand = Brand(name=brand.name, email=brand.email, password_hash=_hash(brand.password))
-        session.add(db_brand)
-        session.commit()
-        session.refresh(db_brand)
-        return BrandOut.from_orm(db_brand)
-
 @app.post('/token', response_model=Token)
-def login_for_token(form_data: OAuth2PasswordRequestForm = Depends()):
-    with Session(engine) as session:
-        statement = select(Brand).where(Brand.email == form_data.username)
-        result = session.exec(statement).first()
+async def login_for_token(form_data: OAuth2PasswordRequestForm = Depends(), db: DB = Depends(get_db)):
+    result = await db.run(_brand_by_email, form_data.username)
+    # bcrypt takes far longer than the query; don't hold a pooled connection through it
+    await db.release()
+
+    if not result or not await check_password(form_data.password, result.password_hash):
+        raise HTTPException(400, "Incorrect email or password")
 
-        if not result or not verify_password(form_data.password, result.password_hash):
-            raise HTTPException(400, "Incorrect email or password")
+    access_token = create_access_token({"brand_id": result.id, "email": result.email, "ver": result.token_version})
+    return {"access_token": access_token, "token_type": "bearer"}
 
-        access_token = create_access_token({"brand_id": result.id, "email": result.email})
-        return {"access_token": access_token, "token_type": "bearer"}
+def _brand_by_email(session: Session, email: str) -> Optional[Brand]:
+    return session.exec(select(Brand).where(Brand.email == email)).first()
 
-async def get_current_brand(token: str = Depends(oauth2_scheme)):
+async def get_current_brand(token: str = Depends(oauth2_scheme), db: DB = Depends(get_db)):
     payload = decode_access_token(token)
     if not payload:
         raise HTTPException(401, "Invalid token")
 
     brand_id = payload.get("brand_id")
-    with Session(engine) as session:
-        brand = session.get(Brand, brand_id)
-        if not brand:
-            raise HTTPException(401, "Brand not found")
-        return brand
+    if AUTH_MODE == "stateless":
+        version = brand_versions.get(brand_id)
+        if version is None:
+            version = await db.run(_token_version, brand_id)
+            if version is None:
+                raise HTTPException(401, "Brand not found")
+            brand_versions.set(brand_id, version)
+        if payload.get("ver", 0) != version:
+            raise HTTPException(401, "Token revoked")
+        return BrandClaims(id=brand_id, email=payload.get("email"))
+
+    brand = await db.run(lambda session: session.get(Brand, brand_id))
+    if not brand:
+        raise HTTPException(401, "Brand not found")
+    if payload.get("ver", 0) != brand.token_version:
+        raise HTTPException(401, "Token revoked")
+    return brand
+
+def _token_version(session: Session, brand_id: int) -> Optional[int]:
+    return session.exec(select(Brand.token_version).where(Brand.id == brand_id)).first()
+
+@app.post('/brands/me/revoke-tokens')
+async def revoke_tokens(current_brand: Brand = Depends(get_current_brand), db: DB = Depends(get_db)):
+    """Invalidate every token issued to the current brand, including this one."""
+    version = await db.run(_bump_token_version, current_brand.id)
+    invalidate_brand(current_brand.id)
+    return {"token_version": version}
+
+def _bump_token_version(session: Session, brand_id: int) -> int:
+    brand = session.get(Brand, brand_id)
+    brand.token_version += 1
+    session.add(brand)
+    session.commit()
+    return brand.token_version
+
+def _check_campaign_owner(session: Session, campaign_id: int, brand_id: int):
+    """Ownership check that usually needs no query (cached campaign -> brand)."""
+    owner = campaign_owners.get(campaign_id)
+    if owner is None:
+        owner = session.exec(select(Campaign.brand_id).where(Campaign.id == campaign_id)).first()
+        if owner is not None:
+            campaign_owners.set(campaign_id, owner)
+    if owner != brand_id:
+        raise HTTPException(404, 'Campaign not found')
+
+def _get_owned_campaign(session: Session, campaign_id: int, brand_id: int) -> Campaign:
+    _check_campaign_owner(session, campaign_id, brand_id)
+    campaign = session.get(Campaign, campaign_id)
+    if not campaign:
+        raise HTTPException(404, 'Campaign not found')
+    return campaign
+
+def _if_none_match(request: Request) -> List[str]:
+    header = request.headers.get("if-none-match", "")
+    return [tag.strip().removeprefix("W/") for tag in header.split(",") if tag.strip()]
+
+async def _cached_campaign_body(run, campaign_id: int, brand_id: int, variant: str, build, *args) -> Tuple[str, bytes]:
+    """
+    (etag, JSON body) of a campaign read from the response cache, built with
+    `run(build, campaign_id, brand_id, *args)` on a miss.
+    """
+    key, entry = response_cache.lookup(campaign_id, variant)
+    if entry is None:
+        data = await run(build, campaign_id, brand_id, *args)
+        body = TimedORJSONResponse(data).body
+        entry = (etag_for(body), body)
+        response_cache.store(key, *entry)
+    return entry
+
+async def _cached_campaign_response(request: Request, db: DB, campaign_id: int, brand_id: int, variant: str, build, *args) -> Response:
+    """
+    Serve a campaign read from the response cache, building it with
+    `build(session, campaign_id, brand_id, *args)` on a miss. Answers 304
+    when the client already has the current version (If-None-Match).
+    """
+    if campaign_owners.get(campaign_id) != brand_id:
+        await db.run(_check_campaign_owner, campaign_id, brand_id)
+
+    etag, body = await _cached_campaign_body(db.run, campaign_id, brand_id, variant, build, *args)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    matches = _if_none_match(request)
+    if etag in matches or "*" in matches:
+        return Response(status_code=304, headers=headers)
+    return Response(body, media_type="application/json", headers=headers)
 
 # ----------------- Campaign endpoints -----------------
 @app.post('/campaigns', response_model=CampaignOut)
-def create_campaign(c: CampaignCreate, current_brand: Brand = Depends(get_current_brand)):
-    with Session(engine) as session:
-        db_campaign = Campaign(
-            name=c.name,
-            brand_id=current_brand.id,
-            start_date=c.start_date,
-            end_date=c.end_date
-        )
-        session.add(db_campaign)
-        session.commit()
-        session.refresh(db_campaign)
-        return CampaignOut.from_orm(db_campaign)
+async def create_campaign(c: CampaignCreate, current_brand: Brand = Depends(get_current_brand), db: DB = Depends(get_db)):
+    return await db.run(_create_campaign, c, current_brand.id)
+
+def _create_campaign(session: Session, c: CampaignCreate, brand_id: int) -> CampaignOut:
+    db_campaign = Campaign(
+        name=c.name,
+        brand_id=brand_id,
+        start_date=c.start_date,
+        end_date=c.end_date
+    )
+    session.add(db_campaign)
+    session.commit()
+    session.refresh(db_campaign)
+    campaign_owners.set(db_campaign.id, db_campaign.brand_id)
+    return CampaignOut.from_orm(db_campaign)
 
 @app.get('/campaigns', response_model=List[CampaignOut])
-def list_campaigns(current_brand: Brand = Depends(get_current_brand)):
-    with Session(engine) as session:
-        statement = select(Campaign).where(Campaign.brand_id == current_brand.id)
-        res = session.exec(statement).all()
-        return [CampaignOut.from_orm(r) for r in res]
+async def list_campaigns(current_brand: Brand = Depends(get_current_brand), db: DB = Depends(get_db)):
+    return await db.run(_list_campaigns, current_brand.id)
+
+def _list_campaigns(session: Session, brand_id: int) -> List[CampaignOut]:
+    statement = select(Campaign).where(Campaign.brand_id == brand_id)
+    res = session.exec(statement).all()
+    campaigns = [CampaignOut.from_orm(r) for r in res]
+    add_shard_totals(session, campaigns)
+    return campaigns
+
+# ----------------- Brand analytics -----------------
+@app.get('/analytics', response_model=BrandAnalyticsOut)
+async def get_brand_analytics(
+    bucket: Literal["day", "week", "month"] = "day",
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    by_campaign: bool = False,
+    current_brand: Brand = Depends(get_current_brand),
+    db: DB = Depends(get_db)
+):
+    """
+    Manufactured, distributed and scan totals of all the brand's campaigns per
+    day, week (starting Monday) or month, optionally split by campaign.
+    `start` and `end` are inclusive.
+    """
+    if start and end and start > end:
+        raise HTTPException(422, 'start must not be after end')
+    buckets = await db.run(brand_activity_buckets, current_brand.id, bucket, start, end, by_campaign)
+    totals = {
+        "manufactured": sum(b["manufactured"] for b in buckets),
+        "distributed": sum(b["distributed"] for b in buckets),
+        "scans": sum(b["scans"] for b in buckets),
+        "live_scans": sum(b["live_scans"] for b in buckets)
+    }
+    return BrandAnalyticsOut(bucket=bucket, start=start, end=end, totals=totals, buckets=buckets)
 
 # ----------------- Campaign with daily summary -----------------
 @app.get('/campaigns/{campaign_id}', response_model=CampaignDailySummary)
-def get_campaign_with_summary(campaign_id: int, current_brand: Brand = Depends(get_current_brand)):
-    with Session(engine) as session:
-        campaign = session.get(Campaign, campaign_id)
-        if not campaign or campaign.brand_id != current_brand.id:
-            raise HTTPException(404, 'Campaign not found')
+async def get_campaign_with_summary(
+    campaign_id: int,
+    request: Request,
+    current_brand: Brand = Depends(get_current_brand),
+    db: DB = Depends(get_db)
+):
+    return await _cached_campaign_response(request, db, campaign_id, current_brand.id, "summary", _campaign_summary)
+
+def _campaign_summary(session: Session, campaign_id: int, brand_id: int) -> dict:
+    """CampaignDailySummary as a plain dict (see get_daily_activity_rows)."""
+    campaign = _get_owned_campaign(session, campaign_id, brand_id)
+    history = get_daily_activity_rows(session, campaign_id)
+
+    return {
+        "campaign_id": campaign.id,
+        "totals": _campaign_totals(session, campaign_id),
+        "today": history[0] if history else None,
+        "history": history,
+        "start_date": campaign.start_date,
+        "end_date": campaign.end_date
+    }
+
+def _campaign_totals(session: Session, campaign_id: int) -> dict:
+    """Totals and unique locations from SQL aggregates."""
+    unique_locations = (
+        select(func.count(distinct(DailyLocationRollup.location_name)))
+        .where(DailyLocationRollup.campaign_id == campaign_id)
+        .scalar_subquery()
+    )
+    manufactured, distributed, scans, live_scans, locations_count = session.exec(
+        select(
+            func.coalesce(func.sum(DailyActivity.manufactured_today), 0),
+            func.coalesce(func.sum(DailyActivity.distributed_today), 0),
+            func.coalesce(func.sum(DailyActivity.scan_count_today), 0),
+            func.coalesce(func.sum(DailyActivity.live_scans), 0),
+            unique_locations
+        ).where(DailyActivity.campaign_id == campaign_id)
+    ).one()
+
+    return {
+        "manufactured": manufactured,
+        "distributed": distributed,
+        "scans": scans,
+        "live_scans": live_scans,
+        "locations": locations_count
+    }
+
+# ----------------- Live updates -----------------
+@app.get('/campaigns/{campaign_id}/events')
+async def campaign_events(campaign_id: int, current_brand: Brand = Depends(get_current_brand), db: DB = Depends(get_db)):
+    """
+    Server-Sent Events for a live campaign dashboard, instead of polling
+    GET /campaigns/{id}. Sends the CampaignDailySummary once ("summary"),
+    then after each write to the campaign the history rows it changed
+    ("day", replace by day) and the new "totals". Manufacturing batches,
+    distributions and anchored txids are also sent as they happen (see
+    app/events.py). The stream ends after EVENTS_STREAM_SECONDS; clients
+    reconnect and start again from a summary.
+    """
+    if campaign_owners.get(campaign_id) != current_brand.id:
+        await db.run(_check_campaign_owner, campaign_id, current_brand.id)
+    return StreamingResponse(
+        _campaign_event_stream(campaign_id, current_brand.id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
-        activities = session.exec(
-            select(DailyActivity)
-            .where(DailyActivity.campaign_id == campaign_id)
-            .order_by(DailyActivity.day.desc())
-        ).all()
-
-        # Build history records (with locations)
-        history_activity = []
-        for a in activities:
-            day_start = datetime.combine(a.day, time.min)
-            day_end = day_start + timedelta(days=1)
-
-            d_recs = session.exec(
-                select(DistributionRecord).where(
-                    and_(
-                        DistributionRecord.campaign_id == campaign_id,
-                        DistributionRecord.distributed_at >= day_start,
-                        DistributionRecord.distributed_at < day_end
-                    )
-                )
-            ).all()
-
-            locations = [
-                {
-                    "location_name": d.location_name,
-                    "distributed_count": d.distributed_count,
-                    "lat": d.lat,
-                    "lng": d.lng
-                }
-                for d in d_recs
-            ]
-
-            out = DailyActivityOut.from_orm(a).dict()
-            out["locations"] = locations
-            history_activity.append(DailyActivityOut(**out))
-
-        today_activity = history_activity[0] if history_activity else None
-
-        # Calculate unique locations
-        unique_locations = session.exec(
-            select(DistributionRecord.location_name)
-            .where(DistributionRecord.campaign_id == campaign_id)
-        ).all()
-
-        locations_count = len(set(unique_locations))
-
-        totals = {
-            "manufactured": sum(a.manufactured_today for a in activities),
-            "distributed": sum(a.distributed_today for a in activities),
-            "scans": sum(a.scan_count_today for a in activities),
-            "locations": locations_count
-        }
-
-        return CampaignDailySummary(
-            campaign_id=campaign.id,
-            totals=totals,
-            today=today_activity,
-            history=history_activity,
-            start_date=campaign.start_date,
-            end_date=campaign.end_date
-        )
+async def _campaign_event_stream(campaign_id: int, brand_id: int) -> AsyncIterator[bytes]:
+    # queries run in sessions of their own: the request's is closed once the body starts
+    subscription = events.subscribe(campaign_id)
+    try:
+        # subscribed before reading the summary, so no write is missed in between
+        _, body = await _cached_campaign_body(run_in_session, campaign_id, brand_id, "summary", _campaign_summary)
+        yield b"retry: 3000\n\n" + sse_message("summary", body)
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + EVENTS_STREAM_SECONDS
+        while loop.time() < deadline:
+            batch = await subscription.next_batch(min(EVENTS_KEEPALIVE_SECONDS, deadline - loop.time()))
+            if not batch:
+                yield b": keepalive\n\n"
+                continue
+            if any(event["type"] in RESYNC_TYPES for event in batch):
+                _, body = await _cached_campaign_body(run_in_session, campaign_id, brand_id, "summary", _campaign_summary)
+                yield sse_message("summary", body)
+                continue
+
+            chunk = b"".join(encode_event(event) for event in batch if event["type"] in FORWARDED_TYPES)
+            days = frozenset(changed_day(event) for event in batch) - {None}
+            if days:
+                # the same bytes for every stream of the campaign, queried once (see app/events.py)
+                chunk += await events.shared_payload(subscription, days, _render_campaign_days)
+            if chunk:
+                yield chunk
+    finally:
+        subscription.close()
+
+async def _render_campaign_days(campaign_id: int, days: FrozenSet[str]) -> bytes:
+    """The "day" messages for `days` and the new "totals"."""
+    rows, totals = await run_in_session(_campaign_days, campaign_id, sorted(date.fromisoformat(d) for d in days))
+    return b"".join(sse_message("day", orjson.dumps(row)) for row in rows) + sse_message("totals", orjson.dumps(totals))
+
+def _campaign_days(session: Session, campaign_id: int, days: List[date]) -> Tuple[List[dict], dict]:
+    return get_daily_activity_rows(session, campaign_id, days=days), _campaign_totals(session, campaign_id)
 
 # ----------------- Manufacturing / Distribution -----------------
-from pydantic import BaseModel
-
-class BatchIn(BaseModel):
-    batch_number: str
-    manufactured_count: int
+async def _idempotent_write(db: DB, response: Response, idem: Optional[IdempotentRequest], fn, *args) -> dict:
+    """
+    Run the write `fn(session, *args, idem)`, or replay the stored response
+    when `idem` carries a key that was already used.
+    """
+    try:
+        result = idem.cached() if idem is not None else None
+        if result is None:
+            result = await db.run(fn, *args, idem)
+    except IdempotencyKeyReused as e:
+        raise HTTPException(422, str(e))
+    if idem is not None:
+        if idem.replayed:
+            response.headers["Idempotent-Replayed"] = "true"
+        else:
+            idem.remember(result)
+    return result
 
 @app.post('/campaigns/{campaign_id}/manufacture')
-def add_manufacturing_batch(campaign_id: int, batch: BatchIn, current_brand: Brand = Depends(get_current_brand)):
-    with Session(engine) as session:
-        campaign = session.get(Campaign, campaign_id)
-        if not campaign or campaign.brand_id != current_brand.id:
-            raise HTTPException(404, 'Campaign not found')
-
-        db_batch = ManufacturingBatch(
-            campaign_id=campaign_id,
-            batch_number=batch.batch_number,
-            manufactured_count=batch.manufactured_count
-        )
-        session.add(db_batch)
-
-        campaign.manufactured += batch.manufactured_count
-        session.add(campaign)
-        session.commit()
-
-        session.refresh(db_batch)
-        session.refresh(campaign)
-
-        proof_obj = {
-            "type": "manufacturing_batch",
-            "campaign_id": campaign_id,
-            "batch_id": db_batch.id,
-            "batch_number": batch.batch_number,
-            "manufactured_count": batch.manufactured_count,
-        }
-
-        hash_hex = compute_sha256_of_object(proof_obj)
-
-        try:
-            txid = send_proof_hash_to_algorand(hash_hex)
-        except Exception:
-            txid = None
-
-        db_batch.proof_hash = hash_hex
-        db_batch.proof_txid = txid
-        session.add(db_batch)
-        session.commit()
-
-        return {"batch_id": db_batch.id, "proof_hash": hash_hex, "txid": txid}
+async def add_manufacturing_batch(
+    campaign_id: int,
+    batch: BatchIn,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None, max_length=255),
+    current_brand: Brand = Depends(get_current_brand),
+    db: DB = Depends(get_db)
+):
+    """Send the same Idempotency-Key when retrying, so a retry does not add the batch twice."""
+    idem = IdempotentRequest.from_request(idempotency_key, current_brand.id, "manufacture", campaign_id, batch.dict())
+    return await _idempotent_write(db, response, idem, _add_manufacturing_batch, campaign_id, batch, current_brand.id)
+
+def _add_manufacturing_batch(session: Session, campaign_id: int, batch: BatchIn, brand_id: int, idem: Optional[IdempotentRequest] = None) -> dict:
+    _check_campaign_owner(session, campaign_id, brand_id)
+    if idem is not None:
+        stored = idem.claim(session)
+        if stored is not None:
+            return stored
+
+    db_batch = ManufacturingBatch(
+        campaign_id=campaign_id,
+        batch_number=batch.batch_number,
+        manufactured_count=batch.manufactured_count
+    )
+    session.add(db_batch)
+    session.flush()
+
+    hash_hex = compute_sha256_of_object(batch_proof_obj(db_batch))
+
+    # anchored later by the background worker
+    db_batch.proof_hash = hash_hex
+    session.add(db_batch)
+    enqueue_proof(session, "manufacturing_batch", db_batch.id, hash_hex)
+    result = {"batch_id": db_batch.id, "proof_hash": hash_hex, "txid": None}
+    if idem is not None:
+        idem.record(session, result)
+    # last, so the campaign row is locked only for the commit
+    increment(session, campaign_id, manufactured=batch.manufactured_count)
+    session.commit()
+    response_cache.invalidate(campaign_id)
+    events.publish(campaign_id, {"type": "manufacturing_batch", "batch": {
+        "id": db_batch.id, "batch_number": db_batch.batch_number,
+        "manufactured_count": db_batch.manufactured_count, "proof_hash": hash_hex,
+    }})
 
-class DistIn(BaseModel):
-    location_name: str
-    distributed_count: int
-    lat: Optional[float] = None
-    lng: Optional[float] = None
+    return result
 
 @app.post('/campaigns/{campaign_id}/distribute')
-def add_distribution(campaign_id: int, d: DistIn, current_brand: Brand = Depends(get_current_brand)):
+async def add_distribution(
+    campaign_id: int,
+    d: DistIn,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None, max_length=255),
+    current_brand: Brand = Depends(get_current_brand),
+    db: DB = Depends(get_db)
+):
+    """Send the same Idempotency-Key when retrying, so a retry does not add the record twice."""
+    idem = IdempotentRequest.from_request(idempotency_key, current_brand.id, "distribute", campaign_id, d.dict())
+    return await _idempotent_write(db, response, idem, _add_distribution, campaign_id, d, current_brand.id)
+
+def _add_distribution(session: Session, campaign_id: int, d: DistIn, brand_id: int, idem: Optional[IdempotentRequest] = None) -> dict:
+    _check_campaign_owner(session, campaign_id, brand_id)
+    if idem is not None:
+        stored = idem.claim(session)
+        if stored is not None:
+            return stored
+
+    rec = DistributionRecord(
+        campaign_id=campaign_id,
+        location_name=d.location_name,
+        distributed_count=d.distributed_count,
+        lat=d.lat,
+        lng=d.lng,
+        geohash=geohash_or_none(d.lat, d.lng)
+    )
+    session.add(rec)
+    session.flush()
+
+    row = {
+        "campaign_id": campaign_id,
+        "location_name": rec.location_name,
+        "distributed_count": rec.distributed_count,
+        "lat": rec.lat,
+        "lng": rec.lng,
+        "geohash": rec.geohash,
+        "distributed_at": rec.distributed_at,
+    }
+    add_to_rollup(session, [row])
+    add_to_cells(session, [row])
+    refresh_locations_count(session, campaign_id)
+
+    hash_hex = compute_sha256_of_object(distribution_proof_obj(rec))
+
+    # anchored later by the background worker
+    rec.proof_hash = hash_hex
+    session.add(rec)
+    enqueue_proof(session, "distribution", rec.id, hash_hex)
+    result = {"distribution_id": rec.id, "proof_hash": hash_hex, "txid": None}
+    if idem is not None:
+        idem.record(session, result)
+    # last, so the campaign row is locked only for the commit
+    increment(session, campaign_id, distributed=d.distributed_count)
+    session.commit()
+    response_cache.invalidate(campaign_id)
+    events.publish(campaign_id, {"type": "distribution", "distribution": {
+        "id": rec.id, "day": rec.distributed_at.date().isoformat(), "location_name": rec.location_name,
+        "distributed_count": rec.distributed_count, "lat": rec.lat, "lng": rec.lng, "proof_hash": hash_hex,
+    }})
+
+    return result
+
+@app.post('/campaigns/{campaign_id}/distribute/bulk')
+async def add_distributions_bulk(
+    campaign_id: int,
+    request: Request,
+    current_brand: Brand = Depends(get_current_brand),
+    db: DB = Depends(get_db)
+):
+    """
+    Insert many distribution rows at once. The body is a JSON array of DistIn
+    rows, NDJSON (application/x-ndjson) or CSV (text/csv) with a header row.
+    All rows are stored in one transaction and anchored with one proof.
+    """
+    await db.run(_check_campaign_owner, campaign_id, current_brand.id)
+    # the body may take long to arrive; hold no connection while it does
+    await db.release()
+    try:
+        return await ingest_distributions(db, request, campaign_id)
+    except BulkError as e:
+        raise HTTPException(422, str(e))
+
+# ----------------- Live scans -----------------
+# campaign ids that don't exist, so repeated bogus scans don't query every time
+missing_campaigns = TTLCache(maxsize=10000, ttl=60)
+
+def _lookup_campaign_owner(campaign_id: int) -> Optional[int]:
     with Session(engine) as session:
-        campaign = session.get(Campaign, campaign_id)
-        if not campaign or campaign.brand_id != current_brand.id:
+        owner = session.exec(select(Campaign.brand_id).where(Campaign.id == campaign_id)).first()
+    if owner is None:
+        missing_campaigns.set(campaign_id, True)
+    else:
+        campaign_owners.set(campaign_id, owner)
+    return owner
+
+@app.post('/campaigns/{campaign_id}/scan', status_code=202)
+async def record_scan(campaign_id: int):
+    """
+    Public: count one consumer scan of a campaign's QR code. Buffered in
+    memory and added to the day's `live_scans` within SCAN_FLUSH_SECONDS;
+    usually needs no database access (see app/scans.py).
+    """
+    if campaign_owners.get(campaign_id) is None:
+        if missing_campaigns.get(campaign_id) or await run_in_threadpool(_lookup_campaign_owner, campaign_id) is None:
             raise HTTPException(404, 'Campaign not found')
+    if not scan_buffer.add(campaign_id):
+        raise HTTPException(503, 'Too many scans, retry shortly', headers={"Retry-After": "1"})
+    return Response(status_code=202)
 
-        rec = DistributionRecord(
+# ----------------- Daily Activity -----------------
+@app.post('/campaigns/{campaign_id}/daily-activity', response_model=DailyActivityOut)
+async def add_daily_activity(campaign_id: int, data: DailyActivityCreate, current_brand: Brand = Depends(get_current_brand), db: DB = Depends(get_db)):
+    return await db.run(_add_daily_activity, campaign_id, data, current_brand.id)
+
+def _add_daily_activity(session: Session, campaign_id: int, data: DailyActivityCreate, brand_id: int) -> DailyActivityOut:
+    _check_campaign_owner(session, campaign_id, brand_id)
+
+    # Make sure the (campaign, day) row exists, then lock it. Concurrent writes
+    # for the same day queue on the row lock instead of inserting duplicates
+    # or overwriting each other's counter deltas.
+    session.execute(
+        dialect_insert(session, DailyActivity)
+        .values(
             campaign_id=campaign_id,
-            location_name=d.location_name,
-            distributed_count=d.distributed_count,
-            lat=d.lat,
-            lng=d.lng
+            day=data.day,
+            manufactured_today=0,
+            distributed_today=0,
+            scan_count_today=0,
+            live_scans=0,
+            created_at=datetime.utcnow()
         )
-        session.add(rec)
-
-        campaign.distributed += d.distributed_count
-        campaign.locations_count += 1
-        session.add(campaign)
-        session.commit()
-
-        session.refresh(rec)
-
-        proof_obj = {
-            "type": "distribution",
-            "campaign_id": campaign_id,
-            "distribution_id": rec.id,
-            "location": d.location_name,
-            "distributed_count": d.distributed_count,
-        }
-
-        hash_hex = compute_sha256_of_object(proof_obj)
-
-        try:
-            txid = send_proof_hash_to_algorand(hash_hex)
-        except Exception:
-            txid = None
-
-        rec.proof_hash = hash_hex
-        rec.proof_txid = txid
-        session.add(rec)
-        session.commit()
+        .on_conflict_do_nothing(index_elements=["campaign_id", "day"])
+    )
+    activity = session.exec(
+        select(DailyActivity)
+        .where(
+            DailyActivity.campaign_id == campaign_id,
+            DailyActivity.day == data.day
+        )
+        .with_for_update()
+        .execution_options(populate_existing=True)
+    ).one()
 
-        return {"distribution_id": rec.id, "proof_hash": hash_hex, "txid": txid}
+    manufactured_delta = data.manufactured_today - activity.manufactured_today
+    distributed_delta = data.distributed_today - activity.distributed_today
 
-# ----------------- Daily Activity -----------------
-@app.post('/campaigns/{campaign_id}/daily-activity', response_model=DailyActivityOut)
-def add_daily_activity(campaign_id: int, data: DailyActivityCreate, current_brand: Brand = Depends(get_current_brand)):
-    from sqlalchemy import and_
-    with Session(engine) as session:
-        campaign = session.get(Campaign, campaign_id)
-        if not campaign or campaign.brand_id != current_brand.id:
-            raise HTTPException(404, 'Campaign not found')
+    activity.manufactured_today = data.manufactured_today
+    activity.distributed_today = data.distributed_today
+    activity.scan_count_today = data.scan_count_today
 
-        existing_activity = session.exec(
-            select(DailyActivity).where(
-                DailyActivity.campaign_id == campaign_id,
-                DailyActivity.day == data.day
+    # Replace the day's locations set-based: one DELETE and one multi-row
+    # INSERT, committed together with the activity and counters below.
+    if data.locations:
+        day_start = datetime.combine(data.day, time.min)
+        day_end = day_start + timedelta(days=1)
+        remove_from_cells(session, campaign_id, day_start, day_end)
+        session.execute(
+            delete(DistributionRecord)
+            .where(
+                DistributionRecord.campaign_id == campaign_id,
+                DistributionRecord.distributed_at >= day_start,
+                DistributionRecord.distributed_at < day_end
             )
-        ).first()
+            .execution_options(synchronize_session=False)
+        )
 
-        if existing_activity:
-            campaign.manufactured -= existing_activity.manufactured_today
-            campaign.distributed -= existing_activity.distributed_today
+        midday = datetime.combine(data.day, time(hour=12))
+        locations = [loc.dict() for loc in data.locations]
+        records = [
+            dict(loc, campaign_id=campaign_id, distributed_at=midday, geohash=geohash_or_none(loc["lat"], loc["lng"]))
+            for loc in locations
+        ]
+        session.execute(insert(DistributionRecord), records)
+        replace_rollup_day(session, campaign_id, data.day, records)
+        add_to_cells(session, records)
+        refresh_locations_count(session, campaign_id)
+
+    session.flush()
+    hash_hex = compute_sha256_of_object(daily_activity_proof_obj(activity))
+
+    # anchored later by the background worker
+    activity.sha256 = hash_hex
+    activity.algorand_txid = None
+    session.add(activity)
+    enqueue_proof(session, "daily_activity", activity.id, hash_hex)
+    increment(session, campaign_id, manufactured=manufactured_delta, distributed=distributed_delta)
+    session.commit()
+    response_cache.invalidate(campaign_id)
 
-            existing_activity.manufactured_today = data.manufactured_today
-            existing_activity.distributed_today = data.distributed_today
-            existing_activity.scan_count_today = data.scan_count_today
+    if not data.locations:
+        locations = get_locations_by_day(session, campaign_id, [activity.day])[activity.day]
 
-            activity = existing_activity
-        else:
-            activity = DailyActivity(
-                campaign_id=campaign_id,
-                day=data.day,
-                manufactured_today=data.manufactured_today,
-                distributed_today=data.distributed_today,
-                scan_count_today=data.scan_count_today
-            )
-            session.add(activity)
-
-        campaign.manufactured += data.manufactured_today
-        campaign.distributed += data.distributed_today
-        session.add(campaign)
-
-        session.commit()
-        session.refresh(activity)
-        session.refresh(campaign)
-
-        # handle locations
-        if getattr(data, "locations", None):
-            day_start = datetime.combine(data.day, time.min)
-            day_end = day_start + timedelta(days=1)
-
-            old_dist = session.exec(
-                select(DistributionRecord).where(
-                    and_(
-                        DistributionRecord.campaign_id == campaign_id,
-                        DistributionRecord.distributed_at >= day_start,
-                        DistributionRecord.distributed_at < day_end
-                    )
-                )
-            ).all()
-
-            for od in old_dist:
-                session.delete(od)
-            session.commit()
-
-            midday = datetime.combine(data.day, time(hour=12))
-
-            for loc in data.locations:
-                rec = DistributionRecord(
-                    campaign_id=campaign_id,
-                    location_name=loc.location_name,
-                    distributed_count=loc.distributed_count,
-                    lat=loc.lat,
-                    lng=loc.lng,
-                    distributed_at=midday
-                )
-                session.add(rec)
-                session.commit()
-
-        proof_obj = {
-            "type": "daily_activity",
-            "campaign_id": campaign_id,
-            "activity_id": activity.id,
-            "date": data.day.strftime("%Y-%m-%d"),
-            "manufactured_today": data.manufactured_today,
-            "distributed_today": data.distributed_today,
-            "scan_count_today": data.scan_count_today
-        }
-        hash_hex = compute_sha256_of_object(proof_obj)
-
-        try:
-            txid = send_proof_hash_to_algorand(hash_hex)
-        except Exception:
-            txid = None
-
-        activity._sha256 = hash_hex
-        activity.algorand_txid = txid
-        session.add(activity)
-        session.commit()
-        session.refresh(activity)
-
-        day_start = datetime.combine(activity.day, time.min)
-        day_end = day_start + timedelta(days=1)
+    out = DailyActivityOut.from_orm(activity).dict()
+    out["locations"] = locations
 
-        d_recs = session.exec(
-            select(DistributionRecord).where(
-                and_(
-                    DistributionRecord.campaign_id == campaign_id,
-                    DistributionRecord.distributed_at >= day_start,
-                    DistributionRecord.distributed_at < day_end
-                )
-            )
-        ).all()
-
-        locations = [
-            {
-                "location_name": d.location_name,
-                "distributed_count": d.distributed_count,
-                "lat": d.lat,
-                "lng": d.lng
-            }
-            for d in d_recs
-        ]
+    events.publish(campaign_id, {"type": "daily_activity", "day": activity.day.isoformat(), "activity_id": activity.id})
+    return DailyActivityOut(**out)
 
-        out = DailyActivityOut.from_orm(activity).dict()
-        out["locations"] = locations
+@app.get('/campaigns/{campaign_id}/daily-activities', response_model=List[DailyActivityOut])
+async def get_daily_activities(
+    campaign_id: int,
+    request: Request,
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    before_day: Optional[date] = None,
+    current_brand: Brand = Depends(get_current_brand),
+    db: DB = Depends(get_db)
+):
+    """
+    Newest first. Page through long histories by passing the `day` of the
+    last row received as `before_day` for the next request.
+    """
+    return await _cached_campaign_response(
+        request, db, campaign_id, current_brand.id, f"daily-activities:{limit}:{before_day}",
+        _daily_activities, limit, before_day
+    )
 
-        return DailyActivityOut(**out)
+def _daily_activities(
+    session: Session, campaign_id: int, brand_id: int, limit: Optional[int], before_day: Optional[date]
+) -> List[dict]:
+    _check_campaign_owner(session, campaign_id, brand_id)
+    return get_daily_activity_rows(session, campaign_id, limit, before_day)
+
+# ----------------- Exports -----------------
+@app.get('/campaigns/{campaign_id}/export/{kind}')
+async def export_records(
+    campaign_id: int,
+    kind: Literal["distributions", "manufacturing-batches", "daily-activities", "distribution-uploads"],
+    format: Literal["csv", "ndjson"] = "csv",
+    gzip: bool = False,
+    current_brand: Brand = Depends(get_current_brand),
+    db: DB = Depends(get_db)
+):
+    """
+    Every record of one kind for the campaign, oldest first, with its proof
+    hash and txid. The body is streamed, so exports of any size are fine.
+    """
+    await db.run(_check_campaign_owner, campaign_id, current_brand.id)
+
+    filename = f"campaign-{campaign_id}-{kind}.{format}"
+    media_type = EXPORT_FORMATS[format]
+    if gzip:
+        filename += ".gz"
+        media_type = "application/gzip"
+    return StreamingResponse(
+        export_chunks(kind, campaign_id, format, gzip),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
 
-@app.get('/campaigns/{campaign_id}/daily-activities', response_model=List[DailyActivityOut])
-def get_daily_activities(campaign_id: int, current_brand: Brand = Depends(get_current_brand)):
-    from sqlalchemy import and_
-    with Session(engine) as session:
-        campaign = session.get(Campaign, campaign_id)
-        if not campaign or campaign.brand_id != current_brand.id:
-            raise HTTPException(404, 'Campaign not found')
+# ----------------- Map -----------------
+MAP_MAX_POINTS = 5000
+
+@app.get('/campaigns/{campaign_id}/map/points', response_model=MapPointsOut)
+async def get_map_points(
+    campaign_id: int,
+    min_lat: float = Query(..., ge=-90, le=90),
+    min_lng: float = Query(..., ge=-180, le=180),
+    max_lat: float = Query(..., ge=-90, le=90),
+    max_lng: float = Query(..., ge=-180, le=180),
+    limit: int = Query(1000, ge=1, le=MAP_MAX_POINTS),
+    current_brand: Brand = Depends(get_current_brand),
+    db: DB = Depends(get_db)
+):
+    """
+    Distribution records inside a bounding box, in geohash order, so a
+    truncated result covers a contiguous part of the box. A box with
+    min_lng > max_lng crosses the antimeridian.
+    """
+    if min_lat > max_lat:
+        raise HTTPException(400, 'min_lat is greater than max_lat')
+    return TimedORJSONResponse(await db.run(_map_points, campaign_id, current_brand.id, (min_lat, min_lng, max_lat, max_lng), limit))
+
+def _map_points(session: Session, campaign_id: int, brand_id: int, bbox, limit: int) -> dict:
+    _check_campaign_owner(session, campaign_id, brand_id)
+    points, truncated = points_in_bbox(session, campaign_id, bbox, limit)
+    return {"points": points, "truncated": truncated}
+
+@app.get('/campaigns/{campaign_id}/map/nearby', response_model=MapPointsOut)
+async def get_map_nearby(
+    campaign_id: int,
+    lat: float = Query(..., ge=-90, le=90),
+    lng: float = Query(..., ge=-180, le=180),
+    radius_m: float = Query(..., gt=0, le=1_000_000),
+    limit: int = Query(1000, ge=1, le=MAP_MAX_POINTS),
+    current_brand: Brand = Depends(get_current_brand),
+    db: DB = Depends(get_db)
+):
+    """Distribution records within `radius_m` meters of a point, nearest first."""
+    return TimedORJSONResponse(await db.run(_map_nearby, campaign_id, current_brand.id, lat, lng, radius_m, limit))
+
+def _map_nearby(session: Session, campaign_id: int, brand_id: int, lat: float, lng: float, radius_m: float, limit: int) -> dict:
+    _check_campaign_owner(session, campaign_id, brand_id)
+    points, truncated = points_near(session, campaign_id, lat, lng, radius_m, limit)
+    return {"points": points, "truncated": truncated}
+
+@app.get('/campaigns/{campaign_id}/map/heatmap/{z}/{x}/{y}', response_model=HeatmapTileOut)
+async def get_heatmap_tile(
+    campaign_id: int,
+    z: int,
+    x: int,
+    y: int,
+    request: Request,
+    current_brand: Brand = Depends(get_current_brand),
+    db: DB = Depends(get_db)
+):
+    """
+    One web map tile (z/x/y, as used by Leaflet or Mapbox) of the campaign's
+    distribution records, pre-clustered by geohash cell for that zoom level.
+    Cached and answered with an ETag like the summary.
+    """
+    if not 0 <= z <= MAX_ZOOM or not 0 <= x < 2 ** z or not 0 <= y < 2 ** z:
+        raise HTTPException(400, 'Tile out of range')
+    return await _cached_campaign_response(request, db, campaign_id, current_brand.id, f"heatmap:{z}:{x}:{y}", _heatmap_tile, z, x, y)
+
+def _heatmap_tile(session: Session, campaign_id: int, brand_id: int, z: int, x: int, y: int) -> dict:
+    return heatmap_tile(session, campaign_id, z, x, y)
+
+# ----------------- Proofs -----------------
+@app.get('/proofs/{related_type}/{related_id}', response_model=InclusionProofOut)
+async def get_inclusion_proof(related_type: str, related_id: int, current_brand: Brand = Depends(get_current_brand), db: DB = Depends(get_db)):
+    """
+    Latest proof for a record. In merkle mode this includes the path from the
+    record's hash to the anchored root, which is the note of `algorand_txid`.
+    """
+    if related_type not in PROOF_COLUMNS:
+        raise HTTPException(404, 'Unknown record type')
+    return await db.run(_inclusion_proof, related_type, related_id, current_brand.id)
+
+def _inclusion_proof(session: Session, related_type: str, related_id: int, brand_id: int) -> InclusionProofOut:
+    model = PROOF_COLUMNS[related_type][0]
+    record = session.get(model, related_id)
+    campaign = session.get(Campaign, record.campaign_id) if record else None
+    if not campaign or campaign.brand_id != brand_id:
+        raise HTTPException(404, 'Record not found')
+
+    proof = session.exec(
+        select(BlockchainProof)
+        .where(
+            BlockchainProof.related_type == related_type,
+            BlockchainProof.related_id == related_id
+        )
+        .order_by(BlockchainProof.id.desc())
+    ).first()
+    if not proof:
+        raise HTTPException(404, 'Proof not found')
+
+    return InclusionProofOut(
+        related_type=related_type,
+        related_id=related_id,
+        leaf_hash=proof.sha256_hash,
+        status=proof.status,
+        algorand_txid=proof.algorand_txid,
+        merkle_root=proof.merkle_root,
+        path=json.loads(proof.merkle_path) if proof.merkle_path else []
+    )
 
-        activities = session.exec(
-            select(DailyActivity)
-            .where(DailyActivity.campaign_id == campaign_id)
-            .order_by(DailyActivity.day.desc())
-        ).all()
-
-        results = []
-        for a in activities:
-            day_start = datetime.combine(a.day, time.min)
-            day_end = day_start + timedelta(days=1)
-
-            d_recs = session.exec(
-                select(DistributionRecord).where(
-                    and_(
-                        DistributionRecord.campaign_id == campaign_id,
-                        DistributionRecord.distributed_at >= day_start,
-                        DistributionRecord.distributed_at < day_end
-                    )
-                )
-            ).all()
-
-            locations = [
-                {
-                    "location_name": d.location_name,
-                    "distributed_count": d.distributed_count,
-                    "lat": d.lat,
-                    "lng": d.lng
-                }
-                for d in d_recs
-            ]
-
-            out = DailyActivityOut.from_orm(a).dict()
-            out["locations"] = locations
-            results.append(DailyActivityOut(**out))
-
-        return results
+MAX_VERIFY_RECORDS = 500
+
+@app.post('/verify', response_model=List[VerificationResult])
+async def verify_records(req: VerifyRequest, current_brand: Brand = Depends(get_current_brand), db: DB = Depends(get_db)):
+    """Recompute each record's hash and compare it with the note anchored on-chain."""
+    ids_by_type = {
+        "manufacturing_batch": req.manufacturing_batches,
+        "distribution": req.distributions,
+        "daily_activity": req.daily_activities,
+        "distribution_upload": req.distribution_uploads,
+    }
+    if sum(len(ids) for ids in ids_by_type.values()) > MAX_VERIFY_RECORDS:
+        raise HTTPException(400, f'At most {MAX_VERIFY_RECORDS} records per request')
+
+    targets = await db.run(load_verification_targets, current_brand.id, ids_by_type)
+    # the indexer lookups can be slow; don't hold a pooled connection through them
+    await db.release()
+    return await verify_targets(targets)
+
+@app.get('/verify/{related_type}/{related_id}', response_model=VerificationResult)
+async def verify_record(related_type: str, related_id: int, current_brand: Brand = Depends(get_current_brand), db: DB = Depends(get_db)):
+    if related_type not in PROOF_COLUMNS:
+        raise HTTPException(404, 'Unknown record type')
+    targets = await db.run(load_verification_targets, current_brand.id, {related_type: [related_id]})
+    await db.release()
+    return (await verify_targets(targets))[0]
 
 # ----------------- health -----------------
 @app.get('/')
 def root():
     return {"ok": True, "message": "Disposable Cups Backend running"}
 
+@app.get('/health/pool')
+def pool_health():
+    """Connection pool counters, for sizing DB_POOL_SIZE / DB_MAX_OVERFLOW."""
+    return pool_metrics()
+
+@app.get('/metrics', include_in_schema=False)
+async def metrics():
+    """Request, query and external-call metrics in Prometheus text format."""
+    return Response(render_metrics(pool_metrics()), media_type=PROMETHEUS_CONTENT_TYPE)
+
 # EOF
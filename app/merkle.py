@@ -0,0 +1,57 @@
+# app/merkle.py
+"""
+Minimal SHA-256 Merkle tree over hex proof hashes.
+
+Leaves are sha256(0x00 || proof hash) and internal nodes
+sha256(0x01 || left || right), so an internal node can never be passed off
+as a leaf. A node without a sibling is promoted to the next level unchanged
+(no duplication), so its path simply has one step fewer.
+"""
+import hashlib
+from typing import List
+
+LEAF_PREFIX = b"\x00"
+NODE_PREFIX = b"\x01"
+
+def _leaf(hash_hex: str) -> bytes:
+    return hashlib.sha256(LEAF_PREFIX + bytes.fromhex(hash_hex)).digest()
+
+def _parent(left: bytes, right: bytes) -> bytes:
+    return hashlib.sha256(NODE_PREFIX + left + right).digest()
+
+def build_levels(leaves: List[str]) -> List[List[bytes]]:
+    """All tree levels, leaves first and the root level ([root]) last."""
+    if not leaves:
+        raise ValueError("Merkle tree needs at least one leaf")
+    level = [_leaf(h) for h in leaves]
+    levels = [level]
+    while len(level) > 1:
+        level = [
+            _parent(level[i], level[i + 1]) if i + 1 < len(level) else level[i]
+            for i in range(0, len(level), 2)
+        ]
+        levels.append(level)
+    return levels
+
+def inclusion_path(levels: List[List[bytes]], index: int) -> List[dict]:
+    """
+    Sibling hashes from leaf to root. Each step is {"hash": hex, "position":
+    "left" | "right"}, the side the sibling sits on.
+    """
+    path = []
+    for level in levels[:-1]:
+        sibling = index ^ 1
+        if sibling < len(level):
+            path.append({
+                "hash": level[sibling].hex(),
+                "position": "left" if sibling < index else "right"
+            })
+        index //= 2
+    return path
+
+def verify_inclusion(leaf: str, path: List[dict], root: str) -> bool:
+    node = _leaf(leaf)
+    for step in path:
+        sibling = bytes.fromhex(step["hash"])
+        node = _parent(sibling, node) if step["position"] == "left" else _parent(node, sibling)
+    return node.hex() == root
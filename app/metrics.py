@@ -0,0 +1,277 @@
+# app/metrics.py
+"""
+Request metrics in Prometheus text format.
+
+MetricsMiddleware opens a RequestStats in a contextvar for every request. The
+SQLAlchemy cursor hooks, `external_call` and TimedORJSONResponse add to it
+from whichever thread or task does the work (Starlette's threadpool,
+AsyncSession.run_sync and asyncio tasks all carry the context along), so the
+handlers need no changes. When the request ends its totals are recorded in
+histograms labelled by route template.
+
+Histograms are fixed buckets behind one lock and cost a few dict lookups per
+observation, so this is meant to stay on in production. Statement text is
+only kept when the slow-request log is on (SLOW_REQUEST_MS > 0).
+"""
+import contextvars
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from fastapi.responses import ORJSONResponse
+from sqlalchemy import event
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") == "1"
+# log requests slower than this, with the statements they ran (0 = off)
+SLOW_REQUEST_MS = float(os.getenv("SLOW_REQUEST_MS", "0"))
+SLOW_REQUEST_MAX_STATEMENTS = int(os.getenv("SLOW_REQUEST_MAX_STATEMENTS", "50"))
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 250)
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+
+# ----------------- Metric types -----------------
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(str(v))}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self._values: Dict[Tuple, float] = {}
+
+    def inc(self, *labels, amount: float = 1):
+        with _lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with _lock:
+            items = sorted(self._values.items())
+        for labels, value in items:
+            lines.append(f"{self.name}{_labels(self.label_names, labels)} {value}")
+        return lines
+
+class Histogram:
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self.buckets = tuple(buckets)
+        # labels -> [per-bucket counts (last is +Inf), sum]
+        self._series: Dict[Tuple, list] = {}
+
+    def observe(self, value: float, *labels):
+        i = bisect_left(self.buckets, value)
+        with _lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][i] += 1
+            series[1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with _lock:
+            items = sorted((labels, (list(counts), total)) for labels, (counts, total) in self._series.items())
+        for labels, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{bound:g}"'
+                lines.append(f"{self.name}_bucket{_labels(self.label_names, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.label_names, labels)} {total}")
+            lines.append(f"{self.name}_count{_labels(self.label_names, labels)} {cumulative}")
+        return lines
+
+class Gauge:
+    """A value read when the metrics are rendered."""
+
+    def __init__(self, name: str, help: str, read: Callable[[], float]):
+        self.name = name
+        self.help = help
+        self.read = read
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge", f"{self.name} {self.read()}"]
+
+REQUEST_LABELS = ("method", "route")
+
+requests_total = Counter("http_requests_total", "Requests served.", REQUEST_LABELS + ("status",))
+request_seconds = Histogram("http_request_duration_seconds", "Request latency, until the body is sent.", REQUEST_LABELS)
+request_queries = Histogram("http_request_db_queries", "SQL statements run per request.", REQUEST_LABELS, COUNT_BUCKETS)
+request_db_seconds = Histogram("http_request_db_seconds", "Time spent in SQL statements per request.", REQUEST_LABELS)
+request_external_seconds = Histogram(
+    "http_request_external_seconds", "Time spent in Algorand/indexer calls per request (summed over concurrent calls).",
+    REQUEST_LABELS
+)
+request_serialize_seconds = Histogram(
+    "http_request_serialize_seconds", "Time spent encoding JSON response bodies per request.", REQUEST_LABELS
+)
+db_query_seconds = Histogram("db_query_duration_seconds", "SQL statement latency, including background work.")
+external_seconds = Histogram("external_call_duration_seconds", "Latency of calls to external services.", ("service",))
+external_errors = Counter("external_call_errors_total", "External calls that raised.", ("service",))
+
+REGISTRY = [
+    requests_total, request_seconds, request_queries, request_db_seconds, request_external_seconds,
+    request_serialize_seconds, db_query_seconds, external_seconds, external_errors,
+]
+
+# ----------------- Per-request stats -----------------
+class RequestStats:
+    __slots__ = ("queries", "db_seconds", "external_seconds", "serialize_seconds", "statements")
+
+    def __init__(self, keep_statements: bool = False):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.external_seconds = 0.0
+        self.serialize_seconds = 0.0
+        self.statements: Optional[List[Tuple[float, str]]] = [] if keep_statements else None
+
+_current: contextvars.ContextVar[Optional[RequestStats]] = contextvars.ContextVar("request_stats", default=None)
+
+def current_stats() -> Optional[RequestStats]:
+    return _current.get()
+
+# ----------------- Database hooks -----------------
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._metrics_started = time.perf_counter()
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, "_metrics_started", None)
+    if started is None:
+        return
+    elapsed = time.perf_counter() - started
+    db_query_seconds.observe(elapsed)
+    stats = _current.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.db_seconds += elapsed
+        if stats.statements is not None and len(stats.statements) < SLOW_REQUEST_MAX_STATEMENTS:
+            stats.statements.append((elapsed, statement))
+
+def instrument_engine(sync_engine):
+    """Time every statement run on `sync_engine` (pass async_engine.sync_engine for async)."""
+    if not METRICS_ENABLED:
+        return
+    event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(sync_engine, "after_cursor_execute", _after_cursor_execute)
+
+# ----------------- External calls & serialization -----------------
+@contextmanager
+def external_call(service: str):
+    """Time a call to `service` ("algod", "indexer"); works in sync and async code."""
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        external_errors.inc(service)
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        external_seconds.observe(elapsed, service)
+        stats = _current.get()
+        if stats is not None:
+            stats.external_seconds += elapsed
+
+class TimedORJSONResponse(ORJSONResponse):
+    """ORJSONResponse that counts its encoding time as serialization time."""
+
+    def render(self, content) -> bytes:
+        started = time.perf_counter()
+        body = super().render(content)
+        stats = _current.get()
+        if stats is not None:
+            stats.serialize_seconds += time.perf_counter() - started
+        return body
+
+# ----------------- Middleware -----------------
+def _route_label(scope) -> str:
+    # the route template, not the path, so ids don't create new series
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+def record_request(scope, status: int, elapsed: float, stats: RequestStats):
+    labels = (scope["method"], _route_label(scope))
+    requests_total.inc(*labels, str(status))
+    request_seconds.observe(elapsed, *labels)
+    request_queries.observe(stats.queries, *labels)
+    request_db_seconds.observe(stats.db_seconds, *labels)
+    request_external_seconds.observe(stats.external_seconds, *labels)
+    request_serialize_seconds.observe(stats.serialize_seconds, *labels)
+
+    if SLOW_REQUEST_MS and elapsed * 1000 >= SLOW_REQUEST_MS:
+        statements = "".join(f"\n  {seconds * 1000:8.1f} ms  {sql}" for seconds, sql in stats.statements or [])
+        logger.warning(
+            "Slow request %s %s (%s): %.0f ms, status %s, %d queries in %.0f ms, external %.0f ms, serialize %.0f ms%s",
+            scope["method"], scope["path"], labels[1], elapsed * 1000, status, stats.queries,
+            stats.db_seconds * 1000, stats.external_seconds * 1000, stats.serialize_seconds * 1000, statements
+        )
+
+class MetricsMiddleware:
+    """Plain ASGI middleware (no BaseHTTPMiddleware overhead); times until the last body chunk is sent."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not METRICS_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats(keep_statements=SLOW_REQUEST_MS > 0)
+        token = _current.set(stats)
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - started
+            _current.reset(token)
+            record_request(scope, status, elapsed, stats)
+
+# ----------------- Exposition -----------------
+def render_metrics(pool: Optional[dict] = None) -> str:
+    """All metrics in Prometheus text format, plus the connection pool counters from pool_metrics()."""
+    lines: List[str] = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    if pool:
+        for key, kind, help in (
+            ("connects", "counter", "Connections opened by the pool."),
+            ("checkouts", "counter", "Connections checked out of the pool."),
+            ("timeouts", "counter", "Checkouts that timed out waiting for a connection."),
+            ("wait_seconds_total", "counter", "Time spent waiting for a pooled connection."),
+            ("wait_seconds_max", "gauge", "Longest wait for a pooled connection."),
+            ("size", "gauge", "Configured pool size."),
+            ("checked_out", "gauge", "Connections currently checked out."),
+            ("overflow", "gauge", "Connections open beyond the pool size."),
+        ):
+            if key in pool:
+                name = "db_pool_" + (key if kind == "gauge" or key.endswith("_total") else key + "_total")
+                lines += [f"# HELP {name} {help}", f"# TYPE {name} {kind}", f"{name} {pool[key]}"]
+    return "\n".join(lines) + "\n"
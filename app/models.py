@@ -1,20 +1,23 @@
 # app/models.py
 from sqlmodel import SQLModel, Field, Relationship
+from sqlalchemy import Index, UniqueConstraint
 from typing import Optional, List
 from datetime import datetime, date
 
 class Brand(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     name: str
-    email: str
+    email: str = Field(index=True)
     password_hash: str
+    # bumped to revoke every token issued so far (checked against the "ver" claim)
+    token_version: int = 0
     created_at: datetime = Field(default_factory=datetime.utcnow)
     campaigns: List["Campaign"] = Relationship(back_populates="brand")
 
 class Campaign(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     name: str
-    brand_id: int = Field(foreign_key="brand.id")
+    brand_id: int = Field(foreign_key="brand.id", index=True)
     start_date: Optional[datetime] = None
     end_date: Optional[datetime] = None
     manufactured: int = 0
@@ -26,6 +29,22 @@ class Campaign(SQLModel, table=True):
     brand: Optional[Brand] = Relationship(back_populates="campaigns")
     daily_activities: List["DailyActivity"] = Relationship(back_populates="campaign")
 
+class CampaignCounterShard(SQLModel, table=True):
+    """
+    Part of a hot campaign's manufactured/distributed counters, when
+    COUNTER_SHARDS > 1; the campaign's totals are its own columns plus all of
+    its shards (see app/counters.py).
+    """
+    __table_args__ = (
+        UniqueConstraint("campaign_id", "shard", name="uq_campaigncountershard_campaign_id_shard"),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    campaign_id: int = Field(foreign_key="campaign.id")
+    shard: int
+    manufactured: int = 0
+    distributed: int = 0
+
 class ManufacturingBatch(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     campaign_id: int = Field(foreign_key="campaign.id")
@@ -36,28 +55,97 @@ class ManufacturingBatch(SQLModel, table=True):
     proof_txid: Optional[str] = None
 
 class DistributionRecord(SQLModel, table=True):
+    __table_args__ = (
+        Index("ix_distributionrecord_campaign_id_distributed_at", "campaign_id", "distributed_at"),
+        Index("ix_distributionrecord_campaign_id_geohash", "campaign_id", "geohash"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     campaign_id: int = Field(foreign_key="campaign.id")
     location_name: str
     lat: Optional[float] = None
     lng: Optional[float] = None
+    # geohash of (lat, lng), set on write; None without valid coordinates (see app/geo.py)
+    geohash: Optional[str] = None
     distributed_count: int = 0
     distributed_at: datetime = Field(default_factory=datetime.utcnow)
     proof_hash: Optional[str] = None
     proof_txid: Optional[str] = None
+    # set for rows from a bulk upload; those are anchored through the upload
+    upload_id: Optional[int] = Field(default=None, foreign_key="distributionupload.id")
+
+class DistributionUpload(SQLModel, table=True):
+    """
+    One bulk upload of distribution records. The upload is anchored with a
+    single proof whose `rows_sha256` digests every row in upload order.
+    """
+    id: Optional[int] = Field(default=None, primary_key=True)
+    campaign_id: int = Field(foreign_key="campaign.id")
+    rows: int = 0
+    distributed_count: int = 0
+    rows_sha256: Optional[str] = None
+    proof_hash: Optional[str] = None
+    proof_txid: Optional[str] = None
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+
+class DistributionGeoCell(SQLModel, table=True):
+    """
+    Distribution records per campaign and geohash cell, kept up to date in
+    the same transaction as every DistributionRecord write, like
+    DailyLocationRollup. Heatmap tiles of the lower zoom levels are
+    clustered from these instead of the raw records (see app/geo.py).
+    """
+    __table_args__ = (
+        UniqueConstraint("campaign_id", "cell", name="uq_distributiongeocell_campaign_id_cell"),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    campaign_id: int = Field(foreign_key="campaign.id")
+    cell: str
+    records: int = 0
+    distributed_count: int = 0
+    # sums, so the cluster center is lat_sum / records
+    lat_sum: float = 0
+    lng_sum: float = 0
+
+class DailyLocationRollup(SQLModel, table=True):
+    """
+    Distribution totals per campaign, day and location, kept up to date in
+    the same transaction as every DistributionRecord write (see app/rollup.py).
+    """
+    __table_args__ = (
+        UniqueConstraint("campaign_id", "day", "location_name", name="uq_dailylocationrollup_campaign_id_day_location_name"),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    campaign_id: int = Field(foreign_key="campaign.id")
+    day: date
+    location_name: str
+    distributed_count: int = 0
+    records: int = 0
+    # last reported coordinates of the location that day
+    lat: Optional[float] = None
+    lng: Optional[float] = None
 
 class DailyActivity(SQLModel, table=True):
     """
     One row per campaign per day. This stores the daily numbers and optional
     proof/hash/algorand txid for verification.
     """
+    __table_args__ = (
+        UniqueConstraint("campaign_id", "day", name="uq_dailyactivity_campaign_id_day"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     campaign_id: int = Field(foreign_key="campaign.id")
     day: date
     manufactured_today: int = 0
     distributed_today: int = 0
     scan_count_today: int = 0
-    _sha256: Optional[str] = None
+    # consumer QR scans counted live by POST /campaigns/{id}/scan (app/scans.py);
+    # not part of the day's proof, which covers the posted totals
+    live_scans: int = 0
+    sha256: Optional[str] = None
     algorand_txid: Optional[str] = None
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
@@ -65,9 +153,50 @@ class DailyActivity(SQLModel, table=True):
     campaign: Optional[Campaign] = Relationship(back_populates="daily_activities")
 
 class BlockchainProof(SQLModel, table=True):
+    """
+    One row per proof hash waiting for (or done with) anchoring. Requests
+    insert rows as "pending"; the anchoring worker sends them to Algorand and
+    writes the txid back here and on the related record.
+    """
+    __table_args__ = (
+        # the worker polls pending rows in id order
+        Index("ix_blockchainproof_status_id", "status", "id"),
+        Index("ix_blockchainproof_related_type_related_id", "related_type", "related_id"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
-    related_type: str
+    related_type: str  # "manufacturing_batch" | "distribution" | "daily_activity" | "distribution_upload"
     related_id: int
-    _sha256_hash: str
+    sha256_hash: str
     algorand_txid: Optional[str] = None
-    created_at: datetime = Field(default_factory=datetime.utcnow)
\ No newline at end of file
+    # set in merkle mode: the anchored root and this hash's inclusion path (JSON)
+    merkle_root: Optional[str] = None
+    merkle_path: Optional[str] = None
+    status: str = "pending"  # "pending" | "sent" | "failed"
+    attempts: int = 0
+    next_attempt_at: datetime = Field(default_factory=datetime.utcnow)
+    last_error: Optional[str] = None
+    # the worker that is sending this proof, and until when the others leave it alone
+    claimed_by: Optional[str] = None
+    claimed_until: Optional[datetime] = None
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+
+class IdempotencyKey(SQLModel, table=True):
+    """
+    A client-supplied Idempotency-Key and the response of the write it was
+    first sent with. Retries with the same key get that response back instead
+    of repeating the write (see app/idempotency.py).
+    """
+    __table_args__ = (
+        UniqueConstraint("brand_id", "key", name="uq_idempotencykey_brand_id_key"),
+        Index("ix_idempotencykey_expires_at", "expires_at"),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    brand_id: int = Field(foreign_key="brand.id")
+    key: str
+    # digest of the endpoint, campaign and body the key was first used with
+    request_hash: str
+    response: Optional[str] = None  # JSON
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    expires_at: datetime
@@ -0,0 +1,71 @@
+# app/response_cache.py
+"""
+Cache of serialized dashboard responses, keyed by campaign.
+
+Every campaign has a generation token; entries are stored under
+(campaign, generation, variant) and a write to the campaign replaces the
+token, so all of its entries become unreachable at once and age out of the
+LRU. Writers invalidate after committing and readers read the token before
+querying, so an entry can never hold data older than its generation.
+
+The default backend is an in-process TTLCache. With several worker processes,
+point RESPONSE_CACHE_BACKEND at a factory ("package.module:function")
+returning a shared backend with the same get/set/delete methods; otherwise
+other processes see a write only after RESPONSE_CACHE_TTL_SECONDS.
+"""
+import hashlib
+import importlib
+import os
+import uuid
+from typing import Optional, Tuple
+
+from .cache import TTLCache
+
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "1") == "1"
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "1000"))
+RESPONSE_CACHE_TTL_SECONDS = float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "300"))
+RESPONSE_CACHE_BACKEND = os.getenv("RESPONSE_CACHE_BACKEND", "")
+
+def load_backend(spec: str):
+    """Build the backend named by "module:factory", or the in-memory one."""
+    if not spec:
+        return TTLCache(maxsize=RESPONSE_CACHE_SIZE, ttl=RESPONSE_CACHE_TTL_SECONDS)
+    module, _, factory = spec.partition(":")
+    return getattr(importlib.import_module(module), factory)()
+
+def etag_for(body: bytes) -> str:
+    return '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+class ResponseCache:
+    def __init__(self, backend=None, enabled: bool = RESPONSE_CACHE_ENABLED):
+        self.backend = backend if backend is not None else load_backend(RESPONSE_CACHE_BACKEND)
+        self.enabled = enabled
+
+    def _generation(self, campaign_id: int) -> str:
+        key = f"campaign:{campaign_id}:generation"
+        generation = self.backend.get(key)
+        if generation is None:
+            generation = uuid.uuid4().hex
+            self.backend.set(key, generation)
+        return generation
+
+    def lookup(self, campaign_id: int, variant: str) -> Tuple[Optional[str], Optional[Tuple[str, bytes]]]:
+        """
+        Returns (key, (etag, body)) on a hit and (key, None) on a miss. Store
+        the fresh response under that same key, so a write that happens in
+        between is not masked.
+        """
+        if not self.enabled:
+            return None, None
+        key = f"campaign:{campaign_id}:{self._generation(campaign_id)}:{variant}"
+        return key, self.backend.get(key)
+
+    def store(self, key: Optional[str], etag: str, body: bytes):
+        if key is not None:
+            self.backend.set(key, (etag, body))
+
+    def invalidate(self, campaign_id: int):
+        if self.enabled:
+            self.backend.set(f"campaign:{campaign_id}:generation", uuid.uuid4().hex)
+
+response_cache = ResponseCache()
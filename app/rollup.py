@@ -0,0 +1,132 @@
+# app/rollup.py
+"""
+Per-day distribution rollup: one DailyLocationRollup row per campaign, day
+and location with the summed distributed_count. Every write of
+DistributionRecord rows updates it in the same transaction, and the summary
+endpoints read locations from it instead of the raw records.
+
+Recompute it from the raw records (e.g. after fixing data by hand):
+    python -m app.rollup rebuild [--campaign ID]
+"""
+import argparse
+from typing import Iterable, Optional
+
+from sqlalchemy import delete, distinct, func, update
+from sqlmodel import Session, select
+
+from .crud import dialect_insert
+from .models import Campaign, DailyLocationRollup, DistributionRecord
+
+REBUILD_CHUNK_ROWS = 5000
+
+def add_to_rollup(session: Session, rows: Iterable[dict]):
+    """
+    Add distribution rows (dicts with campaign_id, location_name,
+    distributed_count, lat, lng and distributed_at) to the rollup with one
+    upsert.
+    """
+    # merge rows of the same key first: one statement may not update a row twice
+    merged = {}
+    for r in rows:
+        key = (r["campaign_id"], r["distributed_at"].date(), r["location_name"])
+        m = merged.get(key)
+        if m is None:
+            merged[key] = m = {
+                "campaign_id": key[0], "day": key[1], "location_name": key[2],
+                "distributed_count": 0, "records": 0, "lat": None, "lng": None,
+            }
+        m["distributed_count"] += r["distributed_count"]
+        m["records"] += 1
+        if r.get("lat") is not None:
+            m["lat"] = r["lat"]
+        if r.get("lng") is not None:
+            m["lng"] = r["lng"]
+    if not merged:
+        return
+
+    stmt = dialect_insert(session, DailyLocationRollup).values(list(merged.values()))
+    rollup = DailyLocationRollup.__table__.c
+    session.execute(stmt.on_conflict_do_update(
+        index_elements=["campaign_id", "day", "location_name"],
+        set_={
+            "distributed_count": rollup.distributed_count + stmt.excluded.distributed_count,
+            "records": rollup.records + stmt.excluded.records,
+            "lat": func.coalesce(stmt.excluded.lat, rollup.lat),
+            "lng": func.coalesce(stmt.excluded.lng, rollup.lng),
+        }
+    ))
+
+def replace_rollup_day(session: Session, campaign_id: int, day, rows: Iterable[dict]):
+    """Replace a campaign's rollup rows for one day with the given distribution rows."""
+    session.execute(
+        delete(DailyLocationRollup)
+        .where(DailyLocationRollup.campaign_id == campaign_id, DailyLocationRollup.day == day)
+        .execution_options(synchronize_session=False)
+    )
+    add_to_rollup(session, rows)
+
+def distinct_locations():
+    """Correlated subquery: the number of distinct locations Campaign.id was distributed to."""
+    return (
+        select(func.count(distinct(DailyLocationRollup.location_name)))
+        .where(DailyLocationRollup.campaign_id == Campaign.id)
+        .scalar_subquery()
+    )
+
+def refresh_locations_count(session: Session, campaign_id: Optional[int] = None):
+    """Set Campaign.locations_count to the number of distinct locations distributed to."""
+    distinct_locations_count = distinct_locations()
+    # only rows whose count changed, so the common case takes no campaign row lock
+    statement = (
+        update(Campaign)
+        .where(Campaign.locations_count != distinct_locations_count)
+        .values(locations_count=distinct_locations_count)
+    )
+    if campaign_id is not None:
+        statement = statement.where(Campaign.id == campaign_id)
+    session.execute(statement.execution_options(synchronize_session=False))
+
+def rebuild(session: Session, campaign_id: Optional[int] = None) -> int:
+    """Recompute the rollup from the raw records. Returns the number of records read."""
+    clear = delete(DailyLocationRollup)
+    records = select(DistributionRecord).order_by(DistributionRecord.id)
+    if campaign_id is not None:
+        clear = clear.where(DailyLocationRollup.campaign_id == campaign_id)
+        records = records.where(DistributionRecord.campaign_id == campaign_id)
+    session.execute(clear.execution_options(synchronize_session=False))
+
+    total = 0
+    chunk = []
+    for r in session.exec(records.execution_options(yield_per=REBUILD_CHUNK_ROWS)):
+        chunk.append({
+            "campaign_id": r.campaign_id,
+            "location_name": r.location_name,
+            "distributed_count": r.distributed_count,
+            "lat": r.lat,
+            "lng": r.lng,
+            "distributed_at": r.distributed_at,
+        })
+        if len(chunk) >= REBUILD_CHUNK_ROWS:
+            add_to_rollup(session, chunk)
+            total += len(chunk)
+            chunk = []
+    add_to_rollup(session, chunk)
+    total += len(chunk)
+
+    refresh_locations_count(session, campaign_id)
+    session.commit()
+    return total
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m app.rollup")
+    parser.add_argument("command", choices=["rebuild"])
+    parser.add_argument("--campaign", type=int, help="only this campaign")
+    args = parser.parse_args()
+
+    from .database import engine
+    with Session(engine) as session:
+        total = rebuild(session, args.campaign)
+    print(f"rebuilt rollup from {total} distribution records")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+# app/scans.py
+"""
+Live consumer QR scans.
+
+POST /campaigns/{id}/scan only adds to an in-memory counter per
+(campaign_id, day). A background thread drains the counters every
+SCAN_FLUSH_SECONDS and adds them to DailyActivity.live_scans with one
+multi-row upsert (ON CONFLICT ... live_scans + excluded.live_scans) per
+SCAN_FLUSH_CHUNK keys, so the database sees one statement per interval
+however many scans come in. Each worker process has its own buffer; the
+upserts add up, so several workers need no coordination.
+
+The buffer holds at most SCAN_BUFFER_MAX_KEYS keys; scans for a new key are
+refused while it is full (the endpoint answers 503) and the flush is started
+early. Counts that fail to flush go back into the buffer and are retried, so
+delivery to the database is at-least-once: a flush whose commit succeeded
+but reported an error is counted twice. Shutdown flushes what is left; scans
+accepted since the last flush are lost only if the process is killed without
+a shutdown.
+"""
+import logging
+import os
+import threading
+from datetime import date, datetime
+from typing import Callable, Dict, Optional, Tuple
+
+from sqlmodel import Session
+
+from .crud import dialect_insert
+from .metrics import REGISTRY, Counter
+from .models import DailyActivity
+
+logger = logging.getLogger(__name__)
+
+SCAN_FLUSH_SECONDS = float(os.getenv("SCAN_FLUSH_SECONDS", "1"))
+SCAN_BUFFER_MAX_KEYS = int(os.getenv("SCAN_BUFFER_MAX_KEYS", "100000"))
+SCAN_FLUSH_CHUNK = int(os.getenv("SCAN_FLUSH_CHUNK", "500"))
+
+scans_accepted = Counter("scans_accepted_total", "Scans accepted into the buffer.")
+scans_rejected = Counter("scans_rejected_total", "Scans refused because the buffer was full.")
+scans_flushed = Counter("scans_flushed_total", "Scans written to DailyActivity.live_scans.")
+scan_flush_failures = Counter("scan_flush_failures_total", "Flushes that failed and were put back for retry.")
+REGISTRY.extend([scans_accepted, scans_rejected, scans_flushed, scan_flush_failures])
+
+Key = Tuple[int, date]
+
+class ScanBuffer:
+    def __init__(
+        self,
+        engine,
+        flush_interval: float = SCAN_FLUSH_SECONDS,
+        max_keys: int = SCAN_BUFFER_MAX_KEYS,
+        chunk: int = SCAN_FLUSH_CHUNK,
+        on_flushed: Optional[Callable[[Dict[Key, int]], None]] = None,
+    ):
+        self.engine = engine
+        self.flush_interval = flush_interval
+        self.max_keys = max_keys
+        self.chunk = chunk
+        # called after commit with the counts written, {(campaign_id, day): scans}
+        self.on_flushed = on_flushed
+        self._counts: Dict[Key, int] = {}
+        self._lock = threading.Lock()
+        # serializes flushes (the thread's and a shutdown/explicit one)
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def add(self, campaign_id: int, count: int = 1) -> bool:
+        """Count `count` scans for today (UTC). False if the buffer is full."""
+        key = (campaign_id, datetime.utcnow().date())
+        with self._lock:
+            current = self._counts.get(key)
+            if current is None and len(self._counts) >= self.max_keys:
+                full = True
+            else:
+                self._counts[key] = (current or 0) + count
+                full = False
+        if full:
+            scans_rejected.inc(amount=count)
+            self._wake.set()
+            return False
+        scans_accepted.inc(amount=count)
+        return True
+
+    def pending(self) -> int:
+        with self._lock:
+            return sum(self._counts.values())
+
+    def _put_back(self, counts: Dict[Key, int]):
+        # may briefly exceed max_keys; nothing is dropped
+        with self._lock:
+            for key, n in counts.items():
+                self._counts[key] = self._counts.get(key, 0) + n
+
+    def flush(self) -> int:
+        """Write the buffered counts. Returns the number of scans written."""
+        with self._flush_lock:
+            with self._lock:
+                counts, self._counts = self._counts, {}
+            if not counts:
+                return 0
+            try:
+                self._write(counts)
+            except Exception:
+                self._put_back(counts)
+                scan_flush_failures.inc()
+                raise
+
+        total = sum(counts.values())
+        scans_flushed.inc(amount=total)
+        if self.on_flushed is not None:
+            self.on_flushed(counts)
+        return total
+
+    def _write(self, counts: Dict[Key, int]):
+        now = datetime.utcnow()
+        rows = [
+            dict(
+                campaign_id=campaign_id, day=day, manufactured_today=0, distributed_today=0,
+                scan_count_today=0, live_scans=n, created_at=now
+            )
+            for (campaign_id, day), n in sorted(counts.items())  # same lock order in every worker
+        ]
+        with Session(self.engine) as session:
+            for i in range(0, len(rows), self.chunk):
+                stmt = dialect_insert(session, DailyActivity).values(rows[i:i + self.chunk])
+                session.execute(stmt.on_conflict_do_update(
+                    index_elements=["campaign_id", "day"],
+                    set_={"live_scans": DailyActivity.__table__.c.live_scans + stmt.excluded.live_scans},
+                ))
+            session.commit()
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="scan-flusher", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10):
+        """Stop the thread and flush what is left."""
+        self._stop.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+        for attempt in range(3):
+            try:
+                self.flush()
+                return
+            except Exception:
+                logger.exception("Final scan flush failed (attempt %d)", attempt + 1)
+        logger.error("Dropping %d unflushed scans", self.pending())
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Scan flush failed; will retry")
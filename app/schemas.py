@@ -25,6 +25,11 @@ class BrandOut(BaseModel):
 # Auth
 # ----------------------------
 
+class BrandClaims(BaseModel):
+    """The authenticated brand as read from a token in stateless auth mode."""
+    id: int
+    email: str
+
 class Token(BaseModel):
     access_token: str
     token_type: str = "bearer"
@@ -51,6 +56,19 @@ class CampaignOut(BaseModel):
     class Config:
         orm_mode = True
 
+# -------------------------------------------------------------
+# Manufacturing / Distribution
+# -------------------------------------------------------------
+class BatchIn(BaseModel):
+    batch_number: str
+    manufactured_count: int
+
+class DistIn(BaseModel):
+    location_name: str
+    distributed_count: int
+    lat: Optional[float] = None
+    lng: Optional[float] = None
+
 # -------------------------------------------------------------
 # DailyActivity + Location schemas
 # -------------------------------------------------------------
@@ -74,7 +92,8 @@ class DailyActivityOut(DailyActivityBase):
     id: int
     campaign_id: int
     locations: Optional[List[LocationIn]] = None
-    _sha256: Optional[str] = None
+    live_scans: int = 0
+    sha256: Optional[str] = None
     algorand_txid: Optional[str] = None
     created_at: datetime
 
@@ -86,9 +105,92 @@ class DailyActivityOut(DailyActivityBase):
 # -------------------------------------------------------------
 class CampaignDailySummary(BaseModel):
     campaign_id: int
-    totals: dict  # Example: { "manufactured": 50000, "distributed": 30000, "scans": 4200, "locations": 10 }
+    totals: dict  # Example: { "manufactured": 50000, "distributed": 30000, "scans": 4200, "live_scans": 1300, "locations": 10 }
     today: Optional[DailyActivityOut]
     history: List[DailyActivityOut] = []  # Sorted newest → oldest
     start_date: Optional[datetime] = None
     end_date: Optional[datetime] = None
 
+# -------------------------------------------------------------
+# Brand analytics (all campaigns)
+# -------------------------------------------------------------
+class ActivityBucket(BaseModel):
+    bucket_start: date  # first day of the day / week (Monday) / month
+    campaign_id: Optional[int] = None  # set when grouped by campaign
+    manufactured: int
+    distributed: int
+    scans: int  # reported + live
+    live_scans: int = 0
+
+class BrandAnalyticsOut(BaseModel):
+    bucket: str  # "day" | "week" | "month"
+    start: Optional[date] = None
+    end: Optional[date] = None
+    totals: dict  # Example: { "manufactured": 50000, "distributed": 30000, "scans": 4200, "live_scans": 1300 }
+    buckets: List[ActivityBucket] = []  # Sorted oldest → newest
+
+
+# -------------------------------------------------------------
+# Map
+# -------------------------------------------------------------
+class MapPoint(BaseModel):
+    id: int
+    location_name: str
+    lat: float
+    lng: float
+    distributed_count: int
+    distributed_at: datetime
+    distance_m: Optional[float] = None  # radius queries only
+
+class MapPointsOut(BaseModel):
+    points: List[MapPoint] = []  # bbox: geohash order; radius: nearest first
+    truncated: bool  # more points matched than `limit`
+
+class HeatmapCluster(BaseModel):
+    cell: str  # geohash prefix
+    lat: float  # mean of the cluster's points
+    lng: float
+    records: int
+    distributed_count: int
+
+class HeatmapTileOut(BaseModel):
+    z: int
+    x: int
+    y: int
+    precision: int  # geohash length the clusters were grouped by
+    records: int
+    clusters: List[HeatmapCluster] = []
+
+# -------------------------------------------------------------
+# Proofs
+# -------------------------------------------------------------
+class MerkleStep(BaseModel):
+    hash: str
+    position: str  # side of the sibling: "left" | "right"
+
+class InclusionProofOut(BaseModel):
+    related_type: str
+    related_id: int
+    leaf_hash: str
+    status: str
+    algorand_txid: Optional[str] = None
+    merkle_root: Optional[str] = None  # None when the hash was anchored directly
+    path: List[MerkleStep] = []
+
+class VerifyRequest(BaseModel):
+    manufacturing_batches: List[int] = []
+    distributions: List[int] = []
+    daily_activities: List[int] = []
+    distribution_uploads: List[int] = []
+
+class VerificationResult(BaseModel):
+    related_type: str
+    related_id: int
+    # "verified" | "mismatch" | "pending" | "not_on_chain" | "not_found" | "indexer_error"
+    status: str
+    matches: bool
+    computed_hash: Optional[str] = None
+    algorand_txid: Optional[str] = None
+    onchain_note: Optional[str] = None
+    # set for uploads and bulk rows: the upload whose proof was checked
+    upload_id: Optional[int] = None
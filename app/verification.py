@@ -0,0 +1,258 @@
+# app/verification.py
+"""
+Checks stored records against the proof notes anchored on Algorand.
+
+Indexer lookups go through one pooled httpx.AsyncClient and a bounded cache
+keyed by txid. Confirmed transactions never change, so they are cached
+without expiry; misses (not yet indexed) are cached briefly. httpx is
+imported with the first lookup: it is slow to import and most workers never
+verify.
+
+Bulk uploads are anchored with one proof per upload. That proof's hash is
+recomputed from the stored rows of the upload, so a changed, added or
+removed row shows as a mismatch. A bulk row has no proof of its own and is
+verified through its upload's proof (the result names the upload).
+"""
+import asyncio
+import base64
+import binascii
+import hashlib
+import json
+import os
+from typing import TYPE_CHECKING, Dict, List, Optional
+
+from sqlmodel import Session, select
+
+from .algorand_client import INDEXER_ADDRESS, INDEXER_TOKEN, compute_sha256_of_object
+from .anchoring import PROOF_COLUMNS, PROOF_OBJECTS, distribution_upload_proof_obj
+from .bulk import row_line
+from .cache import TTLCache
+from .merkle import verify_inclusion
+from .metrics import external_call
+from .models import BlockchainProof, Campaign, DistributionRecord, DistributionUpload
+
+if TYPE_CHECKING:
+    import httpx
+
+VERIFY_CACHE_SIZE = int(os.getenv("VERIFY_CACHE_SIZE", "10000"))
+VERIFY_MISS_TTL_SECONDS = float(os.getenv("VERIFY_MISS_TTL_SECONDS", "30"))
+VERIFY_CONCURRENCY = int(os.getenv("VERIFY_CONCURRENCY", "16"))
+INDEXER_TIMEOUT_SECONDS = float(os.getenv("INDEXER_TIMEOUT_SECONDS", "10"))
+
+class IndexerNotes:
+    """Cached txid -> decoded note lookups against the indexer REST API."""
+
+    def __init__(self, base_url: str = INDEXER_ADDRESS, token: str = INDEXER_TOKEN, transport=None):
+        self.base_url = base_url
+        self.token = token
+        self.transport = transport
+        self.cache = TTLCache(maxsize=VERIFY_CACHE_SIZE)
+        self._client: Optional["httpx.AsyncClient"] = None
+        # concurrent lookups of one txid (e.g. a shared Merkle root) share a request
+        self._inflight: Dict[str, asyncio.Task] = {}
+
+    @property
+    def client(self) -> "httpx.AsyncClient":
+        if self._client is None:
+            import httpx
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers={"X-Indexer-API-Token": self.token} if self.token else {},
+                timeout=INDEXER_TIMEOUT_SECONDS,
+                limits=httpx.Limits(max_connections=VERIFY_CONCURRENCY),
+                transport=self.transport,
+            )
+        return self._client
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def note(self, txid: str) -> Optional[str]:
+        """The transaction note as text, or None if the indexer has no such txn."""
+        cached = self.cache.get(txid, False)
+        if cached is not False:
+            return cached
+
+        task = self._inflight.get(txid)
+        if task is None:
+            task = asyncio.ensure_future(self._fetch(txid))
+            self._inflight[txid] = task
+            task.add_done_callback(lambda _: self._inflight.pop(txid, None))
+        return await asyncio.shield(task)
+
+    async def _fetch(self, txid: str) -> Optional[str]:
+        with external_call("indexer"):
+            resp = await self.client.get(f"/v2/transactions/{txid}")
+        if resp.status_code == 404:
+            self.cache.set(txid, None, ttl=VERIFY_MISS_TTL_SECONDS)
+            return None
+        resp.raise_for_status()
+
+        txn = resp.json().get("transaction") or {}
+        note_b64 = txn.get("note")
+        note = note_text(note_b64) if note_b64 else None
+        # confirmed transactions are immutable: keep them until evicted
+        ttl = None if txn.get("confirmed-round") else VERIFY_MISS_TTL_SECONDS
+        self.cache.set(txid, note, ttl=ttl)
+        return note
+
+indexer_notes = IndexerNotes()
+
+def note_text(note_b64: str) -> str:
+    """
+    A base64 note as text. Notes this app didn't write may be anything;
+    they come back garbled instead of raising, and compare as a mismatch.
+    """
+    try:
+        return base64.b64decode(note_b64).decode("utf-8", errors="replace")
+    except binascii.Error:
+        return note_b64
+
+def upload_proof_hash(session: Session, upload: DistributionUpload) -> str:
+    """The upload's proof hash with rows, distributed_count and rows_sha256 recomputed from its stored rows."""
+    digest = hashlib.sha256()
+    rows = distributed = 0
+    result = session.exec(
+        select(
+            DistributionRecord.location_name, DistributionRecord.distributed_count,
+            DistributionRecord.lat, DistributionRecord.lng
+        )
+        .where(DistributionRecord.upload_id == upload.id)
+        .order_by(DistributionRecord.id)
+        .execution_options(yield_per=1000)
+    )
+    for location_name, distributed_count, lat, lng in result:
+        digest.update(row_line({
+            "location_name": location_name, "distributed_count": distributed_count, "lat": lat, "lng": lng,
+        }))
+        rows += 1
+        distributed += distributed_count
+    return compute_sha256_of_object({
+        **distribution_upload_proof_obj(upload),
+        "rows": rows,
+        "distributed_count": distributed,
+        "rows_sha256": digest.hexdigest(),
+    })
+
+def _proofs(session: Session, related_type: str, txid_by_id: Dict[int, str]) -> Dict[int, BlockchainProof]:
+    """related_id -> the proof that was sent with the record's current txid."""
+    if not txid_by_id:
+        return {}
+    proofs = session.exec(
+        select(BlockchainProof).where(
+            BlockchainProof.related_type == related_type,
+            BlockchainProof.related_id.in_(list(txid_by_id)),
+            BlockchainProof.algorand_txid.in_(list(set(txid_by_id.values())))
+        )
+    ).all()
+    return {p.related_id: p for p in proofs if txid_by_id[p.related_id] == p.algorand_txid}
+
+def load_verification_targets(session: Session, brand_id: int, ids_by_type: Dict[str, List[int]]) -> List[dict]:
+    """
+    Recompute the proof hash of every requested record owned by `brand_id`.
+    One query per record type plus one for the Merkle paths, and for bulk
+    uploads one query per upload for its rows.
+    """
+    # upload_id -> (upload, recomputed hash); several requested rows may share one
+    uploads: Dict[int, tuple] = {}
+
+    def upload_target(upload_id: int) -> tuple:
+        if upload_id not in uploads:
+            upload = session.get(DistributionUpload, upload_id)
+            uploads[upload_id] = (upload, upload_proof_hash(session, upload))
+        return uploads[upload_id]
+
+    targets = []
+    for related_type, ids in ids_by_type.items():
+        if not ids:
+            continue
+        model, _, txid_column = PROOF_COLUMNS[related_type]
+        records = session.exec(
+            select(model)
+            .join(Campaign, Campaign.id == model.campaign_id)
+            .where(model.id.in_(ids), Campaign.brand_id == brand_id)
+        ).all()
+        found = {r.id: r for r in records}
+
+        # what each record's proof is: (proof type, proof id, hash, txid)
+        anchors = {}
+        for r in records:
+            if related_type == "distribution" and r.upload_id is not None:
+                upload, computed = upload_target(r.upload_id)
+                anchors[r.id] = ("distribution_upload", upload.id, computed, upload.proof_txid)
+            elif related_type == "distribution_upload":
+                upload, computed = upload_target(r.id)
+                anchors[r.id] = (related_type, r.id, computed, upload.proof_txid)
+            else:
+                computed = compute_sha256_of_object(PROOF_OBJECTS[related_type](r))
+                anchors[r.id] = (related_type, r.id, computed, getattr(r, txid_column.key))
+
+        proofs = {}
+        for proof_type in {a[0] for a in anchors.values()}:
+            txids = {a[1]: a[3] for a in anchors.values() if a[0] == proof_type and a[3]}
+            for proof_id, p in _proofs(session, proof_type, txids).items():
+                proofs[(proof_type, proof_id)] = p
+
+        for related_id in ids:
+            if related_id not in found:
+                targets.append({"related_type": related_type, "related_id": related_id, "found": False})
+                continue
+            proof_type, proof_id, computed, txid = anchors[related_id]
+            proof = proofs.get((proof_type, proof_id))
+            targets.append({
+                "related_type": related_type,
+                "related_id": related_id,
+                "found": True,
+                "upload_id": proof_id if proof_type == "distribution_upload" else None,
+                "computed_hash": computed,
+                "algorand_txid": txid,
+                "merkle_root": proof.merkle_root if proof else None,
+                "path": json.loads(proof.merkle_path) if proof and proof.merkle_path else [],
+            })
+    return targets
+
+async def verify_targets(targets: List[dict], notes: IndexerNotes = indexer_notes) -> List[dict]:
+    """Fetch the on-chain notes concurrently and compare them with the recomputed hashes."""
+    import httpx
+    semaphore = asyncio.Semaphore(VERIFY_CONCURRENCY)
+
+    async def check(t: dict) -> dict:
+        result = {
+            "related_type": t["related_type"],
+            "related_id": t["related_id"],
+            "computed_hash": t.get("computed_hash"),
+            "algorand_txid": t.get("algorand_txid"),
+            "onchain_note": None,
+            "matches": False,
+            "upload_id": t.get("upload_id"),
+        }
+        if not t["found"]:
+            result["status"] = "not_found"
+            return result
+        if not t["algorand_txid"]:
+            result["status"] = "pending"
+            return result
+
+        try:
+            async with semaphore:
+                note = await notes.note(t["algorand_txid"])
+        except httpx.HTTPError:
+            result["status"] = "indexer_error"
+            return result
+        result["onchain_note"] = note
+
+        computed = t["computed_hash"]
+        if note is None:
+            result["status"] = "not_on_chain"
+        elif note == computed or (
+            t["merkle_root"] == note and verify_inclusion(computed, t["path"], note)
+        ):
+            result["status"] = "verified"
+            result["matches"] = True
+        else:
+            result["status"] = "mismatch"
+        return result
+
+    return list(await asyncio.gather(*(check(t) for t in targets)))
@@ -0,0 +1,235 @@
+"""
+Runs the AnchorWorker against a local fake algod and checks what it sends:
+
+- grouping: 37 pending proofs go out as atomic groups of 16, 16 and 5, and
+  every record gets the txid of its own transaction.
+- retry: a failed submit leaves the proofs pending with a backoff and no
+  claim; the next pass after the backoff sends them.
+- merkle: one transaction whose note is the Merkle root, every proof's
+  stored path verifies against it, and an internal node doesn't verify as
+  a leaf.
+- on_anchored: the callback gets every anchored record, by campaign.
+- claims: --workers workers draining the same proofs at once send each one
+  exactly once, and a proof claimed by a worker that died is sent again
+  once its claim expires.
+
+Exits non-zero if any check fails. Uses DATABASE_URL when set, otherwise a
+temporary SQLite file.
+
+Run from the project root:
+    python -m benchmarks.anchoring_check [--workers 4] [--proofs 300]
+"""
+import argparse
+import base64
+import os
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+if "DATABASE_URL" not in os.environ:
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+
+from algosdk import account, transaction
+from sqlalchemy import insert, update
+from sqlmodel import Session, select
+
+from app.anchoring import AnchorWorker
+from app.database import engine, init_db
+from app import merkle
+from app.merkle import verify_inclusion
+from app.models import BlockchainProof, Brand, Campaign, DistributionRecord
+
+class FakeAlgod:
+    """Offline algod: fixed suggested params; records every group, optionally fails the next submits."""
+
+    def __init__(self, fail: int = 0, delay: float = 0.0):
+        self.fail = fail
+        self.delay = delay
+        self.groups = []
+        self._lock = threading.Lock()
+
+    def suggested_params(self):
+        return transaction.SuggestedParams(
+            fee=1000, first=1, last=1001, gh=base64.b64encode(b"\0" * 32).decode(), gen="check-v1", flat_fee=True
+        )
+
+    def send_transactions(self, signed):
+        time.sleep(self.delay)
+        with self._lock:
+            if self.fail:
+                self.fail -= 1
+                raise ConnectionError("algod unavailable")
+            self.groups.append([(stx.get_txid(), stx.transaction.note.decode()) for stx in signed])
+        return signed[0].get_txid()
+
+    def notes(self):
+        return [note for group in self.groups for _, note in group]
+
+failures = []
+
+def check(ok: bool, what: str):
+    print(f"{'ok  ' if ok else 'FAIL'} {what}")
+    if not ok:
+        failures.append(what)
+
+def seed(n):
+    """A campaign with n distribution records and their pending proofs. Returns (campaign_id, {record id: hash})."""
+    now = datetime.utcnow()
+    with engine.begin() as conn:
+        brand_id = conn.execute(insert(Brand).values(
+            name="check", email=f"anchor-{time.time()}@example.com", password_hash="x", token_version=0, created_at=now
+        )).inserted_primary_key[0]
+        campaign_id = conn.execute(insert(Campaign).values(
+            name="anchor", brand_id=brand_id, manufactured=0, distributed=0, locations_count=0, created_at=now
+        )).inserted_primary_key[0]
+        hashes = {}
+        for i in range(n):
+            h = f"{campaign_id:08x}{i:056x}"
+            record_id = conn.execute(insert(DistributionRecord).values(
+                campaign_id=campaign_id, location_name=f"loc-{i}", distributed_count=1, distributed_at=now, proof_hash=h
+            )).inserted_primary_key[0]
+            conn.execute(insert(BlockchainProof).values(
+                related_type="distribution", related_id=record_id, sha256_hash=h,
+                status="pending", attempts=0, next_attempt_at=now, created_at=now
+            ))
+            hashes[record_id] = h
+    return campaign_id, hashes
+
+def proofs_of(hashes):
+    with Session(engine) as session:
+        return session.exec(
+            select(BlockchainProof).where(BlockchainProof.sha256_hash.in_(list(hashes.values())))
+        ).all()
+
+def worker(client, mode="group", **kwargs):
+    private_key, address = account.generate_account()
+    return AnchorWorker(engine, client=client, private_key=private_key, address=address, mode=mode, window=0, **kwargs)
+
+def check_grouping():
+    campaign_id, hashes = seed(37)
+    algod = FakeAlgod()
+    anchored = []
+    sent = worker(algod, on_anchored=anchored.append).run_once()
+
+    check(sent == 37 and [len(g) for g in algod.groups] == [16, 16, 5], "grouping: 37 proofs sent as 16 + 16 + 5")
+    txid_by_note = {note: txid for group in algod.groups for txid, note in group}
+    with Session(engine) as session:
+        records = session.exec(select(DistributionRecord).where(DistributionRecord.campaign_id == campaign_id)).all()
+    check(all(r.proof_txid == txid_by_note.get(r.proof_hash) for r in records), "grouping: each record has its own txid")
+    check(all(p.status == "sent" and p.claimed_by is None for p in proofs_of(hashes)), "grouping: proofs sent, claims released")
+
+    got = {r["related_id"]: r["txid"] for batch in anchored for r in batch.get(campaign_id, [])}
+    expected = {record_id: txid_by_note[h] for record_id, h in hashes.items()}
+    check(got == expected, "on_anchored: every anchored record with its txid, under its campaign")
+
+def check_retry():
+    _, hashes = seed(3)
+    algod = FakeAlgod(fail=1)
+    w = worker(algod)
+    first = w.run_once()
+    proofs = proofs_of(hashes)
+    check(
+        first == 0 and all(
+            p.status == "pending" and p.attempts == 1 and p.next_attempt_at > datetime.utcnow()
+            and p.claimed_by is None and p.last_error for p in proofs
+        ),
+        "retry: failed submit leaves the proofs pending with a backoff"
+    )
+    check(w.run_once() == 0, "retry: nothing is sent before the backoff")
+
+    with Session(engine) as session:
+        session.execute(
+            update(BlockchainProof)
+            .where(BlockchainProof.id.in_([p.id for p in proofs]))
+            .values(next_attempt_at=datetime.utcnow())
+        )
+        session.commit()
+    second = w.run_once()
+    check(second == 3 and sorted(algod.notes()) == sorted(hashes.values()), "retry: sent after the backoff")
+
+def check_merkle():
+    _, hashes = seed(21)
+    algod = FakeAlgod()
+    sent = worker(algod, mode="merkle").run_once()
+    check(sent == 21 and [len(g) for g in algod.groups] == [1], "merkle: 21 proofs anchored in one transaction")
+    root = algod.notes()[0] if algod.groups else None
+    proofs = proofs_of(hashes)
+    check(
+        all(p.merkle_root == root and verify_inclusion(p.sha256_hash, json_path(p), root) for p in proofs),
+        "merkle: every inclusion path verifies against the anchored root"
+    )
+    tampered = proofs[0].sha256_hash[:-1] + ("0" if proofs[0].sha256_hash[-1] != "0" else "1")
+    check(not verify_inclusion(tampered, json_path(proofs[0]), root), "merkle: a changed hash does not verify")
+    # the node a path's first step leads to, offered as a leaf with the rest of the path
+    path = json_path(proofs[0])
+    leaf = merkle._leaf(proofs[0].sha256_hash)
+    sibling = bytes.fromhex(path[0]["hash"])
+    internal = merkle._parent(sibling, leaf) if path[0]["position"] == "left" else merkle._parent(leaf, sibling)
+    check(
+        verify_inclusion(proofs[0].sha256_hash, path, root) and not verify_inclusion(internal.hex(), path[1:], root),
+        "merkle: an internal node does not verify as a leaf"
+    )
+
+def json_path(proof):
+    import json
+    return json.loads(proof.merkle_path)
+
+def check_claims(workers, n):
+    _, hashes = seed(n)
+    algods = [FakeAlgod(delay=0.01) for _ in range(workers)]
+    ws = [worker(a, batch_limit=64) for a in algods]
+
+    def drain(w):
+        while w.run_once():
+            pass
+    threads = [threading.Thread(target=drain, args=(w,)) for w in ws]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    notes = Counter(note for a in algods for note in a.notes())
+    check(set(notes) == set(hashes.values()), f"claims: all {n} proofs sent by {workers} workers")
+    check(max(notes.values()) == 1, f"claims: no proof sent twice ({sum(notes.values()) - len(notes)} duplicates)")
+
+    # a worker that claimed proofs and died: they wait for the claim to expire
+    _, hashes = seed(5)
+    ids = [p.id for p in proofs_of(hashes)]
+    with Session(engine) as session:
+        session.execute(
+            update(BlockchainProof).where(BlockchainProof.id.in_(ids))
+            .values(claimed_by="dead", claimed_until=datetime.utcnow() + timedelta(minutes=5))
+        )
+        session.commit()
+    algod = FakeAlgod()
+    w = worker(algod)
+    check(w.run_once() == 0, "claims: proofs claimed by another worker are left alone")
+    with Session(engine) as session:
+        session.execute(
+            update(BlockchainProof).where(BlockchainProof.id.in_(ids))
+            .values(claimed_until=datetime.utcnow() - timedelta(seconds=1))
+        )
+        session.commit()
+    check(w.run_once() == 5, "claims: an expired claim is taken over")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, default=4, help="concurrent workers in the claims check")
+    parser.add_argument("--proofs", type=int, default=300, help="proofs in the claims check")
+    args = parser.parse_args()
+
+    init_db()
+    check_grouping()
+    check_retry()
+    check_merkle()
+    check_claims(args.workers, args.proofs)
+
+    if failures:
+        print(f"FAIL: {len(failures)} checks failed")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
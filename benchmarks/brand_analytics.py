@@ -0,0 +1,93 @@
+"""
+Latency of GET /analytics for each bucket size on a seeded brand with
+100 campaigns x 365 days, next to the old way of building a portfolio view:
+one GET /campaigns/{id} per campaign.
+
+Uses DATABASE_URL when set, otherwise a temporary SQLite file.
+
+Run from the project root:
+    python -m benchmarks.brand_analytics [--campaigns 100] [--days 365] [--repeat 5]
+"""
+import argparse
+import os
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+if "DATABASE_URL" not in os.environ:
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+os.environ.setdefault("ANCHOR_WORKER_ENABLED", "0")
+
+from fastapi.testclient import TestClient
+from sqlalchemy import insert
+from sqlmodel import Session
+
+from app.database import engine
+from app.main import app
+from app.models import Brand, Campaign, DailyActivity
+
+def seed(brand_id, campaigns, days):
+    now = datetime.utcnow()
+    first_day = date.today() - timedelta(days=days - 1)
+    with engine.begin() as conn:
+        for c in range(campaigns):
+            campaign_id = conn.execute(insert(Campaign).values(
+                name=f"bench-{c}", brand_id=brand_id,
+                manufactured=0, distributed=0, locations_count=0, created_at=now
+            )).inserted_primary_key[0]
+            conn.execute(insert(DailyActivity), [
+                dict(
+                    campaign_id=campaign_id, day=first_day + timedelta(days=i),
+                    manufactured_today=100 + c, distributed_today=80, scan_count_today=i % 20, created_at=now
+                )
+                for i in range(days)
+            ])
+    return first_day
+
+def timed(client, path, headers, repeat):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        resp = client.get(path, headers=headers)
+        elapsed = time.perf_counter() - started
+        assert resp.status_code == 200, resp.text
+        best = elapsed if best is None else min(best, elapsed)
+    return best, resp.json()
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--campaigns", type=int, default=100)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with TestClient(app) as client:
+        email = f"bench-{time.time()}@example.com"
+        client.post("/brands", json={"name": "bench", "email": email, "password": "bench"})
+        token = client.post("/token", data={"username": email, "password": "bench"}).json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+        with Session(engine) as session:
+            brand_id = session.query(Brand.id).filter(Brand.email == email).scalar()
+        first_day = seed(brand_id, args.campaigns, args.days)
+
+        print(f"{args.campaigns} campaigns x {args.days} days")
+        print(f"{'request':>32} {'buckets':>8} {'ms':>8}")
+        for path in (
+            "/analytics?bucket=day",
+            "/analytics?bucket=week",
+            "/analytics?bucket=month",
+            "/analytics?bucket=month&by_campaign=true",
+            f"/analytics?bucket=week&start={first_day + timedelta(days=args.days - 90)}",
+        ):
+            elapsed, body = timed(client, path, headers, args.repeat)
+            print(f"{path.split('?')[1][:32]:>32} {len(body['buckets']):>8} {elapsed * 1000:>8.1f}")
+
+        campaign_ids = [c["id"] for c in client.get("/campaigns", headers=headers).json()]
+        started = time.perf_counter()
+        for campaign_id in campaign_ids:
+            assert client.get(f"/campaigns/{campaign_id}", headers=headers).status_code == 200
+        elapsed = time.perf_counter() - started
+        print(f"{'GET /campaigns/{id} x ' + str(len(campaign_ids)):>32} {'-':>8} {elapsed * 1000:>8.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Rows per second of POST /campaigns/{id}/distribute/bulk for each body format,
+compared with posting the same rows one at a time to /distribute.
+
+Uses DATABASE_URL when set, otherwise a temporary SQLite file.
+
+Run from the project root:
+    python -m benchmarks.bulk_distribution [--rows 50000]
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+if "DATABASE_URL" not in os.environ:
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+os.environ.setdefault("ANCHOR_WORKER_ENABLED", "0")
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+
+SINGLE_ROWS = 300
+
+def rows(n):
+    return [{"location_name": f"loc-{i % 500}", "distributed_count": 1 + i % 7, "lat": 12.9 + i * 1e-5, "lng": 77.6} for i in range(n)]
+
+def bodies(n):
+    data = rows(n)
+    csv_body = "location_name,distributed_count,lat,lng\n" + "".join(
+        f"{r['location_name']},{r['distributed_count']},{r['lat']},{r['lng']}\n" for r in data
+    )
+    return {
+        "json": ("application/json", json.dumps(data)),
+        "ndjson": ("application/x-ndjson", "\n".join(json.dumps(r) for r in data)),
+        "csv": ("text/csv", csv_body),
+    }
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=50000)
+    args = parser.parse_args()
+
+    with TestClient(app) as client:
+        email = f"bench-{time.time()}@example.com"
+        client.post("/brands", json={"name": "bench", "email": email, "password": "bench"})
+        token = client.post("/token", data={"username": email, "password": "bench"}).json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+        campaign_id = client.post("/campaigns", json={"name": "bench", "start_date": None, "end_date": None}, headers=headers).json()["id"]
+
+        print(f"{'format':>8} {'rows':>8} {'seconds':>8} {'rows/s':>10}")
+
+        started = time.perf_counter()
+        for r in rows(SINGLE_ROWS):
+            assert client.post(f"/campaigns/{campaign_id}/distribute", json=r, headers=headers).status_code == 200
+        elapsed = time.perf_counter() - started
+        print(f"{'single':>8} {SINGLE_ROWS:>8} {elapsed:>8.2f} {SINGLE_ROWS / elapsed:>10.0f}")
+
+        for name, (content_type, body) in bodies(args.rows).items():
+            started = time.perf_counter()
+            resp = client.post(
+                f"/campaigns/{campaign_id}/distribute/bulk",
+                content=body,
+                headers={**headers, "content-type": content_type},
+            )
+            elapsed = time.perf_counter() - started
+            assert resp.status_code == 200, resp.text
+            print(f"{name:>8} {args.rows:>8} {elapsed:>8.2f} {args.rows / elapsed:>10.0f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Counts the SQL statements and wall time of GET /campaigns/{campaign_id} as the
+campaign history grows. The query count should stay the same for every size.
+
+Run from the project root:
+    python -m benchmarks.campaign_summary_queries
+"""
+import os
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+DB_PATH = os.path.join(tempfile.mkdtemp(), "bench.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_PATH}"
+# measure building the summary, not serving it from the response cache
+os.environ["RESPONSE_CACHE_ENABLED"] = "0"
+
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+from sqlmodel import Session
+
+from app.database import engine
+from app.main import app
+from app.models import Brand, Campaign, DailyActivity, DistributionRecord
+from app.rollup import rebuild
+
+HISTORY_SIZES = [10, 90, 180, 365]
+LOCATIONS_PER_DAY = 5
+
+
+statements = []
+
+@event.listens_for(engine, "before_cursor_execute")
+def _count(conn, cursor, statement, parameters, context, executemany):
+    statements.append(statement)
+
+def seed_campaign(brand_id: int, days: int) -> int:
+    with Session(engine) as session:
+        campaign = Campaign(name=f"bench-{days}", brand_id=brand_id)
+        session.add(campaign)
+        session.commit()
+        session.refresh(campaign)
+
+        first_day = date.today() - timedelta(days=days - 1)
+        for i in range(days):
+            day = first_day + timedelta(days=i)
+            session.add(DailyActivity(
+                campaign_id=campaign.id,
+                day=day,
+                manufactured_today=100,
+                distributed_today=80,
+                scan_count_today=20
+            ))
+            for j in range(LOCATIONS_PER_DAY):
+                session.add(DistributionRecord(
+                    campaign_id=campaign.id,
+                    location_name=f"loc-{j}",
+                    distributed_count=16,
+                    distributed_at=datetime.combine(day, datetime.min.time()) + timedelta(hours=12)
+                ))
+        session.commit()
+        rebuild(session, campaign.id)
+        return campaign.id
+
+def main():
+    with TestClient(app) as client:
+        client.post("/brands", json={"name": "bench", "email": "bench@example.com", "password": "bench"})
+        token = client.post("/token", data={"username": "bench@example.com", "password": "bench"}).json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+        with Session(engine) as session:
+            brand_id = session.query(Brand.id).filter(Brand.email == "bench@example.com").scalar()
+
+        print(f"{'days':>6} {'queries':>8} {'ms':>8}")
+        for days in HISTORY_SIZES:
+            campaign_id = seed_campaign(brand_id, days)
+            client.get(f"/campaigns/{campaign_id}", headers=headers)  # warm up
+
+            statements.clear()
+            started = time.perf_counter()
+            resp = client.get(f"/campaigns/{campaign_id}", headers=headers)
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            assert resp.status_code == 200, resp.text
+            assert len(resp.json()["history"]) == days
+
+            print(f"{days:>6} {len(statements):>8} {elapsed_ms:>8.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+How long a fresh worker process takes to come up: importing app.main, the
+startup handlers (with and without DB_MIGRATE_ON_STARTUP) and the first
+request (GET /). Also lists the heavy optional modules (algosdk, httpx,
+passlib, alembic) that importing the app loaded, which should be none.
+
+Every run is a new interpreter, so nothing is warm except the OS file cache.
+The database is migrated once up front, so the migrating mode measures
+the check an already-migrated database costs on every boot. Uses DATABASE_URL
+when set, otherwise a temporary SQLite file.
+
+Run from the project root:
+    python -m benchmarks.cold_start [--runs 5]
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+HEAVY_MODULES = ("algosdk", "httpx", "passlib", "alembic")
+
+def run_child():
+    started = time.perf_counter()
+    from app.main import app
+    imported = time.perf_counter()
+    loaded = [m for m in HEAVY_MODULES if m in sys.modules]
+
+    async def boot():
+        await app.router.startup()
+        up = time.perf_counter()
+        import httpx
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+            first = time.perf_counter()
+            resp = await client.get("/")
+            assert resp.status_code == 200, resp.text
+        served = time.perf_counter()
+        await app.router.shutdown()
+        return up, served - first
+
+    up, first_request = asyncio.run(boot())
+    print(json.dumps({
+        "import_ms": round((imported - started) * 1000, 1),
+        "startup_ms": round((up - imported) * 1000, 1),
+        "first_request_ms": round(first_request * 1000, 1),
+        "loaded": loaded,
+    }))
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5, help="processes per mode")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child()
+        return
+
+    env = dict(os.environ, ANCHOR_WORKER_ENABLED="0", PASSWORD_HASH_WORKERS="0")
+    if "DATABASE_URL" not in env:
+        env["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+    subprocess.run(
+        [sys.executable, "-c", "from app.database import init_db; init_db()"], env=env, check=True
+    )
+
+    print(f"median of {args.runs} processes")
+    print(f"{'mode':>18} {'import ms':>10} {'startup ms':>11} {'1st request ms':>15} {'total ms':>9}  heavy modules")
+    for name, migrate in (("migrate on start", "1"), ("no migration", "0")):
+        runs = []
+        for _ in range(args.runs):
+            out = subprocess.run(
+                [sys.executable, "-m", "benchmarks.cold_start", "--child"],
+                env=dict(env, DB_MIGRATE_ON_STARTUP=migrate), capture_output=True, text=True, check=True
+            )
+            runs.append(json.loads(out.stdout.strip().splitlines()[-1]))
+        med = {k: statistics.median(r[k] for r in runs) for k in ("import_ms", "startup_ms", "first_request_ms")}
+        total = sum(med.values())
+        loaded = sorted({m for r in runs for m in r["loaded"]})
+        print(f"{name:>18} {med['import_ms']:>10.1f} {med['startup_ms']:>11.1f} {med['first_request_ms']:>15.1f} "
+              f"{total:>9.1f}  {', '.join(loaded) or '-'}")
+
+if __name__ == "__main__":
+    main()
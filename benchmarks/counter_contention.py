@@ -0,0 +1,122 @@
+"""
+Many parallel writers incrementing the counters of one hot campaign, in
+three modes:
+
+- orm: the previous path. Load the campaign, `campaign.distributed += n`,
+  commit. Two writers that read the same value overwrite each other.
+- atomic: counters.increment, `UPDATE campaign SET distributed = distributed + n`.
+- sharded: counters.increment with COUNTER_SHARDS = --shards, an upsert into
+  one of N shard rows; the total is read back with add_shard_totals.
+
+Each writer thread runs --transactions transactions of its own. Reports
+committed transactions per second, failed transactions, and whether the
+counter equals the sum of the committed increments (lost updates).
+
+Row-lock contention needs a real server: run it against Postgres with
+DATABASE_URL. SQLite allows one writer at a time for the whole file, so
+there the modes differ little in throughput; the orm mode still loses
+updates (the driver begins the transaction only at the UPDATE, after the
+read).
+
+Run from the project root:
+    python -m benchmarks.counter_contention [--writers 32] [--transactions 200] [--shards 16]
+"""
+import argparse
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+if "DATABASE_URL" not in os.environ:
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+
+from sqlalchemy import insert
+from sqlmodel import Session
+
+from app import counters
+from app.database import engine, init_db
+from app.models import Brand, Campaign
+from app.schemas import CampaignOut
+
+MODES = ("orm", "atomic", "sharded")
+
+def seed():
+    now = datetime.utcnow()
+    with engine.begin() as conn:
+        brand_id = conn.execute(insert(Brand).values(
+            name="bench", email=f"counters-{time.time()}@example.com", password_hash="x", token_version=0, created_at=now
+        )).inserted_primary_key[0]
+        return conn.execute(insert(Campaign).values(
+            name="hot", brand_id=brand_id, manufactured=0, distributed=0, locations_count=0, created_at=now
+        )).inserted_primary_key[0]
+
+def orm_increment(session, campaign_id, n):
+    campaign = session.get(Campaign, campaign_id)
+    campaign.distributed += n
+    session.add(campaign)
+
+def writer(mode, campaign_id, transactions, results, lock):
+    committed = failed = 0
+    for i in range(transactions):
+        n = i % 5 + 1
+        try:
+            with Session(engine) as session:
+                if mode == "orm":
+                    orm_increment(session, campaign_id, n)
+                else:
+                    counters.increment(session, campaign_id, distributed=n)
+                session.commit()
+            committed += n
+        except Exception:
+            failed += 1
+    with lock:
+        results["committed"] += committed
+        results["failed"] += failed
+
+def total(campaign_id):
+    with Session(engine) as session:
+        out = CampaignOut.from_orm(session.get(Campaign, campaign_id))
+        counters.add_shard_totals(session, [out])
+        return out.distributed
+
+def run(mode, args):
+    campaign_id = seed()
+    counters.COUNTER_SHARDS = args.shards if mode == "sharded" else 1
+    counters.COUNTER_SHARDED_CAMPAIGNS = set()
+
+    results = {"committed": 0, "failed": 0}
+    lock = threading.Lock()
+    threads = [
+        threading.Thread(target=writer, args=(mode, campaign_id, args.transactions, results, lock))
+        for _ in range(args.writers)
+    ]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    transactions = args.writers * args.transactions - results["failed"]
+    stored = total(campaign_id)
+    print(
+        f"{mode:>8}: {transactions / elapsed:8.0f} tx/s, {results['failed']:5d} failed, "
+        f"expected {results['committed']}, stored {stored}, lost {results['committed'] - stored}"
+    )
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--writers", type=int, default=32)
+    parser.add_argument("--transactions", type=int, default=200, help="per writer")
+    parser.add_argument("--shards", type=int, default=16)
+    parser.add_argument("--modes", type=lambda s: s.split(","), default=list(MODES))
+    args = parser.parse_args()
+
+    init_db()
+    print(f"{engine.dialect.name}, {args.writers} writers x {args.transactions} transactions")
+    for mode in args.modes:
+        run(mode, args)
+
+if __name__ == "__main__":
+    main()
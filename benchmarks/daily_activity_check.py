@@ -0,0 +1,223 @@
+"""
+Checks POST /campaigns/{id}/daily-activity with locations (_add_daily_activity)
+against the previous per-row implementation, and counts its SQL statements.
+
+The same sequence of posts (new days, a day posted again with other
+locations, a day posted again without locations) is applied to two
+campaigns: one through _add_daily_activity, one through `per_row`, a copy of
+the old code (an ORM delete per old record, an insert and commit per
+location, counters read-modify-written). Then:
+
+- the distribution records, daily activities and campaign counters of the
+  two campaigns must match;
+- the rollup, geo cells and locations_count kept by _add_daily_activity must
+  equal a rebuild from its records, and each activity's sha256 must match
+  its row;
+- posting a day with 200 locations must take no more statements than with
+  10, and at most --max-statements. Statements are counted with a
+  before_cursor_execute listener (an executemany counts once).
+
+Exits non-zero if any check fails. Uses DATABASE_URL when set, otherwise a
+temporary SQLite file.
+
+Run from the project root:
+    python -m benchmarks.daily_activity_check [--max-statements 20]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time as clock
+from datetime import date, datetime, time, timedelta
+
+if "DATABASE_URL" not in os.environ:
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+os.environ.setdefault("ANCHOR_WORKER_ENABLED", "0")
+
+from sqlalchemy import event, insert
+from sqlmodel import Session, select
+
+from app import geo, rollup
+from app.algorand_client import compute_sha256_of_object
+from app.anchoring import daily_activity_proof_obj
+from app.database import engine, init_db
+from app.main import _add_daily_activity
+from app.models import Brand, Campaign, DailyActivity, DailyLocationRollup, DistributionGeoCell, DistributionRecord
+from app.schemas import DailyActivityCreate, LocationIn
+
+class StatementCounter:
+    def __init__(self):
+        self.count = 0
+        event.listen(engine, "before_cursor_execute", self._on_execute)
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self.count += 1
+
+def per_row(session: Session, campaign_id: int, data: DailyActivityCreate):
+    """The previous implementation (without the proof, which is compared separately)."""
+    campaign = session.get(Campaign, campaign_id)
+    activity = session.exec(
+        select(DailyActivity).where(DailyActivity.campaign_id == campaign_id, DailyActivity.day == data.day)
+    ).first()
+    if activity:
+        campaign.manufactured -= activity.manufactured_today
+        campaign.distributed -= activity.distributed_today
+        activity.manufactured_today = data.manufactured_today
+        activity.distributed_today = data.distributed_today
+        activity.scan_count_today = data.scan_count_today
+    else:
+        activity = DailyActivity(
+            campaign_id=campaign_id, day=data.day, manufactured_today=data.manufactured_today,
+            distributed_today=data.distributed_today, scan_count_today=data.scan_count_today
+        )
+        session.add(activity)
+    campaign.manufactured += data.manufactured_today
+    campaign.distributed += data.distributed_today
+    session.add(campaign)
+    session.commit()
+
+    if data.locations:
+        day_start = datetime.combine(data.day, time.min)
+        old = session.exec(
+            select(DistributionRecord).where(
+                DistributionRecord.campaign_id == campaign_id,
+                DistributionRecord.distributed_at >= day_start,
+                DistributionRecord.distributed_at < day_start + timedelta(days=1)
+            )
+        ).all()
+        for record in old:
+            session.delete(record)
+        session.commit()
+        midday = datetime.combine(data.day, time(hour=12))
+        for loc in data.locations:
+            session.add(DistributionRecord(
+                campaign_id=campaign_id, location_name=loc.location_name, distributed_count=loc.distributed_count,
+                lat=loc.lat, lng=loc.lng, distributed_at=midday
+            ))
+            session.commit()
+
+def locations(rng, n):
+    return [
+        LocationIn(
+            location_name=f"loc-{rng.randrange(n * 2)}", distributed_count=rng.randint(1, 50),
+            lat=12.9 + rng.random() / 10 if i % 3 else None, lng=77.5 + rng.random() / 10 if i % 3 else None
+        )
+        for i in range(n)
+    ]
+
+def posts(rng):
+    first = date.today() - timedelta(days=10)
+    days = [first + timedelta(days=i) for i in range(3)]
+    return [
+        DailyActivityCreate(day=days[0], manufactured_today=100, distributed_today=80, scan_count_today=5, locations=locations(rng, 10)),
+        DailyActivityCreate(day=days[1], manufactured_today=300, distributed_today=200, scan_count_today=9, locations=locations(rng, 200)),
+        DailyActivityCreate(day=days[0], manufactured_today=120, distributed_today=70, scan_count_today=6, locations=locations(rng, 5)),
+        DailyActivityCreate(day=days[1], manufactured_today=310, distributed_today=210, scan_count_today=9),
+        DailyActivityCreate(day=days[2], manufactured_today=50, distributed_today=40, scan_count_today=1, locations=locations(rng, 30)),
+    ]
+
+def seed_campaigns():
+    now = datetime.utcnow()
+    with engine.begin() as conn:
+        brand_id = conn.execute(insert(Brand).values(
+            name="check", email=f"daily-{clock.time()}@example.com", password_hash="x", token_version=0, created_at=now
+        )).inserted_primary_key[0]
+        ids = [
+            conn.execute(insert(Campaign).values(
+                name=name, brand_id=brand_id, manufactured=0, distributed=0, locations_count=0, created_at=now
+            )).inserted_primary_key[0]
+            for name in ("set-based", "per-row")
+        ]
+    return brand_id, ids
+
+def state(session, campaign_id):
+    records = sorted(
+        [
+            (r.location_name, r.distributed_count, r.lat, r.lng, r.distributed_at)
+            for r in session.exec(select(DistributionRecord).where(DistributionRecord.campaign_id == campaign_id))
+        ],
+        key=repr  # lat/lng may be None
+    )
+    activities = sorted(
+        (a.day, a.manufactured_today, a.distributed_today, a.scan_count_today)
+        for a in session.exec(select(DailyActivity).where(DailyActivity.campaign_id == campaign_id))
+    )
+    campaign = session.get(Campaign, campaign_id)
+    return records, activities, (campaign.manufactured, campaign.distributed)
+
+def derived(session, campaign_id):
+    rollups = sorted(
+        (r.day, r.location_name, r.distributed_count, r.records)
+        for r in session.exec(select(DailyLocationRollup).where(DailyLocationRollup.campaign_id == campaign_id))
+    )
+    cells = sorted(
+        (c.cell, c.records, c.distributed_count, round(c.lat_sum, 9), round(c.lng_sum, 9))
+        for c in session.exec(select(DistributionGeoCell).where(DistributionGeoCell.campaign_id == campaign_id))
+    )
+    session.expire_all()
+    return rollups, cells, session.get(Campaign, campaign_id).locations_count
+
+failures = []
+
+def check(ok: bool, what: str):
+    print(f"{'ok  ' if ok else 'FAIL'} {what}")
+    if not ok:
+        failures.append(what)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--max-statements", type=int, default=20, help="per post, however many locations")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    init_db()
+    brand_id, (set_based, reference) = seed_campaigns()
+    counter = StatementCounter()
+
+    statements = {}
+    for data in posts(random.Random(args.seed)):
+        counter.count = 0
+        with Session(engine, expire_on_commit=False) as session:
+            _add_daily_activity(session, set_based, data, brand_id)
+        if data.locations:
+            statements[len(data.locations)] = counter.count
+
+        counter.count = 0
+        with Session(engine) as session:
+            per_row(session, reference, data)
+        if data.locations:
+            statements[f"{len(data.locations)} per row"] = counter.count
+
+    for n in (5, 10, 30, 200):
+        print(f"     {n:>3} locations: {statements[n]:>3} statements (previously {statements[f'{n} per row']})")
+    check(statements[200] <= statements[10], "statements: 200 locations take no more than 10")
+    check(max(statements[n] for n in (5, 10, 30, 200)) <= args.max_statements, f"statements: at most {args.max_statements} per post")
+
+    with Session(engine) as session:
+        got, expected = state(session, set_based), state(session, reference)
+        check(got[0] == expected[0], f"records match the per-row implementation ({len(got[0])} records)")
+        check(got[1] == expected[1], "daily activities match the per-row implementation")
+        check(got[2] == expected[2], f"campaign counters match the per-row implementation {got[2]}")
+
+        activities = session.exec(select(DailyActivity).where(DailyActivity.campaign_id == set_based)).all()
+        check(
+            all(a.sha256 == compute_sha256_of_object(daily_activity_proof_obj(a)) for a in activities),
+            "each activity's sha256 matches its row"
+        )
+
+        kept = derived(session, set_based)
+        rollup.rebuild(session, set_based)
+        geo.rebuild_cells(session, set_based)
+        session.commit()
+        rebuilt = derived(session, set_based)
+        check(kept[0] == rebuilt[0], "rollup equals a rebuild from the records")
+        check(kept[1] == rebuilt[1], "geo cells equal a rebuild from the records")
+        check(kept[2] == rebuilt[2], f"locations_count equals a rebuild ({kept[2]})")
+
+    if failures:
+        print(f"FAIL: {len(failures)} checks failed")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
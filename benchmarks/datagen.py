@@ -0,0 +1,154 @@
+"""
+Synthetic data generator for the benchmarks: brands, campaigns, daily
+activities and distribution records at a configurable scale.
+
+Apart from the brand emails, which get a unique prefix, the data only depends
+on the arguments (including --seed and --end-day), so benchmark results stay
+comparable across commits. Rows go in with bulk Core inserts; the
+location rollup, map cells and campaign counters are then rebuilt from them.
+
+Every brand has the password PASSWORD.
+
+Uses DATABASE_URL when set, otherwise a temporary SQLite file.
+
+Run from the project root:
+    python -m benchmarks.datagen [--brands 10] [--campaigns 5] [--days 90] [--records-per-day 10]
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from typing import List
+
+if "DATABASE_URL" not in os.environ:
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+
+from sqlalchemy import func, insert, select, update
+from sqlmodel import Session
+
+from app.auth import get_password_hash
+from app.database import engine, init_db
+from app.models import Brand, Campaign, DailyActivity, DistributionRecord
+from app.geo import geohash_or_none, rebuild_cells
+from app.rollup import rebuild
+
+PASSWORD = "bench-password"
+INSERT_CHUNK = 10000
+LOCATIONS = 200
+
+@dataclass
+class Dataset:
+    brands: List[dict] = field(default_factory=list)  # {"id", "email", "campaign_ids"}
+    rows: int = 0
+
+    @property
+    def campaign_ids(self) -> List[int]:
+        return [cid for b in self.brands for cid in b["campaign_ids"]]
+
+def _insert_chunked(conn, model, rows):
+    for i in range(0, len(rows), INSERT_CHUNK):
+        conn.execute(insert(model), rows[i:i + INSERT_CHUNK])
+
+def generate(
+    brands: int = 10,
+    campaigns: int = 5,
+    days: int = 90,
+    records_per_day: int = 10,
+    seed: int = 42,
+    end_day: date = date(2025, 6, 30),
+) -> Dataset:
+    """Seed the database and return the ids of what was created."""
+    rng = random.Random(seed)
+    password_hash = get_password_hash(PASSWORD)  # hashed once; all brands share it
+    first_day = end_day - timedelta(days=days - 1)
+    now = datetime.combine(end_day, datetime.min.time())
+    prefix = f"bench-{int(time.time() * 1000)}"
+    dataset = Dataset()
+
+    for b in range(brands):
+        email = f"{prefix}-{b}@example.com"
+        with engine.begin() as conn:
+            brand_id = conn.execute(insert(Brand).values(
+                name=f"brand {b}", email=email, password_hash=password_hash, token_version=0, created_at=now
+            )).inserted_primary_key[0]
+            campaign_ids = []
+            for c in range(campaigns):
+                campaign_ids.append(conn.execute(insert(Campaign).values(
+                    name=f"campaign {b}.{c}", brand_id=brand_id, start_date=now - timedelta(days=days),
+                    manufactured=0, distributed=0, locations_count=0, created_at=now
+                )).inserted_primary_key[0])
+
+            for campaign_id in campaign_ids:
+                activities, records = [], []
+                for d in range(days):
+                    day = first_day + timedelta(days=d)
+                    midnight = datetime.combine(day, datetime.min.time())
+                    activities.append(dict(
+                        campaign_id=campaign_id, day=day, manufactured_today=rng.randint(50, 500),
+                        distributed_today=rng.randint(20, 400), scan_count_today=rng.randint(0, 1000), live_scans=0,
+                        sha256=f"{rng.getrandbits(256):064x}", algorand_txid=None, created_at=midnight
+                    ))
+                    for _ in range(records_per_day):
+                        location = rng.randrange(LOCATIONS)
+                        lat, lng = 12.8 + location * 0.002, 77.5 + location * 0.002
+                        records.append(dict(
+                            campaign_id=campaign_id, location_name=f"loc-{location}",
+                            lat=lat, lng=lng, geohash=geohash_or_none(lat, lng),
+                            distributed_count=rng.randint(1, 20),
+                            distributed_at=midnight + timedelta(seconds=rng.randrange(86400)),
+                            proof_hash=f"{rng.getrandbits(256):064x}", proof_txid=None, upload_id=None
+                        ))
+                _insert_chunked(conn, DailyActivity, activities)
+                _insert_chunked(conn, DistributionRecord, records)
+
+            manufactured = (
+                select(func.coalesce(func.sum(DailyActivity.manufactured_today), 0))
+                .where(DailyActivity.campaign_id == Campaign.id).scalar_subquery()
+            )
+            distributed = (
+                select(func.coalesce(func.sum(DistributionRecord.distributed_count), 0))
+                .where(DistributionRecord.campaign_id == Campaign.id).scalar_subquery()
+            )
+            conn.execute(
+                update(Campaign).where(Campaign.id.in_(campaign_ids))
+                .values(manufactured=manufactured, distributed=distributed)
+            )
+        dataset.brands.append({"id": brand_id, "email": email, "campaign_ids": campaign_ids})
+
+    with Session(engine) as session:
+        for campaign_id in dataset.campaign_ids:
+            rebuild(session, campaign_id)
+            rebuild_cells(session, campaign_id)
+        session.commit()
+    dataset.rows = len(dataset.campaign_ids) * days * (records_per_day + 1)
+    return dataset
+
+def add_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--brands", type=int, default=10)
+    parser.add_argument("--campaigns", type=int, default=5, help="campaigns per brand")
+    parser.add_argument("--days", type=int, default=90, help="days of activity per campaign")
+    parser.add_argument("--records-per-day", type=int, default=10, help="distribution records per campaign and day")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--end-day", type=date.fromisoformat, default=date(2025, 6, 30))
+
+def generate_from_args(args) -> Dataset:
+    return generate(args.brands, args.campaigns, args.days, args.records_per_day, args.seed, args.end_day)
+
+def main():
+    parser = argparse.ArgumentParser()
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    init_db()
+    started = time.perf_counter()
+    dataset = generate_from_args(args)
+    print(
+        f"seeded {len(dataset.brands)} brands, {len(dataset.campaign_ids)} campaigns, "
+        f"{dataset.rows} rows in {time.perf_counter() - started:.1f}s into {engine.url.render_as_string(hide_password=True)}"
+    )
+
+if __name__ == "__main__":
+    main()
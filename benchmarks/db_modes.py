@@ -0,0 +1,124 @@
+"""
+Compares requests per second and latency of the hot read endpoints between the
+sync (threadpool) and async (DB_ASYNC=1) database modes.
+
+Each mode runs in its own subprocess because the mode is fixed at import
+time. Uses DATABASE_URL when set (e.g. the docker-compose Postgres), otherwise
+a temporary SQLite file.
+
+Run from the project root:
+    python -m benchmarks.db_modes [--requests 2000] [--concurrency 50]
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+DAYS = 60
+LOCATIONS_PER_DAY = 3
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+def seed():
+    from sqlmodel import Session
+    from app.auth import create_access_token
+    from app.database import engine
+    from app.models import Brand, Campaign, DailyActivity, DistributionRecord
+    from app.rollup import rebuild
+
+    with Session(engine) as session:
+        brand = Brand(name="bench", email=f"bench-{time.time()}@example.com", password_hash="x")
+        session.add(brand)
+        session.commit()
+        campaign = Campaign(name="bench", brand_id=brand.id)
+        session.add(campaign)
+        session.commit()
+
+        first_day = date.today() - timedelta(days=DAYS - 1)
+        for i in range(DAYS):
+            day = first_day + timedelta(days=i)
+            session.add(DailyActivity(campaign_id=campaign.id, day=day, manufactured_today=10, distributed_today=8))
+            for j in range(LOCATIONS_PER_DAY):
+                session.add(DistributionRecord(
+                    campaign_id=campaign.id,
+                    location_name=f"loc-{j}",
+                    distributed_count=2,
+                    distributed_at=datetime.combine(day, datetime.min.time()) + timedelta(hours=12)
+                ))
+        session.commit()
+        rebuild(session, campaign.id)
+        return create_access_token({"brand_id": brand.id, "email": brand.email}), campaign.id
+
+async def drive(app, token, campaign_id, total, concurrency):
+    import httpx
+
+    paths = [f"/campaigns/{campaign_id}", f"/campaigns/{campaign_id}/daily-activities?limit=30", "/campaigns"]
+    headers = {"Authorization": f"Bearer {token}"}
+    latencies = []
+    queue = asyncio.Queue()
+    for i in range(total):
+        queue.put_nowait(paths[i % len(paths)])
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        async def worker():
+            while not queue.empty():
+                path = queue.get_nowait()
+                started = time.perf_counter()
+                resp = await client.get(path, headers=headers)
+                latencies.append(time.perf_counter() - started)
+                assert resp.status_code == 200, resp.text
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    return {
+        "requests": total,
+        "rps": round(total / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+    }
+
+def run_child(total, concurrency):
+    from app.database import init_db
+    from app.main import app
+
+    init_db()
+    token, campaign_id = seed()
+    result = asyncio.run(drive(app, token, campaign_id, total, concurrency))
+    print(json.dumps(result))
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.requests, args.concurrency)
+        return
+
+    env = dict(os.environ, ANCHOR_WORKER_ENABLED="0", RESPONSE_CACHE_ENABLED="0")
+    if "DATABASE_URL" not in env:
+        env["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+
+    print(f"{'mode':>6} {'rps':>8} {'p50 ms':>8} {'p99 ms':>8}")
+    for mode, flag in (("sync", "0"), ("async", "1")):
+        out = subprocess.run(
+            [sys.executable, "-m", "benchmarks.db_modes", "--child",
+             "--requests", str(args.requests), "--concurrency", str(args.concurrency)],
+            env=dict(env, DB_ASYNC=flag), capture_output=True, text=True, check=True
+        )
+        r = json.loads(out.stdout.strip().splitlines()[-1])
+        print(f"{mode:>6} {r['rps']:>8} {r['p50_ms']:>8} {r['p99_ms']:>8}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""
+Seeds a dataset, runs EXPLAIN on the hot queries and checks that each one is
+answered from an index instead of a full table scan. Exits non-zero if any
+query scans a table.
+
+Uses DATABASE_URL when set (e.g. the docker-compose Postgres), otherwise a
+temporary SQLite file. The schema is created with the migrations.
+
+Run from the project root:
+    python -m benchmarks.explain_hot_queries [--campaigns 100] [--days 180]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time as clock
+from datetime import date, datetime, time, timedelta
+
+if "DATABASE_URL" not in os.environ:
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+
+from sqlalchemy import func, insert
+from sqlmodel import Session, select
+
+from app.database import engine, init_db
+from app.models import Brand, BlockchainProof, Campaign, DailyActivity, DailyLocationRollup, DistributionRecord
+from app.rollup import rebuild
+
+LOCATIONS_PER_DAY = 3
+
+def seed(conn, campaigns, days):
+    now = datetime.utcnow()
+    first_day = date.today() - timedelta(days=days - 1)
+    brand_ids = []
+    for b in range(max(1, campaigns // 10)):
+        brand_ids.append(conn.execute(insert(Brand).values(
+            name=f"brand-{b}", email=f"explain-{clock.time()}-{b}@example.com",
+            password_hash="x", token_version=0, created_at=now
+        )).inserted_primary_key[0])
+
+    for c in range(campaigns):
+        campaign_id = conn.execute(insert(Campaign).values(
+            name=f"campaign-{c}", brand_id=brand_ids[c % len(brand_ids)],
+            manufactured=0, distributed=0, locations_count=0, created_at=now
+        )).inserted_primary_key[0]
+
+        activities, records, proofs = [], [], []
+        for i in range(days):
+            day = first_day + timedelta(days=i)
+            activities.append(dict(
+                campaign_id=campaign_id, day=day, manufactured_today=10, distributed_today=8,
+                scan_count_today=2, created_at=now
+            ))
+            for j in range(LOCATIONS_PER_DAY):
+                records.append(dict(
+                    campaign_id=campaign_id, location_name=f"loc-{j}", distributed_count=2,
+                    distributed_at=datetime.combine(day, time(hour=12))
+                ))
+            proofs.append(dict(
+                related_type="daily_activity", related_id=c * days + i + 1, sha256_hash="0" * 64,
+                status="sent" if i < days - 1 else "pending", attempts=0, next_attempt_at=now, created_at=now
+            ))
+        conn.execute(insert(DailyActivity), activities)
+        conn.execute(insert(DistributionRecord), records)
+        conn.execute(insert(BlockchainProof), proofs)
+    return brand_ids[0], campaign_id, first_day
+
+def hot_queries(brand_id, campaign_id, day):
+    day_start = datetime.combine(day, time.min)
+    return {
+        "brand by email": select(Brand).where(Brand.email == "nobody@example.com"),
+        "campaigns of a brand": select(Campaign).where(Campaign.brand_id == brand_id),
+        "daily activity of a day": select(DailyActivity).where(
+            DailyActivity.campaign_id == campaign_id, DailyActivity.day == day
+        ),
+        "daily activities page": select(DailyActivity)
+            .where(DailyActivity.campaign_id == campaign_id)
+            .order_by(DailyActivity.day.desc())
+            .limit(30),
+        "campaign totals": select(func.sum(DailyActivity.scan_count_today))
+            .where(DailyActivity.campaign_id == campaign_id),
+        "rollup of a day range": select(DailyLocationRollup)
+            .where(
+                DailyLocationRollup.campaign_id == campaign_id,
+                DailyLocationRollup.day >= day,
+                DailyLocationRollup.day <= day + timedelta(days=30)
+            )
+            .order_by(DailyLocationRollup.id),
+        "distributions of a day range": select(DistributionRecord)
+            .where(
+                DistributionRecord.campaign_id == campaign_id,
+                DistributionRecord.distributed_at >= day_start,
+                DistributionRecord.distributed_at < day_start + timedelta(days=30)
+            )
+            .order_by(DistributionRecord.id),
+        "anchoring queue": select(BlockchainProof)
+            .where(BlockchainProof.status == "pending", BlockchainProof.next_attempt_at <= datetime.utcnow())
+            .order_by(BlockchainProof.id)
+            .limit(16),
+        "proof of a record": select(BlockchainProof)
+            .where(BlockchainProof.related_type == "daily_activity", BlockchainProof.related_id == 1)
+            .order_by(BlockchainProof.id.desc()),
+    }
+
+def explain(conn, stmt):
+    compiled = stmt.compile(dialect=conn.dialect)
+    if conn.dialect.name == "sqlite":
+        params = tuple(compiled.params[name] for name in compiled.positiontup)
+        rows = conn.exec_driver_sql("EXPLAIN QUERY PLAN " + str(compiled), params).fetchall()
+        plan = [row[-1] for row in rows]
+        scans = [line for line in plan if line.startswith("SCAN") and "USING" not in line]
+    else:
+        rows = conn.exec_driver_sql("EXPLAIN " + str(compiled), compiled.params).fetchall()
+        plan = [row[0] for row in rows]
+        scans = [line for line in plan if "Seq Scan" in line]
+    return plan, scans
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--campaigns", type=int, default=100)
+    parser.add_argument("--days", type=int, default=180)
+    args = parser.parse_args()
+
+    init_db()
+    with engine.begin() as conn:
+        brand_id, campaign_id, first_day = seed(conn, args.campaigns, args.days)
+    with Session(engine) as session:
+        rebuild(session)
+    with engine.begin() as conn:
+        conn.exec_driver_sql("ANALYZE")
+
+    failed = 0
+    with engine.connect() as conn:
+        for name, stmt in hot_queries(brand_id, campaign_id, first_day + timedelta(days=args.days // 2)).items():
+            plan, scans = explain(conn, stmt)
+            failed += bool(scans)
+            print(f"{'FAIL' if scans else 'ok':>4}  {name}")
+            for line in plan:
+                print(f"        {line}")
+
+    if failed:
+        print(f"{failed} hot queries scan a table")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Streams a CSV export of millions of seeded distribution records from a real
+uvicorn server and checks that the server's peak memory stays under a cap.
+Exits non-zero if the export grows the server's peak RSS by more than
+--max-growth-mb or returns the wrong number of rows.
+
+Peak RSS is read from /proc (Linux). Uses DATABASE_URL when set, otherwise a
+temporary SQLite file.
+
+Run from the project root:
+    python -m benchmarks.export_memory [--rows 2000000] [--max-growth-mb 64] [--gzip]
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+if "DATABASE_URL" not in os.environ:
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+
+import httpx
+from sqlalchemy import insert
+
+from app.auth import create_access_token
+from app.database import engine, init_db
+from app.models import Brand, Campaign, DistributionRecord
+
+PORT = 8765
+SEED_CHUNK = 20000
+
+def seed(rows):
+    now = datetime.utcnow()
+    with engine.begin() as conn:
+        brand_id = conn.execute(insert(Brand).values(
+            name="bench", email=f"export-{time.time()}@example.com", password_hash="x", token_version=0, created_at=now
+        )).inserted_primary_key[0]
+        campaign_id = conn.execute(insert(Campaign).values(
+            name="export", brand_id=brand_id, manufactured=0, distributed=0, locations_count=0, created_at=now
+        )).inserted_primary_key[0]
+    for start in range(0, rows, SEED_CHUNK):
+        with engine.begin() as conn:
+            conn.execute(insert(DistributionRecord), [
+                dict(
+                    campaign_id=campaign_id, location_name=f"loc-{i % 997}", lat=12.97, lng=77.59,
+                    distributed_count=1 + i % 7, distributed_at=now, proof_hash="ab" * 32
+                )
+                for i in range(start, min(rows, start + SEED_CHUNK))
+            ])
+    return create_access_token({"brand_id": brand_id, "email": "bench", "ver": 0}), campaign_id
+
+def peak_rss_mb(pid):
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) / 1024
+    raise RuntimeError("VmHWM not available")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=2000000)
+    parser.add_argument("--max-growth-mb", type=float, default=64)
+    parser.add_argument("--gzip", action="store_true")
+    args = parser.parse_args()
+
+    init_db()
+    started = time.perf_counter()
+    token, campaign_id = seed(args.rows)
+    print(f"seeded {args.rows} rows in {time.perf_counter() - started:.1f}s")
+
+    env = dict(os.environ, ANCHOR_WORKER_ENABLED="0")
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(PORT), "--log-level", "warning"], env=env
+    )
+    try:
+        base = f"http://127.0.0.1:{PORT}"
+        headers = {"Authorization": f"Bearer {token}"}
+        for _ in range(100):
+            try:
+                httpx.get(base + "/", timeout=1)
+                break
+            except httpx.TransportError:
+                time.sleep(0.2)
+
+        # warm up the export path on a small campaign-sized read before the baseline
+        httpx.get(f"{base}/campaigns/{campaign_id}/export/manufacturing-batches", headers=headers, timeout=30)
+        baseline = peak_rss_mb(server.pid)
+
+        url = f"{base}/campaigns/{campaign_id}/export/distributions" + ("?gzip=true" if args.gzip else "")
+        started = time.perf_counter()
+        received = 0
+        newlines = 0
+        with httpx.stream("GET", url, headers=headers, timeout=None) as resp:
+            resp.raise_for_status()
+            for chunk in resp.iter_raw() if args.gzip else resp.iter_bytes():
+                received += len(chunk)
+                newlines += chunk.count(b"\n")
+        elapsed = time.perf_counter() - started
+        peak = peak_rss_mb(server.pid)
+    finally:
+        server.terminate()
+        server.wait()
+
+    growth = peak - baseline
+    print(f"exported {received / 1e6:.1f} MB in {elapsed:.1f}s ({args.rows / elapsed:.0f} rows/s)")
+    print(f"server peak RSS {baseline:.0f} MB -> {peak:.0f} MB (+{growth:.1f} MB, cap {args.max_growth_mb:.0f} MB)")
+
+    if not args.gzip and newlines != args.rows + 1:
+        print(f"FAIL: expected {args.rows + 1} lines, got {newlines}")
+        sys.exit(1)
+    if growth > args.max_growth_mb:
+        print("FAIL: memory grew with the export size")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
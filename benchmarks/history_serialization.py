@@ -0,0 +1,112 @@
+"""
+Serialization cost of a campaign summary with a 1,000-day history (three
+locations per day), without the database:
+
+- pydantic: the previous path. Each row goes through from_orm(), .dict() and
+  DailyActivityOut(**out); FastAPI then validates the summary against
+  response_model again, runs jsonable_encoder and json.dumps.
+- tuples: the current path. Rows are built once as dicts from column tuples
+  and encoded with orjson.
+
+Reports the best wall time and the peak memory allocated during one run.
+
+Run from the project root:
+    python -m benchmarks.history_serialization [--days 1000] [--repeat 20]
+"""
+import argparse
+import json
+import time
+import tracemalloc
+from datetime import date, datetime, timedelta
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import ORJSONResponse
+
+from app.models import DailyActivity
+from app.schemas import CampaignDailySummary, DailyActivityOut
+
+LOCATIONS_PER_DAY = 3
+TOTALS = {"manufactured": 1, "distributed": 1, "scans": 1, "locations": LOCATIONS_PER_DAY}
+
+def fixtures(days):
+    first_day = date.today() - timedelta(days=days - 1)
+    now = datetime.utcnow()
+    tuples = [
+        (first_day + timedelta(days=i), 100, 80, 20, i + 1, "ab" * 32, "TX" * 26, now)
+        for i in reversed(range(days))
+    ]
+    activities = [
+        DailyActivity(
+            id=t[4], campaign_id=1, day=t[0], manufactured_today=t[1], distributed_today=t[2],
+            scan_count_today=t[3], sha256=t[5], algorand_txid=t[6], created_at=t[7]
+        )
+        for t in tuples
+    ]
+    locations = {
+        t[0]: [{"location_name": f"loc-{j}", "distributed_count": 16, "lat": 12.97, "lng": 77.59} for j in range(LOCATIONS_PER_DAY)]
+        for t in tuples
+    }
+    return tuples, activities, locations
+
+def pydantic_path(activities, locations):
+    history = []
+    for a in activities:
+        out = DailyActivityOut.from_orm(a).dict()
+        out["locations"] = locations[a.day]
+        history.append(DailyActivityOut(**out))
+    summary = CampaignDailySummary(campaign_id=1, totals=TOTALS, today=history[0], history=history)
+    # what FastAPI does with a response_model: validate the returned value again, then encode
+    validated = CampaignDailySummary(**summary.dict())
+    return json.dumps(jsonable_encoder(validated)).encode()
+
+def tuple_path(tuples, locations):
+    history = [
+        {
+            "day": day, "manufactured_today": m, "distributed_today": d, "scan_count_today": s,
+            "id": activity_id, "campaign_id": 1, "locations": locations[day], "live_scans": 0,
+            "sha256": sha256, "algorand_txid": txid, "created_at": created_at,
+        }
+        for day, m, d, s, activity_id, sha256, txid, created_at in tuples
+    ]
+    summary = {
+        "campaign_id": 1, "totals": TOTALS, "today": history[0], "history": history,
+        "start_date": None, "end_date": None,
+    }
+    return ORJSONResponse(summary).body
+
+def measure(fn, args, repeat):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn(*args)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+
+    tracemalloc.start()
+    body = fn(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak, body
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--days", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    tuples, activities, locations = fixtures(args.days)
+    print(f"{args.days} days x {LOCATIONS_PER_DAY} locations")
+    print(f"{'path':>10} {'ms':>8} {'peak KiB':>10} {'bytes':>9}")
+    results = {}
+    for name, fn, fn_args in (
+        ("pydantic", pydantic_path, (activities, locations)),
+        ("tuples", tuple_path, (tuples, locations)),
+    ):
+        elapsed, peak, body = measure(fn, fn_args, args.repeat)
+        results[name] = json.loads(body)
+        print(f"{name:>10} {elapsed * 1000:>8.1f} {peak / 1024:>10.0f} {len(body):>9}")
+
+    assert results["pydantic"] == results["tuples"], "paths produce different JSON"
+
+if __name__ == "__main__":
+    main()
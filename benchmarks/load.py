@@ -0,0 +1,254 @@
+"""
+In-process load test. Seeds a dataset with benchmarks.datagen, then drives
+the app through httpx's ASGI transport with scripted scenarios and reports
+throughput and p50/p95/p99 latency per endpoint as JSON:
+
+- dashboard: GET /campaigns/{id}, /daily-activities, /analytics and
+  /campaigns for random brands.
+- writes: single POSTs to /distribute and /daily-activity.
+- bulk: CSV uploads to /distribute/bulk.
+- login: a burst of simultaneous POST /token requests.
+
+Algorand is stubbed (StubAlgod accepts every transaction without a network),
+and the anchor worker runs against it during the scenarios, so its database
+work is part of what is measured; --no-anchor turns it off. Nothing leaves
+the machine. Requests are generated from --seed, so runs with the same
+arguments are comparable: save one with --out and pass it to --compare on a
+later commit.
+
+Uses DATABASE_URL when set (e.g. a local Postgres), otherwise a temporary
+SQLite file. DB_ASYNC, BCRYPT_ROUNDS etc. are read from the environment as
+usual and recorded in the output.
+
+Run from the project root:
+    python -m benchmarks.load [--scenarios dashboard,writes,bulk,login] [--requests 2000]
+        [--concurrency 32] [--out results.json] [--compare baseline.json]
+"""
+import argparse
+import asyncio
+import base64
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from datetime import timedelta
+
+if "DATABASE_URL" not in os.environ:
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+# the worker is started by hand below, against the stub
+os.environ["ANCHOR_WORKER_ENABLED"] = "0"
+
+import httpx
+from algosdk import account, transaction
+
+from app.anchoring import SuggestedParamsCache
+from app.auth import create_access_token
+from app.database import DB_ASYNC, engine, init_db
+from app.main import anchor_worker, app
+from benchmarks import datagen
+
+SCENARIOS = ("dashboard", "writes", "bulk", "login")
+SETTINGS = ("DB_ASYNC", "DB_POOL_SIZE", "AUTH_MODE", "BCRYPT_ROUNDS", "PASSWORD_HASH_WORKERS", "RESPONSE_CACHE_ENABLED", "ANCHOR_MODE")
+
+class StubAlgod:
+    """Offline stand-in for algod: fixed suggested params, accepts every transaction."""
+
+    def __init__(self):
+        self.sent = 0
+
+    def suggested_params(self):
+        return transaction.SuggestedParams(
+            fee=1000, first=1, last=1001, gh=base64.b64encode(b"\0" * 32).decode(), gen="bench-v1", flat_fee=True
+        )
+
+    def send_transactions(self, signed):
+        self.sent += len(signed)
+        return signed[0].get_txid()
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+# ----------------- Scenarios -----------------
+# each yields (label, method, path, request kwargs); label is the route template
+
+def dashboard_requests(rng, dataset, tokens, n):
+    for _ in range(n):
+        brand = rng.choice(dataset.brands)
+        headers = {"Authorization": f"Bearer {tokens[brand['id']]}"}
+        campaign_id = rng.choice(brand["campaign_ids"])
+        yield rng.choices([
+            ("GET /campaigns/{campaign_id}", "GET", f"/campaigns/{campaign_id}", {"headers": headers}),
+            ("GET /campaigns/{campaign_id}/daily-activities", "GET", f"/campaigns/{campaign_id}/daily-activities?limit=30", {"headers": headers}),
+            ("GET /analytics", "GET", "/analytics?bucket=week", {"headers": headers}),
+            ("GET /campaigns", "GET", "/campaigns", {"headers": headers}),
+        ], weights=[4, 3, 1, 2])[0]
+
+def write_requests(rng, dataset, tokens, n, end_day):
+    for _ in range(n):
+        brand = rng.choice(dataset.brands)
+        headers = {"Authorization": f"Bearer {tokens[brand['id']]}"}
+        campaign_id = rng.choice(brand["campaign_ids"])
+        location = {"location_name": f"loc-{rng.randrange(datagen.LOCATIONS)}", "distributed_count": rng.randint(1, 20), "lat": 12.9, "lng": 77.6}
+        if rng.random() < 0.7:
+            yield ("POST /campaigns/{campaign_id}/distribute", "POST", f"/campaigns/{campaign_id}/distribute", {"headers": headers, "json": location})
+        else:
+            day = end_day + timedelta(days=rng.randint(1, 30))
+            body = {
+                "day": day.isoformat(), "manufactured_today": rng.randint(50, 500), "distributed_today": rng.randint(20, 400),
+                "scan_count_today": rng.randint(0, 1000), "locations": [location],
+            }
+            yield ("POST /campaigns/{campaign_id}/daily-activity", "POST", f"/campaigns/{campaign_id}/daily-activity", {"headers": headers, "json": body})
+
+def bulk_requests(rng, dataset, tokens, n, rows):
+    for _ in range(n):
+        brand = rng.choice(dataset.brands)
+        headers = {"Authorization": f"Bearer {tokens[brand['id']]}", "Content-Type": "text/csv"}
+        body = "location_name,distributed_count,lat,lng\n" + "".join(
+            f"loc-{rng.randrange(datagen.LOCATIONS)},{rng.randint(1, 20)},12.9,77.6\n" for _ in range(rows)
+        )
+        campaign_id = rng.choice(brand["campaign_ids"])
+        yield ("POST /campaigns/{campaign_id}/distribute/bulk", "POST", f"/campaigns/{campaign_id}/distribute/bulk", {"headers": headers, "content": body})
+
+def login_requests(rng, dataset, n):
+    for _ in range(n):
+        form = {"username": rng.choice(dataset.brands)["email"], "password": datagen.PASSWORD}
+        yield ("POST /token", "POST", "/token", {"data": form})
+
+async def run_scenario(client, requests, concurrency):
+    requests = list(requests)
+    latencies = defaultdict(list)
+    errors = defaultdict(int)
+    pending = iter(requests)
+
+    async def worker():
+        for label, method, path, kwargs in pending:
+            started = time.perf_counter()
+            resp = await client.request(method, path, **kwargs)
+            latencies[label].append(time.perf_counter() - started)
+            if resp.status_code >= 400:
+                errors[label] += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    return {
+        "requests": len(requests),
+        "seconds": round(elapsed, 3),
+        "rps": round(len(requests) / elapsed, 1),
+        "errors": sum(errors.values()),
+        "endpoints": {
+            label: {
+                "requests": len(values),
+                "errors": errors[label],
+                "p50_ms": round(percentile(values, 50) * 1000, 2),
+                "p95_ms": round(percentile(values, 95) * 1000, 2),
+                "p99_ms": round(percentile(values, 99) * 1000, 2),
+            }
+            for label, values in sorted(latencies.items())
+        },
+    }
+
+async def run(args, dataset):
+    rng = random.Random(args.seed)
+    tokens = {b["id"]: create_access_token({"brand_id": b["id"], "email": b["email"], "ver": 0}) for b in dataset.brands}
+    builders = {
+        "dashboard": lambda: dashboard_requests(rng, dataset, tokens, args.requests),
+        "writes": lambda: write_requests(rng, dataset, tokens, args.requests, args.end_day),
+        "bulk": lambda: bulk_requests(rng, dataset, tokens, args.bulk_uploads, args.bulk_rows),
+        "login": lambda: login_requests(rng, dataset, args.logins),
+    }
+
+    results = {}
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app):
+        if args.anchor:
+            anchor_worker.start()
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            # a few unmeasured reads first, so the pool and lazy imports are warm
+            for label, method, path, kwargs in list(dashboard_requests(random.Random(0), dataset, tokens, 8)):
+                await client.request(method, path, **kwargs)
+            for name in args.scenarios:
+                results[name] = await run_scenario(client, builders[name](), args.concurrency)
+                print(f"{name}: {results[name]['rps']} req/s, {results[name]['errors']} errors", file=sys.stderr)
+    return results
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(baseline, current):
+    """Print p95 per endpoint against a previous run."""
+    print(f"{'scenario':>10} {'endpoint':<48} {'p95 before':>10} {'p95 now':>9} {'change':>8}", file=sys.stderr)
+    for name, scenario in current["scenarios"].items():
+        before = baseline.get("scenarios", {}).get(name, {}).get("endpoints", {})
+        for label, stats in scenario["endpoints"].items():
+            if label not in before:
+                continue
+            old, new = before[label]["p95_ms"], stats["p95_ms"]
+            change = f"{(new - old) / old * 100:+.0f}%" if old else "n/a"
+            print(f"{name:>10} {label:<48} {old:>10} {new:>9} {change:>8}", file=sys.stderr)
+
+def main():
+    parser = argparse.ArgumentParser()
+    datagen.add_arguments(parser)
+    parser.add_argument("--scenarios", type=lambda s: s.split(","), default=list(SCENARIOS))
+    parser.add_argument("--requests", type=int, default=2000, help="requests in the dashboard and writes scenarios")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--bulk-uploads", type=int, default=20)
+    parser.add_argument("--bulk-rows", type=int, default=1000)
+    parser.add_argument("--logins", type=int, default=100)
+    parser.add_argument("--no-anchor", dest="anchor", action="store_false", help="don't run the anchor worker")
+    parser.add_argument("--out", help="write the JSON results here instead of stdout")
+    parser.add_argument("--compare", help="a previous --out file to compare p95 latencies with")
+    args = parser.parse_args()
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    stub = StubAlgod()
+    anchor_worker.client = stub
+    anchor_worker.params = SuggestedParamsCache(stub)
+    anchor_worker.private_key, anchor_worker.address = account.generate_account()
+
+    init_db()
+    started = time.perf_counter()
+    dataset = datagen.generate_from_args(args)
+    print(f"seeded {dataset.rows} rows in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+
+    scenarios = asyncio.run(run(args, dataset))
+    result = {
+        "commit": git_commit(),
+        "database": engine.dialect.name,
+        "db_async": DB_ASYNC,
+        "settings": {name: os.environ[name] for name in SETTINGS if name in os.environ},
+        "dataset": {
+            "brands": args.brands, "campaigns": args.campaigns, "days": args.days,
+            "records_per_day": args.records_per_day, "seed": args.seed, "rows": dataset.rows,
+        },
+        "concurrency": args.concurrency,
+        "anchored_transactions": stub.sent,
+        "scenarios": scenarios,
+    }
+
+    output = json.dumps(result, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), result)
+
+if __name__ == "__main__":
+    main()
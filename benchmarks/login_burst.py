@@ -0,0 +1,105 @@
+"""
+Login latency under a burst of simultaneous POST /token requests, with
+password hashing inline on the event loop (PASSWORD_HASH_WORKERS=0, the old
+behaviour) and on the hashing process pool. Also reports the latency of
+GET / while the burst runs, which shows whether the event loop stays free.
+
+Each mode runs in its own subprocess. Uses DATABASE_URL when set, otherwise
+a temporary SQLite file.
+
+Run from the project root:
+    python -m benchmarks.login_burst [--logins 200] [--rounds 10] [--workers N]
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+async def burst(app, logins):
+    import httpx
+
+    email = f"burst-{time.time()}@example.com"
+    form = {"username": email, "password": "correct horse battery staple"}
+    latencies, probes = [], []
+    done = asyncio.Event()
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=None) as client:
+        resp = await client.post("/brands", json={"name": "burst", "email": email, "password": form["password"]})
+        assert resp.status_code == 200, resp.text
+        await client.post("/token", data=form)  # start the pool's workers
+
+        async def login():
+            started = time.perf_counter()
+            resp = await client.post("/token", data=form)
+            latencies.append(time.perf_counter() - started)
+            assert resp.status_code == 200, resp.text
+
+        async def probe():
+            while not done.is_set():
+                started = time.perf_counter()
+                await client.get("/")
+                probes.append(time.perf_counter() - started)
+                await asyncio.sleep(0.01)
+
+        prober = asyncio.ensure_future(probe())
+        started = time.perf_counter()
+        await asyncio.gather(*(login() for _ in range(logins)))
+        elapsed = time.perf_counter() - started
+        done.set()
+        await prober
+
+    return {
+        "seconds": round(elapsed, 2),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+        "probe_p99_ms": round(percentile(probes, 99) * 1000, 1),
+    }
+
+def run_child(logins):
+    from app.database import init_db
+    from app.main import app
+    from app.auth import shutdown_password_executor
+
+    init_db()
+    try:
+        result = asyncio.run(burst(app, logins))
+    finally:
+        shutdown_password_executor()
+    print(json.dumps(result))
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--rounds", type=int, default=10, help="BCRYPT_ROUNDS for the run")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="hashing processes")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.logins)
+        return
+
+    env = dict(os.environ, ANCHOR_WORKER_ENABLED="0", BCRYPT_ROUNDS=str(args.rounds))
+    if "DATABASE_URL" not in env:
+        env["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+
+    print(f"{args.logins} simultaneous logins, bcrypt rounds {args.rounds}")
+    print(f"{'hashing':>12} {'seconds':>8} {'p50 ms':>8} {'p99 ms':>8} {'GET / p99 ms':>13}")
+    for name, workers in (("inline", 0), (f"{args.workers} procs", args.workers)):
+        out = subprocess.run(
+            [sys.executable, "-m", "benchmarks.login_burst", "--child", "--logins", str(args.logins)],
+            env=dict(env, PASSWORD_HASH_WORKERS=str(workers)), capture_output=True, text=True, check=True
+        )
+        r = json.loads(out.stdout.strip().splitlines()[-1])
+        print(f"{name:>12} {r['seconds']:>8} {r['p50_ms']:>8} {r['p99_ms']:>8} {r['probe_p99_ms']:>13}")
+
+if __name__ == "__main__":
+    main()
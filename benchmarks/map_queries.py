@@ -0,0 +1,133 @@
+"""
+Map queries on one campaign with --points distribution records (300,000 by
+default) spread over a metro area, most of them around a few dozen hubs:
+
+- scan: the previous way to map a campaign, reading every record's
+  coordinates and filtering in Python.
+- bbox: GET .../map/points for a district and for the whole area (limit 5000).
+- nearby: GET .../map/nearby, 1 km around a hub.
+- heatmap: GET .../map/heatmap tiles over the area at several zoom levels,
+  from the cells (zoom <= 11) or from the records.
+
+Times the query functions the endpoints call (best of --repeat), without
+HTTP. Uses DATABASE_URL when set, otherwise a temporary SQLite file.
+
+Run from the project root:
+    python -m benchmarks.map_queries [--points 300000] [--repeat 5]
+"""
+import argparse
+import math
+import os
+import random
+import tempfile
+import time
+from datetime import datetime
+
+if "DATABASE_URL" not in os.environ:
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+
+from sqlalchemy import insert
+from sqlmodel import Session, select
+
+from app.database import engine, init_db
+from app.geo import geohash_or_none, heatmap_tile, points_in_bbox, points_near, rebuild_cells
+from app.models import Brand, Campaign, DistributionRecord
+
+CENTER = (12.97, 77.59)
+SPREAD = 0.25  # degrees around CENTER
+HUBS = 40
+INSERT_CHUNK = 10000
+
+def seed(points, seed):
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+    hubs = [(CENTER[0] + rng.uniform(-SPREAD, SPREAD), CENTER[1] + rng.uniform(-SPREAD, SPREAD)) for _ in range(HUBS)]
+    with engine.begin() as conn:
+        brand_id = conn.execute(insert(Brand).values(
+            name="bench", email=f"map-{time.time()}@example.com", password_hash="x", token_version=0, created_at=now
+        )).inserted_primary_key[0]
+        campaign_id = conn.execute(insert(Campaign).values(
+            name="map", brand_id=brand_id, manufactured=0, distributed=0, locations_count=0, created_at=now
+        )).inserted_primary_key[0]
+        rows = []
+        for i in range(points):
+            if rng.random() < 0.8:
+                hub = rng.choice(hubs)
+                lat, lng = rng.gauss(hub[0], 0.01), rng.gauss(hub[1], 0.01)
+            else:
+                lat, lng = CENTER[0] + rng.uniform(-SPREAD, SPREAD), CENTER[1] + rng.uniform(-SPREAD, SPREAD)
+            rows.append(dict(
+                campaign_id=campaign_id, location_name=f"loc-{i % 5000}", lat=lat, lng=lng,
+                geohash=geohash_or_none(lat, lng), distributed_count=rng.randint(1, 20), distributed_at=now
+            ))
+            if len(rows) >= INSERT_CHUNK:
+                conn.execute(insert(DistributionRecord), rows)
+                rows = []
+        if rows:
+            conn.execute(insert(DistributionRecord), rows)
+    with Session(engine) as session:
+        rebuild_cells(session, campaign_id)
+        session.commit()
+    return campaign_id, hubs
+
+def tiles_over_area(z):
+    """Tiles covering CENTER +- SPREAD at zoom z."""
+    n = 2 ** z
+
+    def tile(lat, lng):
+        y = (1 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2 * n
+        return int((lng + 180) / 360 * n), int(y)
+    x0, y0 = tile(CENTER[0] + SPREAD, CENTER[1] - SPREAD)
+    x1, y1 = tile(CENTER[0] - SPREAD, CENTER[1] + SPREAD)
+    return [(x, y) for x in range(x0, x1 + 1) for y in range(y0, y1 + 1)]
+
+def best(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - started)
+    return min(times) * 1000, result
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--points", type=int, default=300000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    init_db()
+    started = time.perf_counter()
+    campaign_id, hubs = seed(args.points, args.seed)
+    print(f"seeded {args.points} points in {time.perf_counter() - started:.1f}s ({engine.dialect.name})")
+
+    district = (CENTER[0] - 0.02, CENTER[1] - 0.02, CENTER[0] + 0.02, CENTER[1] + 0.02)
+    area = (CENTER[0] - SPREAD, CENTER[1] - SPREAD, CENTER[0] + SPREAD, CENTER[1] + SPREAD)
+
+    with Session(engine) as session:
+        def scan():
+            rows = session.exec(
+                select(DistributionRecord.id, DistributionRecord.lat, DistributionRecord.lng)
+                .where(DistributionRecord.campaign_id == campaign_id)
+            ).all()
+            return [r for r in rows if district[0] <= r[1] <= district[2] and district[1] <= r[2] <= district[3]]
+
+        ms, rows = best(scan, args.repeat)
+        print(f"{'scan, district':<28} {ms:9.1f} ms  {len(rows)} points")
+        ms, (points, truncated) = best(lambda: points_in_bbox(session, campaign_id, district, 5000), args.repeat)
+        print(f"{'bbox, district':<28} {ms:9.1f} ms  {len(points)} points{' (truncated)' if truncated else ''}")
+        ms, (points, truncated) = best(lambda: points_in_bbox(session, campaign_id, area, 5000), args.repeat)
+        print(f"{'bbox, whole area':<28} {ms:9.1f} ms  {len(points)} points{' (truncated)' if truncated else ''}")
+        ms, (points, truncated) = best(lambda: points_near(session, campaign_id, *hubs[0], 1000, 5000), args.repeat)
+        print(f"{'nearby, 1 km around a hub':<28} {ms:9.1f} ms  {len(points)} points{' (truncated)' if truncated else ''}")
+
+        for z in (4, 8, 10, 11, 12, 14, 16):
+            tiles = tiles_over_area(z)
+            ms, results = best(lambda: [heatmap_tile(session, campaign_id, z, x, y) for x, y in tiles], args.repeat)
+            clusters = sum(len(t["clusters"]) for t in results)
+            records = sum(t["records"] for t in results)
+            print(f"{f'heatmap z{z}, {len(tiles)} tiles':<28} {ms:9.1f} ms  {ms / len(tiles):.1f} ms/tile, "
+                  f"{clusters} clusters, {records} points")
+
+if __name__ == "__main__":
+    main()
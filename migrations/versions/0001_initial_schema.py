@@ -0,0 +1,84 @@
+"""initial schema
+
+The tables as SQLModel.metadata.create_all() created them before migrations
+were introduced. Existing databases from that time: `alembic stamp 0001`,
+then `alembic upgrade head`.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table(
+        "brand",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("name", sa.String(), nullable=False),
+        sa.Column("email", sa.String(), nullable=False),
+        sa.Column("password_hash", sa.String(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+    )
+    op.create_table(
+        "campaign",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("name", sa.String(), nullable=False),
+        sa.Column("brand_id", sa.Integer(), sa.ForeignKey("brand.id"), nullable=False),
+        sa.Column("start_date", sa.DateTime(), nullable=True),
+        sa.Column("end_date", sa.DateTime(), nullable=True),
+        sa.Column("manufactured", sa.Integer(), nullable=False),
+        sa.Column("distributed", sa.Integer(), nullable=False),
+        sa.Column("locations_count", sa.Integer(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+    )
+    op.create_table(
+        "manufacturingbatch",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("campaign_id", sa.Integer(), sa.ForeignKey("campaign.id"), nullable=False),
+        sa.Column("batch_number", sa.String(), nullable=False),
+        sa.Column("manufactured_count", sa.Integer(), nullable=False),
+        sa.Column("produced_at", sa.DateTime(), nullable=False),
+        sa.Column("proof_hash", sa.String(), nullable=True),
+        sa.Column("proof_txid", sa.String(), nullable=True),
+    )
+    op.create_table(
+        "distributionrecord",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("campaign_id", sa.Integer(), sa.ForeignKey("campaign.id"), nullable=False),
+        sa.Column("location_name", sa.String(), nullable=False),
+        sa.Column("lat", sa.Float(), nullable=True),
+        sa.Column("lng", sa.Float(), nullable=True),
+        sa.Column("distributed_count", sa.Integer(), nullable=False),
+        sa.Column("distributed_at", sa.DateTime(), nullable=False),
+        sa.Column("proof_hash", sa.String(), nullable=True),
+        sa.Column("proof_txid", sa.String(), nullable=True),
+    )
+    op.create_table(
+        "dailyactivity",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("campaign_id", sa.Integer(), sa.ForeignKey("campaign.id"), nullable=False),
+        sa.Column("day", sa.Date(), nullable=False),
+        sa.Column("manufactured_today", sa.Integer(), nullable=False),
+        sa.Column("distributed_today", sa.Integer(), nullable=False),
+        sa.Column("scan_count_today", sa.Integer(), nullable=False),
+        sa.Column("algorand_txid", sa.String(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+    )
+    op.create_table(
+        "blockchainproof",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("related_type", sa.String(), nullable=False),
+        sa.Column("related_id", sa.Integer(), nullable=False),
+        sa.Column("algorand_txid", sa.String(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+    )
+
+def downgrade():
+    for table in ("blockchainproof", "dailyactivity", "distributionrecord", "manufacturingbatch", "campaign", "brand"):
+        op.drop_table(table)
@@ -0,0 +1,61 @@
+"""proof queue, token versions and bulk uploads
+
+Columns and tables added alongside the anchoring worker, merkle proofs,
+token revocation and bulk distribution uploads.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.add_column("brand", sa.Column("token_version", sa.Integer(), nullable=False, server_default="0"))
+    op.add_column("dailyactivity", sa.Column("sha256", sa.String(), nullable=True))
+
+    with op.batch_alter_table("blockchainproof") as batch:
+        batch.add_column(sa.Column("sha256_hash", sa.String(), nullable=False, server_default=""))
+        batch.add_column(sa.Column("merkle_root", sa.String(), nullable=True))
+        batch.add_column(sa.Column("merkle_path", sa.String(), nullable=True))
+        batch.add_column(sa.Column("status", sa.String(), nullable=False, server_default="pending"))
+        batch.add_column(sa.Column("attempts", sa.Integer(), nullable=False, server_default="0"))
+        batch.add_column(sa.Column("next_attempt_at", sa.DateTime(), nullable=False, server_default=sa.func.current_timestamp()))
+        batch.add_column(sa.Column("last_error", sa.String(), nullable=True))
+
+    op.create_table(
+        "distributionupload",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("campaign_id", sa.Integer(), sa.ForeignKey("campaign.id"), nullable=False),
+        sa.Column("rows", sa.Integer(), nullable=False),
+        sa.Column("distributed_count", sa.Integer(), nullable=False),
+        sa.Column("rows_sha256", sa.String(), nullable=True),
+        sa.Column("proof_hash", sa.String(), nullable=True),
+        sa.Column("proof_txid", sa.String(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+    )
+    with op.batch_alter_table("distributionrecord") as batch:
+        batch.add_column(sa.Column("upload_id", sa.Integer(), nullable=True))
+        batch.create_foreign_key(
+            "fk_distributionrecord_upload_id_distributionupload", "distributionupload", ["upload_id"], ["id"]
+        )
+
+def downgrade():
+    with op.batch_alter_table("distributionrecord") as batch:
+        batch.drop_constraint("fk_distributionrecord_upload_id_distributionupload", type_="foreignkey")
+        batch.drop_column("upload_id")
+    op.drop_table("distributionupload")
+
+    with op.batch_alter_table("blockchainproof") as batch:
+        for column in ("last_error", "next_attempt_at", "attempts", "status", "merkle_path", "merkle_root", "sha256_hash"):
+            batch.drop_column(column)
+
+    with op.batch_alter_table("dailyactivity") as batch:
+        batch.drop_column("sha256")
+    with op.batch_alter_table("brand") as batch:
+        batch.drop_column("token_version")
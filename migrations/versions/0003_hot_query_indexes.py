@@ -0,0 +1,47 @@
+"""indexes for the campaign/day access pattern
+
+Composite indexes for the hot queries (distributions by campaign and day,
+the anchoring queue, proofs by record) and one DailyActivity row per
+campaign and day, which the daily-activity upsert relies on.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    duplicates = op.get_bind().execute(sa.text(
+        "SELECT count(*) FROM (SELECT campaign_id, day FROM dailyactivity "
+        "GROUP BY campaign_id, day HAVING count(*) > 1) d"
+    )).scalar()
+    if duplicates:
+        raise RuntimeError(
+            f"{duplicates} (campaign_id, day) pairs have more than one dailyactivity row; "
+            "merge them before applying this migration"
+        )
+
+    op.create_index("ix_brand_email", "brand", ["email"])
+    op.create_index("ix_campaign_brand_id", "campaign", ["brand_id"])
+    op.create_index(
+        "ix_distributionrecord_campaign_id_distributed_at", "distributionrecord", ["campaign_id", "distributed_at"]
+    )
+    op.create_index("ix_blockchainproof_status_id", "blockchainproof", ["status", "id"])
+    op.create_index("ix_blockchainproof_related_type_related_id", "blockchainproof", ["related_type", "related_id"])
+    with op.batch_alter_table("dailyactivity") as batch:
+        batch.create_unique_constraint("uq_dailyactivity_campaign_id_day", ["campaign_id", "day"])
+
+def downgrade():
+    with op.batch_alter_table("dailyactivity") as batch:
+        batch.drop_constraint("uq_dailyactivity_campaign_id_day", type_="unique")
+    op.drop_index("ix_blockchainproof_related_type_related_id", "blockchainproof")
+    op.drop_index("ix_blockchainproof_status_id", "blockchainproof")
+    op.drop_index("ix_distributionrecord_campaign_id_distributed_at", "distributionrecord")
+    op.drop_index("ix_campaign_brand_id", "campaign")
+    op.drop_index("ix_brand_email", "brand")
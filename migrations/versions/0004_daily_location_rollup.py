@@ -0,0 +1,49 @@
+"""daily location rollup
+
+Adds DailyLocationRollup and fills it from the existing distribution
+records. The backfill keeps the largest coordinates of a location and day;
+`python -m app.rollup rebuild` recomputes it exactly as the app maintains it.
+Also corrects Campaign.locations_count, which used to count records instead
+of distinct locations.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table(
+        "dailylocationrollup",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("campaign_id", sa.Integer(), sa.ForeignKey("campaign.id"), nullable=False),
+        sa.Column("day", sa.Date(), nullable=False),
+        sa.Column("location_name", sa.String(), nullable=False),
+        sa.Column("distributed_count", sa.Integer(), nullable=False),
+        sa.Column("records", sa.Integer(), nullable=False),
+        sa.Column("lat", sa.Float(), nullable=True),
+        sa.Column("lng", sa.Float(), nullable=True),
+        sa.UniqueConstraint("campaign_id", "day", "location_name", name="uq_dailylocationrollup_campaign_id_day_location_name"),
+    )
+
+    op.execute(
+        "INSERT INTO dailylocationrollup (campaign_id, day, location_name, distributed_count, records, lat, lng) "
+        "SELECT campaign_id, date(distributed_at), location_name, sum(distributed_count), count(*), max(lat), max(lng) "
+        "FROM distributionrecord "
+        "GROUP BY campaign_id, date(distributed_at), location_name "
+        "ORDER BY min(id)"
+    )
+    op.execute(
+        "UPDATE campaign SET locations_count = ("
+        "SELECT count(DISTINCT location_name) FROM dailylocationrollup "
+        "WHERE dailylocationrollup.campaign_id = campaign.id)"
+    )
+
+def downgrade():
+    op.drop_table("dailylocationrollup")
@@ -0,0 +1,34 @@
+"""idempotency keys
+
+Stores the Idempotency-Key of single-record writes with the response they
+returned, so retried requests can be answered without writing again.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table(
+        "idempotencykey",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("brand_id", sa.Integer(), sa.ForeignKey("brand.id"), nullable=False),
+        sa.Column("key", sa.String(), nullable=False),
+        sa.Column("request_hash", sa.String(), nullable=False),
+        sa.Column("response", sa.String(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("expires_at", sa.DateTime(), nullable=False),
+        sa.UniqueConstraint("brand_id", "key", name="uq_idempotencykey_brand_id_key"),
+    )
+    op.create_index("ix_idempotencykey_expires_at", "idempotencykey", ["expires_at"])
+
+def downgrade():
+    op.drop_index("ix_idempotencykey_expires_at", "idempotencykey")
+    op.drop_table("idempotencykey")
@@ -0,0 +1,23 @@
+"""live scans
+
+Adds DailyActivity.live_scans, the consumer QR scans counted by the public
+scan endpoint.
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.add_column("dailyactivity", sa.Column("live_scans", sa.Integer(), nullable=False, server_default="0"))
+
+def downgrade():
+    with op.batch_alter_table("dailyactivity") as batch:
+        batch.drop_column("live_scans")
@@ -0,0 +1,31 @@
+"""campaign counter shards
+
+Optional per-campaign counter shards that very hot campaigns increment
+instead of the campaign row; reads add them to Campaign.manufactured and
+Campaign.distributed.
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0007"
+down_revision = "0006"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table(
+        "campaigncountershard",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("campaign_id", sa.Integer(), sa.ForeignKey("campaign.id"), nullable=False),
+        sa.Column("shard", sa.Integer(), nullable=False),
+        sa.Column("manufactured", sa.Integer(), nullable=False),
+        sa.Column("distributed", sa.Integer(), nullable=False),
+        sa.UniqueConstraint("campaign_id", "shard", name="uq_campaigncountershard_campaign_id_shard"),
+    )
+
+def downgrade():
+    op.drop_table("campaigncountershard")
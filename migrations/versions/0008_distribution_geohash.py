@@ -0,0 +1,92 @@
+"""distribution geohash
+
+Adds DistributionRecord.geohash with a (campaign_id, geohash) index, and
+DistributionGeoCell, the per-cell totals the heatmap tiles are clustered
+from. Both are filled from the existing coordinates;
+`python -m app.geo rebuild` recomputes them the same way.
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0008"
+down_revision = "0007"
+branch_labels = None
+depends_on = None
+
+BACKFILL_CHUNK_ROWS = 5000
+
+# app.geo's precisions and encoder as of this revision, copied so the
+# migration keeps filling the same values whatever later changes app.geo
+GEOHASH_PRECISION = 9
+GEO_CELL_PRECISION = 6
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+def geohash_or_none(lat, lng):
+    if lat is None or lng is None or not (-90 <= lat <= 90 and -180 <= lng <= 180):
+        return None
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    chars = []
+    value = bits = 0
+    use_lng = True
+    while len(chars) < GEOHASH_PRECISION:
+        interval, coordinate = (lng_range, lng) if use_lng else (lat_range, lat)
+        mid = (interval[0] + interval[1]) / 2
+        value <<= 1
+        if coordinate >= mid:
+            value |= 1
+            interval[0] = mid
+        else:
+            interval[1] = mid
+        use_lng = not use_lng
+        bits += 1
+        if bits == 5:
+            chars.append(_BASE32[value])
+            value = bits = 0
+    return "".join(chars)
+
+def upgrade():
+    op.add_column("distributionrecord", sa.Column("geohash", sa.String(), nullable=True))
+    op.create_index("ix_distributionrecord_campaign_id_geohash", "distributionrecord", ["campaign_id", "geohash"])
+    op.create_table(
+        "distributiongeocell",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("campaign_id", sa.Integer(), sa.ForeignKey("campaign.id"), nullable=False),
+        sa.Column("cell", sa.String(), nullable=False),
+        sa.Column("records", sa.Integer(), nullable=False),
+        sa.Column("distributed_count", sa.Integer(), nullable=False),
+        sa.Column("lat_sum", sa.Float(), nullable=False),
+        sa.Column("lng_sum", sa.Float(), nullable=False),
+        sa.UniqueConstraint("campaign_id", "cell", name="uq_distributiongeocell_campaign_id_cell"),
+    )
+
+    conn = op.get_bind()
+    set_geohash = sa.text("UPDATE distributionrecord SET geohash = :geohash WHERE id = :id")
+    last_id = 0
+    while True:
+        rows = conn.execute(sa.text(
+            "SELECT id, lat, lng FROM distributionrecord "
+            "WHERE id > :last_id AND lat IS NOT NULL AND lng IS NOT NULL ORDER BY id LIMIT :limit"
+        ), {"last_id": last_id, "limit": BACKFILL_CHUNK_ROWS}).all()
+        if not rows:
+            break
+        conn.execute(set_geohash, [{"id": r[0], "geohash": geohash_or_none(r[1], r[2])} for r in rows])
+        last_id = rows[-1][0]
+
+    op.execute(
+        "INSERT INTO distributiongeocell (campaign_id, cell, records, distributed_count, lat_sum, lng_sum) "
+        f"SELECT campaign_id, substr(geohash, 1, {GEO_CELL_PRECISION}), count(*), sum(distributed_count), sum(lat), sum(lng) "
+        "FROM distributionrecord "
+        "WHERE geohash IS NOT NULL "
+        f"GROUP BY campaign_id, substr(geohash, 1, {GEO_CELL_PRECISION})"
+    )
+
+def downgrade():
+    op.drop_table("distributiongeocell")
+    op.drop_index("ix_distributionrecord_campaign_id_geohash", "distributionrecord")
+    with op.batch_alter_table("distributionrecord") as batch:
+        batch.drop_column("geohash")
@@ -0,0 +1,25 @@
+"""proof claims
+
+Anchor workers lease the pending proofs they are about to send, so several
+worker processes never submit the same proof.
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0009"
+down_revision = "0008"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.add_column("blockchainproof", sa.Column("claimed_by", sa.String(), nullable=True))
+    op.add_column("blockchainproof", sa.Column("claimed_until", sa.DateTime(), nullable=True))
+
+def downgrade():
+    with op.batch_alter_table("blockchainproof") as batch:
+        batch.drop_column("claimed_until")
+        batch.drop_column("claimed_by")